@@ -0,0 +1,156 @@
+import numpy as np
+from django.conf import settings
+from django.db.models import F, IntegerField, Sum
+from django.db.models.functions import Coalesce
+
+from .archive import iter_archived_answers
+from .cache import get_quiz_cache
+from .models import Answer, Question, QuestionAnswerOptions, UserAnswerOptions
+
+
+def load_quiz_answers(quiz):
+    """
+    Ответы и выбранные варианты ответов опроса (включая архив) целочисленными массивами:
+    answers - строки (респондент, вопрос), selections - строки (респондент, вариант ответа).
+    Респондент - id пользователя; анонимные ответы не связаны между собой, каждый - отдельный респондент с id -id ответа
+    """
+    if quiz.archived:
+        answers, selections = [], []
+        for _, user_id, answer_id, question_id, _, option_ids in iter_archived_answers([quiz.id]):
+            respondent = user_id if user_id is not None else -answer_id
+            answers.append((respondent, question_id))
+            selections += [(respondent, option_id) for option_id in option_ids]
+    else:
+        answers = Answer.objects.filter(question__quiz_id=quiz.id).values_list(
+            Coalesce('user_id', -F('id'), output_field=IntegerField()), 'question_id'
+        )
+        selections = UserAnswerOptions.objects.filter(
+            answer__question__quiz_id=quiz.id, answer_option__isnull=False
+        ).values_list(Coalesce('answer__user_id', -F('answer_id'), output_field=IntegerField()), 'answer_option_id')
+    return (np.array(list(answers), dtype=np.int64).reshape(-1, 2),
+            np.array(list(selections), dtype=np.int64).reshape(-1, 2))
+
+
+class QuizAnalytics:
+    """
+    Аналитика ответов на вопросы опроса по матрицам респондент x вопрос (answered) и респондент x вариант ответа
+    (selected), которые собираются из массивов ответов целиком, без циклов по респондентам
+    """
+
+    def __init__(self, questions, answer_options, answers, selections):
+        """
+        questions - [(id, тип)] в порядке вопросов опроса, answer_options - [(id вопроса, id варианта, название)],
+        answers и selections - массивы load_quiz_answers
+        """
+        self.questions = questions
+        self.question_ids = np.array([question_id for question_id, _ in questions], dtype=np.int64)
+        self.answer_options = answer_options
+        self.option_ids = np.array([option_id for _, option_id, _ in answer_options], dtype=np.int64)
+
+        self.respondents = np.unique(np.concatenate([answers[:, 0], selections[:, 0]]))
+        self.answered = self.pivot(answers, self.question_ids)
+        self.selected = self.pivot(selections, self.option_ids)
+
+    def pivot(self, rows, column_ids):
+        """
+        Булева матрица респондент x колонка по строкам (респондент, id колонки)
+        """
+        order = np.argsort(column_ids)
+        columns = np.searchsorted(column_ids, rows[:, 1], sorter=order)
+        # Строки с неизвестными колонками (например, вопросами, созданными после чтения списка вопросов) отбрасываются:
+        known = columns < len(column_ids)
+        known[known] = column_ids[order[columns[known]]] == rows[known, 1]
+        matrix = np.zeros((len(self.respondents), len(column_ids)), dtype=bool)
+        matrix[np.searchsorted(self.respondents, rows[known, 0]), order[columns[known]]] = True
+        return matrix
+
+    def get_option_columns(self, question_id):
+        return [i for i, (option_question_id, _, _) in enumerate(self.answer_options)
+                if option_question_id == question_id]
+
+    def format_options(self, columns):
+        return [{'id': self.answer_options[i][1], 'name': self.answer_options[i][2]} for i in columns]
+
+    def crosstab(self, question_id, by_question_id):
+        """
+        Таблица сопряжённости двух вопросов с вариантами: количество респондентов, выбравших вариант первого вопроса
+        (строки) и вариант второго (колонки)
+        """
+        rows, columns = self.get_option_columns(question_id), self.get_option_columns(by_question_id)
+        matrix = self.selected[:, rows].T.astype(np.int64) @ self.selected[:, columns].astype(np.int64)
+        return {
+            'question': question_id,
+            'by_question': by_question_id,
+            'answer_options': self.format_options(rows),
+            'by_answer_options': self.format_options(columns),
+            'matrix': matrix.tolist(),
+        }
+
+    def co_occurrence(self, question_id):
+        """
+        Совместные выборы вариантов вопроса с несколькими вариантами: на диагонали - количество выборов варианта,
+        вне диагонали - количество респондентов, выбравших оба варианта
+        """
+        columns = self.get_option_columns(question_id)
+        selected = self.selected[:, columns].astype(np.int64)
+        return {
+            'question': question_id,
+            'answer_options': self.format_options(columns),
+            'matrix': (selected.T @ selected).tolist(),
+        }
+
+    def funnel(self):
+        """
+        Воронка прохождения опроса по вопросам в порядке опроса: сколько пользователей ответили на вопрос
+        и сколько ответили на него и на все предыдущие. Анонимные ответы не связаны между собой и не учитываются
+        """
+        answered = self.answered[self.respondents > 0]
+        completed = np.logical_and.accumulate(answered, axis=1)
+        return [
+            {'question': question_id, 'answered': int(answered_count), 'completed': int(completed_count)}
+            for question_id, answered_count, completed_count in zip(
+                self.question_ids.tolist(), answered.sum(axis=0), completed.sum(axis=0)
+            )
+        ]
+
+    def to_representation(self, crosstab=None):
+        return {
+            'respondents': len(self.respondents),
+            'funnel': self.funnel(),
+            'co_occurrence': [
+                self.co_occurrence(question_id)
+                for question_id, question_type in self.questions if question_type == 'MULTIPLE_ANSWER_OPTION'
+            ],
+            'crosstab': self.crosstab(*crosstab) if crosstab else None,
+        }
+
+
+def compute_quiz_analytics(quiz, crosstab=None):
+    """
+    Аналитика ответов опроса: воронка, совместные выборы вариантов и, если задана пара вопросов crosstab,
+    таблица сопряжённости. Варианты ответов включают выведенные из использования, на них есть ответы
+    """
+    questions = list(Question.objects.filter(quiz_id=quiz.id).order_by('id').values_list('id', 'type'))
+    answer_options = list(QuestionAnswerOptions.all_objects.filter(question__quiz_id=quiz.id).order_by(
+        'question_id', 'id'
+    ).values_list('question_id', 'id', 'name'))
+    answers, selections = load_quiz_answers(quiz)
+    data = QuizAnalytics(questions, answer_options, answers, selections).to_representation(crosstab)
+    return {'id': quiz.id, **data}
+
+
+def get_quiz_analytics(quiz, crosstab=None):
+    """
+    Аналитика ответов опроса из кеша. Ключ содержит количество ответов на вопросы опроса (по счётчикам результатов)
+    и время изменения опроса, поэтому новые ответы и изменения вопросов сбрасывают запись
+    """
+    answers_count = quiz.result_counters.filter(kind='QUESTION_ANSWERS').aggregate(total=Sum('value'))['total']
+    crosstab_key = '-'.join(map(str, crosstab)) if crosstab else ''
+    key = f'analytics:{quiz.id}:{quiz.updated_at.isoformat()}:{answers_count or 0}:{crosstab_key}'
+
+    cache = get_quiz_cache()
+    data = cache.get(key)
+    if data is None:
+        data = compute_quiz_analytics(quiz, crosstab)
+        cache.set(key, data, timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+    return data
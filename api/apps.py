@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import create_search_indexes_on_migrate
+
+        # Полнотекстовые индексы создаются вне моделей, так как зависят от базы:
+        post_migrate.connect(create_search_indexes_on_migrate, sender=self)
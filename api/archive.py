@@ -0,0 +1,129 @@
+import json
+import zlib
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .models import Answer, ArchivedResponse, Question, Quiz, UserAnswerOptions
+from .signals import quiz_content_changed
+
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def pack_answers(answers):
+    """
+    Упаковывает ответы респондента [[id ответа, id вопроса, текст, [id вариантов ответов]], ...]
+    """
+    return zlib.compress(json.dumps(answers, ensure_ascii=False, separators=(',', ':')).encode())
+
+
+def unpack_answers(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def archive_quiz(quiz_id, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Переносит ответы опроса в архив одной транзакцией: опрос помечается архивным (новые ответы не принимаются),
+    ответы пачками по batch_size упаковываются по респондентам и удаляются из Answer и UserAnswerOptions.
+    Счётчики результатов и участие пользователей в опросе не меняются. Возвращает количество перенесённых ответов
+    """
+    answers = Answer.objects.filter(question__quiz_id=quiz_id).order_by('user_id', 'id').values_list(
+        'id', 'user_id', 'question_id', 'text'
+    )
+    archived = 0
+    with transaction.atomic():
+        Quiz.objects.filter(id=quiz_id).update(archived=True)
+        while True:
+            rows = list(answers[:batch_size])
+            if not rows:
+                break
+            # Ответы последнего респондента полной пачки могут продолжаться в следующей, они переносятся с ней:
+            if len(rows) == batch_size and rows[-1][1] is not None and rows[0][1] != rows[-1][1]:
+                rows = [row for row in rows if row[1] != rows[-1][1]]
+
+            answer_ids = [row[0] for row in rows]
+            option_ids = defaultdict(list)
+            for answer_id, option_id in UserAnswerOptions.objects.filter(
+                    answer_id__in=answer_ids
+            ).order_by('id').values_list('answer_id', 'answer_option_id'):
+                option_ids[answer_id].append(option_id)
+
+            responses = defaultdict(list)
+            for answer_id, user_id, question_id, text in rows:
+                # Анонимные ответы не связаны между собой, каждый хранится отдельной строкой:
+                key = (user_id, None if user_id is not None else answer_id)
+                responses[key].append([answer_id, question_id, text, option_ids[answer_id]])
+            ArchivedResponse.objects.bulk_create([
+                ArchivedResponse(quiz_id=quiz_id, user_id=user_id, data=pack_answers(response_answers))
+                for (user_id, _), response_answers in responses.items()
+            ])
+            # Удаляются только перенесённые ответы:
+            UserAnswerOptions.objects.filter(answer_id__in=answer_ids).delete()
+            Answer.objects.filter(id__in=answer_ids).delete()
+            archived += len(rows)
+
+        quiz_content_changed([quiz_id])
+    return archived
+
+
+def iter_archived_answers(quiz_ids, user_id=None, chunk_size=ARCHIVE_BATCH_SIZE):
+    """
+    Построчно отдаёт ответы из архива опросов: (id опроса, id пользователя, id ответа, id вопроса, текст,
+    [id вариантов ответов]) по респондентам, внутри респондента - по id ответа
+    """
+    responses = ArchivedResponse.objects.filter(quiz_id__in=quiz_ids)
+    if user_id is not None:
+        responses = responses.filter(user_id=user_id)
+    for quiz_id, response_user_id, data in responses.order_by('id').values_list(
+            'quiz_id', 'user_id', 'data'
+    ).iterator(chunk_size=chunk_size):
+        for answer_id, question_id, text, option_ids in unpack_answers(data):
+            yield quiz_id, response_user_id, answer_id, question_id, text, option_ids
+
+
+def count_archived_answers(quiz_ids):
+    """
+    Счётчики результатов по архиву опросов {(id опроса, kind, object_id): значение}
+    и количество ответов пользователей {(id опроса, id пользователя): количество}
+    """
+    counters, answered_counts = Counter(), Counter()
+    for quiz_id, user_id, _, question_id, _, option_ids in iter_archived_answers(quiz_ids):
+        counters[(quiz_id, 'QUESTION_ANSWERS', question_id)] += 1
+        for option_id in option_ids:
+            counters[(quiz_id, 'OPTION_SELECTIONS', option_id)] += 1
+        if user_id is not None:
+            answered_counts[(quiz_id, user_id)] += 1
+    for quiz_id, _ in answered_counts:
+        counters[(quiz_id, 'RESPONDENTS', quiz_id)] += 1
+    return counters, answered_counts
+
+
+def get_archived_questions(quiz_ids, user_id=None, with_answer_options=True):
+    """
+    Вопросы архивных опросов с ответами из архива: {id опроса: [Question]}. Ответы (несохраняемые экземпляры Answer
+    с выбранными вариантами) подставлены в предзагрузку answer, поэтому их сериализуют обычные сериализаторы.
+    Если задан user_id, возвращаются только вопросы, на которые пользователь ответил
+    """
+    answers = defaultdict(list)
+    for _, answer_user_id, answer_id, question_id, text, option_ids in iter_archived_answers(quiz_ids, user_id):
+        answer = Answer(id=answer_id, user_id=answer_user_id, question_id=question_id, text=text)
+        answer._prefetched_objects_cache = {'user_answer_options': [
+            UserAnswerOptions(answer=answer, answer_option_id=option_id) for option_id in option_ids
+        ]}
+        answers[question_id].append(answer)
+
+    questions = Question.objects.filter(quiz_id__in=quiz_ids).order_by('id')
+    if user_id is not None:
+        questions = questions.filter(id__in=list(answers))
+    if with_answer_options:
+        questions = questions.prefetch_related('answer_options')
+
+    questions_by_quiz = defaultdict(list)
+    for question in questions:
+        # Ответы отдаются в порядке id, как и до переноса в архив:
+        question._prefetched_objects_cache = {
+            **getattr(question, '_prefetched_objects_cache', {}),
+            'answer': sorted(answers[question.id], key=lambda answer: answer.id),
+        }
+        questions_by_quiz[question.quiz_id].append(question)
+    return questions_by_quiz
@@ -0,0 +1,102 @@
+import threading
+from collections import Counter
+
+from django.db import router
+from django.db.models import DEFERRED
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import get_token_caches, get_token_cache_key
+
+# Счётчики обращений к кешу токенов в текущем процессе:
+_token_cache_stats = Counter()
+_token_cache_stats_lock = threading.Lock()
+
+
+def count_token_cache_lookup(result):
+    with _token_cache_stats_lock:
+        _token_cache_stats[result] += 1
+
+
+def get_token_cache_stats():
+    """
+    Статистика кеша токенов текущего процесса: попадания в локальный и общий кеш, промахи и доля попаданий
+    """
+    with _token_cache_stats_lock:
+        stats = {result: _token_cache_stats[result] for result in ('local_hits', 'shared_hits', 'misses')}
+    lookups = sum(stats.values())
+    stats['hit_rate'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 4) if lookups else None
+    return stats
+
+
+def reset_token_cache_stats():
+    with _token_cache_stats_lock:
+        _token_cache_stats.clear()
+
+
+# Поля пользователя, которые хранятся в кеше токенов. Пароль, last_login и персональные данные в кеш не попадают,
+# остальные поля у пользователя из кеша отложены и при обращении читаются из базы:
+CACHED_USER_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кешированием токена вместе с пользователем: сначала в локальном кеше процесса,
+    затем в общем кеше, и только при промахе - запросом в базу.
+    В кеше хранятся только время создания токена и поля пользователя CACHED_USER_FIELDS, без учётных данных.
+    Кешируются только токены активных пользователей. Удаление токена и любое изменение пользователя
+    сбрасывают записи сигналами (api.signals) в общем кеше и в локальном кеше своего процесса; другие процессы
+    принимают удалённый токен и видят старые права пользователя, пока не истечёт их локальный кеш
+    (TIMEOUT кеша token_local, 5 секунд)
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        local_cache, shared_cache = get_token_caches()
+
+        cached = local_cache.get(cache_key)
+        if cached is not None:
+            count_token_cache_lookup('local_hits')
+        else:
+            cached = shared_cache.get(cache_key)
+            if cached is not None:
+                count_token_cache_lookup('shared_hits')
+                local_cache.set(cache_key, cached)
+
+        if cached is not None:
+            token = self.restore_token(key, cached)
+        else:
+            count_token_cache_lookup('misses')
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            if token.user.is_active:
+                cached = (token.created, tuple(getattr(token.user, name) for name in CACHED_USER_FIELDS))
+                shared_cache.set(cache_key, cached)
+                local_cache.set(cache_key, cached)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return token.user, token
+
+    def restore_token(self, key, cached):
+        """
+        Токен и пользователь из записи кеша: пользователь создаётся как прочитанный из базы с отложенными
+        полями, поэтому save() не перезапишет пароль и остальные некешированные поля
+        """
+        created, user_values = cached
+        model = self.get_model()
+        user_model = model._meta.get_field('user').related_model
+        values = dict(zip(CACHED_USER_FIELDS, user_values))
+        user = user_model.from_db(router.db_for_write(user_model), CACHED_USER_FIELDS, [
+            values.get(field.attname, DEFERRED) for field in user_model._meta.concrete_fields
+        ])
+        token = model(key=key, user_id=user.id, created=created)
+        token._state.adding = False
+        token.user = user
+        return token
@@ -0,0 +1,187 @@
+import datetime
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Question
+
+QUIZ_CACHE_ALIAS = 'quiz'
+QUIZ_CACHE_VERSION_KEY = 'quiz:version'
+TOKEN_CACHE_ALIAS = 'token'
+TOKEN_LOCAL_CACHE_ALIAS = 'token_local'
+QUIZ_CACHE_INVALIDATED_KEY = 'quiz:invalidated_at'
+REPLICA_PIN_CACHE_ALIAS = 'replica_pin'
+
+
+def get_quiz_cache():
+    return caches[QUIZ_CACHE_ALIAS]
+
+
+def get_quiz_cache_version():
+    """
+    Текущая версия кеша опросов. Версия входит в ключи записей, поэтому её увеличение
+    делает недоступными все ранее закешированные ответы
+    """
+    cache = get_quiz_cache()
+    version = cache.get(QUIZ_CACHE_VERSION_KEY)
+    if version is None:
+        # Начальная версия зависит от времени, чтобы после вытеснения ключа версии из кеша
+        # не вернуться к версии, под которой ещё лежат устаревшие записи:
+        cache.add(QUIZ_CACHE_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(QUIZ_CACHE_VERSION_KEY)
+    return version
+
+
+def invalidate_quiz_cache():
+    cache = get_quiz_cache()
+    try:
+        cache.incr(QUIZ_CACHE_VERSION_KEY)
+    except ValueError:
+        get_quiz_cache_version()
+    if settings.REPLICA_DATABASES:
+        cache.set(QUIZ_CACHE_INVALIDATED_KEY, time.time(), timeout=settings.REPLICA_LAG_SECONDS)
+
+
+def is_quiz_cache_settled():
+    """
+    Прошло ли после последнего сброса кеша опросов больше REPLICA_LAG_SECONDS: до этого реплики могут отдавать
+    старое состояние, и ответ, прочитанный с реплики, не кладётся в кеш под новой версией
+    """
+    return get_quiz_cache().get(QUIZ_CACHE_INVALIDATED_KEY) is None
+
+
+def invalidate_quiz_cache_on_commit():
+    """
+    Сбрасывает кеш опросов сразу и ещё раз после фиксации транзакции: до фиксации другие запросы
+    видят старое состояние и могут успеть положить его в кеш под новой версией
+    """
+    invalidate_quiz_cache()
+    transaction.on_commit(invalidate_quiz_cache)
+
+
+def get_token_caches():
+    """
+    Кеши токенов аутентификации: локальный кеш процесса и общий кеш
+    """
+    return caches[TOKEN_LOCAL_CACHE_ALIAS], caches[TOKEN_CACHE_ALIAS]
+
+
+def get_token_cache_key(key):
+    # Сам токен в ключ кеша не попадает:
+    return f'token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def invalidate_token_cache(keys):
+    """
+    Удаляет токены из кешей сразу и ещё раз после фиксации транзакции, чтобы параллельный запрос
+    не вернул в кеш токен, прочитанный до фиксации
+    """
+    cache_keys = [get_token_cache_key(key) for key in keys]
+    if not cache_keys:
+        return
+
+    def invalidate():
+        for cache in get_token_caches():
+            cache.delete_many(cache_keys)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def seconds_until_midnight():
+    now = timezone.localtime()
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time.min, now.tzinfo)
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+def get_quiz_cache_key(request):
+    """
+    Ключ кеша ответа: версия, текущая дата (опросы с прошедшим end_date пропадают из выдачи на следующий день),
+    область видимости (администраторы видят все опросы) и полный url запроса
+    """
+    scope = 'staff' if request.user.is_staff else 'public'
+    url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'quiz:{get_quiz_cache_version()}:{timezone.localdate().isoformat()}:{scope}:{url_hash}'
+
+
+# Метаданные вопроса, нужные для валидации ответа:
+QuestionMeta = namedtuple('QuestionMeta', ['id', 'quiz_id', 'type', 'answer_option_ids', 'quiz_archived'])
+
+QUESTION_META_CACHE_SIZE = 1024
+_question_meta_cache = OrderedDict()
+_question_meta_lock = threading.Lock()
+
+
+def get_question_meta(question_id, request=None):
+    """
+    Метаданные вопроса (опрос, тип, id вариантов ответов) или None, если вопроса нет.
+
+    Метаданные хранятся в запросе, чтобы все этапы валидации ответа читали вопрос один раз,
+    и в ограниченном LRU процесса. Записи LRU помечены версией кеша опросов, которую увеличивает
+    любое изменение вопросов и вариантов ответов, поэтому устаревшие записи не используются
+    и в других процессах. Промах стоит одного запроса
+    """
+    request_cache = None
+    if request is not None:
+        request_cache = request.__dict__.setdefault('_question_meta', {})
+        if question_id in request_cache:
+            return request_cache[question_id]
+
+    version = get_quiz_cache_version()
+    with _question_meta_lock:
+        entry = _question_meta_cache.get(question_id)
+        if entry is not None and entry[0] == version:
+            _question_meta_cache.move_to_end(question_id)
+            meta = entry[1]
+        else:
+            meta = None
+
+    if meta is None:
+        meta = load_question_meta(question_id)
+        if meta is not None:
+            with _question_meta_lock:
+                _question_meta_cache[question_id] = (version, meta)
+                _question_meta_cache.move_to_end(question_id)
+                while len(_question_meta_cache) > QUESTION_META_CACHE_SIZE:
+                    _question_meta_cache.popitem(last=False)
+
+    if request_cache is not None:
+        request_cache[question_id] = meta
+    return meta
+
+
+def load_question_meta(question_id):
+    """
+    Читает метаданные вопроса одним запросом (варианты ответов присоединяются LEFT JOIN,
+    выведенные из использования варианты отбрасываются)
+    """
+    rows = list(Question.objects.filter(id=question_id).values_list(
+        'quiz_id', 'type', 'quiz__archived', 'answer_options__id', 'answer_options__is_retired'
+    ))
+    if not rows:
+        return None
+    quiz_id, question_type, quiz_archived, _, _ = rows[0]
+    answer_option_ids = frozenset(r[3] for r in rows if r[3] is not None and not r[4])
+    return QuestionMeta(question_id, quiz_id, question_type, answer_option_ids, quiz_archived)
+
+
+def forget_question_meta(question_id):
+    with _question_meta_lock:
+        _question_meta_cache.pop(question_id, None)
+
+
+def pin_user_to_primary(user_id):
+    """
+    После записи чтения пользователя REPLICA_LAG_SECONDS идут с основной базы, чтобы он сразу видел свои изменения
+    """
+    caches[REPLICA_PIN_CACHE_ALIAS].set(f'replica_pin:{user_id}', True, timeout=settings.REPLICA_LAG_SECONDS)
+
+
+def is_user_pinned_to_primary(user_id):
+    return caches[REPLICA_PIN_CACHE_ALIAS].get(f'replica_pin:{user_id}', False)
@@ -0,0 +1,133 @@
+from collections import defaultdict
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+# Собранные сериализаторы по классу сериализатора DRF (None - сериализатор не поддерживается):
+_compiled_serializers = {}
+
+# Поля, у которых to_representation не меняет значение, прочитанное из базы:
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.ChoiceField)
+
+
+class CompiledSerializer:
+    """
+    Быстрый сериализатор только для чтения, собранный по дереву полей ModelSerializer.
+
+    Данные каждого уровня вложенности читаются одним запросом .values() (с queryset'ами из Prefetch,
+    если они заданы), а ответ собирается из словарей за один проход, без создания экземпляров моделей
+    и без полей DRF на каждый объект. Результат совпадает с результатом исходного сериализатора.
+    Поддерживаются скалярные поля модели, PrimaryKeyRelatedField и вложенные many-сериализаторы
+    по обратным внешним ключам; для остальных полей compile возвращает None
+    """
+
+    def __init__(self, model, fields, nested):
+        self.model = model
+        # [(имя поля, колонка, функция преобразования или None)]:
+        self.fields = fields
+        # [(имя поля, внешний ключ вложенной модели, CompiledSerializer)]:
+        self.nested = nested
+
+    @classmethod
+    def compile(cls, serializer):
+        model = serializer.Meta.model
+        fields, nested = [], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                return None
+
+            if isinstance(field, serializers.ListSerializer):
+                relation = model._meta.get_field(field.source)
+                if not relation.one_to_many:
+                    return None
+                child = cls.compile(field.child)
+                if child is None:
+                    return None
+                nested.append((name, relation.field, child))
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField)):
+                return None
+
+            model_field = model._meta.get_field(field.source)
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                fields.append((name, model_field.attname, None))
+            elif not model_field.concrete or model_field.is_relation:
+                return None
+            elif isinstance(field, IDENTITY_FIELDS):
+                fields.append((name, model_field.attname, None))
+            else:
+                fields.append((name, model_field.attname, field.to_representation))
+
+        return cls(model, fields, nested)
+
+    @property
+    def columns(self):
+        return [column for _, column, _ in self.fields]
+
+    def prepare(self, queryset):
+        """
+        Переводит queryset корневого уровня на .values(): выбираются все колонки модели и аннотации,
+        чтобы пагинация и сортировка видели те же поля, что и у экземпляров моделей
+        """
+        columns = [f.attname for f in self.model._meta.concrete_fields]
+        return queryset.prefetch_related(None).values(*columns, *queryset.query.annotations)
+
+    def to_representation(self, rows, prefetch_lookups=()):
+        """
+        Сериализует строки .values() вместе со всеми вложенными уровнями
+        """
+        rows = list(rows)
+        nested_data = {}
+        if rows and self.nested:
+            pks = [row[self.model._meta.pk.attname] for row in rows]
+            for name, foreign_key, child in self.nested:
+                queryset, child_lookups = get_prefetch_queryset(prefetch_lookups, name, foreign_key.model)
+                child_rows = list(queryset.filter(**{f'{foreign_key.name}__in': pks}).prefetch_related(None).values(
+                    foreign_key.attname, *{*child.columns, child.model._meta.pk.attname}
+                ))
+                grouped = defaultdict(list)
+                for item, child_row in zip(child.to_representation(child_rows, child_lookups), child_rows):
+                    grouped[child_row[foreign_key.attname]].append(item)
+                nested_data[name] = grouped
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in self.fields:
+                value = row[column]
+                item[name] = convert(value) if convert is not None and value is not None else value
+            for name, _, _ in self.nested:
+                item[name] = nested_data[name].get(row[self.model._meta.pk.attname], [])
+            data.append(item)
+        return data
+
+
+def get_compiled_serializer(serializer):
+    """
+    Возвращает собранный сериализатор для экземпляра сериализатора DRF; сборка выполняется один раз на класс
+    """
+    serializer_class = type(serializer)
+    if serializer_class not in _compiled_serializers:
+        _compiled_serializers[serializer_class] = CompiledSerializer.compile(serializer)
+    return _compiled_serializers[serializer_class]
+
+
+def get_prefetch_queryset(lookups, name, model):
+    """
+    Находит среди предзагрузок queryset для связи name и предзагрузки следующего уровня
+    """
+    queryset, child_lookups = None, []
+    for lookup in lookups:
+        if isinstance(lookup, Prefetch):
+            if lookup.prefetch_to == name and lookup.queryset is not None:
+                queryset = lookup.queryset
+                child_lookups.extend(lookup.queryset._prefetch_related_lookups)
+            elif lookup.prefetch_to.startswith(f'{name}__'):
+                child_lookups.append(Prefetch(lookup.prefetch_through[len(name) + 2:], queryset=lookup.queryset))
+        elif lookup.startswith(f'{name}__'):
+            child_lookups.append(lookup[len(name) + 2:])
+    if queryset is None:
+        queryset = model._default_manager.all()
+    return queryset, child_lookups
@@ -0,0 +1,299 @@
+import io
+import itertools
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .cache import invalidate_quiz_cache
+from .models import Quiz, Question, QuestionAnswerOptions, Answer, UserAnswerOptions, ResultCounter, QuizParticipation
+
+DATAGEN_BATCH_SIZE = 10000
+
+# Поля строк генерируемых моделей в порядке записи (сначала родительские модели), остальные поля получают
+# значения по умолчанию:
+GENERATED_FIELDS = {
+    User: ['id', 'username', 'password'],
+    Token: ['key', 'user_id'],
+    Quiz: ['id', 'title', 'start_date', 'end_date', 'description'],
+    Question: ['id', 'text', 'type', 'quiz_id'],
+    QuestionAnswerOptions: ['id', 'name', 'question_id'],
+    Answer: ['id', 'text', 'user_id', 'question_id'],
+    UserAnswerOptions: ['id', 'answer_id', 'answer_option_id'],
+    ResultCounter: ['id', 'quiz_id', 'kind', 'object_id', 'value'],
+    QuizParticipation: ['id', 'user_id', 'quiz_id', 'answered_count', 'last_answered_at'],
+}
+
+# Слова для названий и текстов (поиск по ним находит часть опросов, вопросов и ответов):
+WORDS = [
+    'погода', 'город', 'работа', 'отпуск', 'транспорт', 'книга', 'музыка', 'спорт', 'еда', 'кофе', 'чай', 'море',
+    'горы', 'школа', 'здоровье', 'кино', 'театр', 'магазин', 'доставка', 'сервис', 'качество', 'цена', 'время',
+    'выходные', 'семья', 'друзья', 'парк', 'велосипед', 'метро', 'автобус', 'интернет', 'телефон', 'новости', 'лето',
+    'зима', 'осень', 'весна', 'утро', 'вечер', 'хорошо', 'плохо', 'удобно', 'быстро', 'дорого', 'дёшево', 'часто',
+]
+QUESTION_TYPES = ['TEXT', 'SINGLE_ANSWER_OPTION', 'MULTIPLE_ANSWER_OPTION']
+QUESTION_TYPE_WEIGHTS = [0.2, 0.5, 0.3]
+# Неиспользуемый пароль: генерируемые пользователи входят по токенам:
+UNUSABLE_PASSWORD = '!'
+
+
+def format_copy_value(value):
+    """
+    Значение колонки в текстовом формате COPY
+    """
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return 't' if value else 'f'
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return str(value)
+
+
+class RowWriter:
+    """
+    Буфер строк моделей, которые записываются пачками по batch_size строк: в Postgres - COPY,
+    в остальных базах - bulk_create. Записывает строки без сигналов и save(), id выделяет сам
+    """
+
+    def __init__(self, fields, using='default', batch_size=DATAGEN_BATCH_SIZE):
+        """
+        fields - {модель: [имена полей в порядке значений строк]}, модели перечисляются в порядке записи
+        """
+        self.using = using
+        self.connection = connections[using]
+        self.batch_size = batch_size
+        self.fields = {model: [model._meta.get_field(name) for name in names] for model, names in fields.items()}
+        self.rows = {model: [] for model in fields}
+        self.counts = Counter()
+        self.ids = {}
+
+    def allocate_ids(self, model, count):
+        """
+        Следующие count id модели после наибольшего id в базе
+        """
+        if model not in self.ids:
+            max_id = model._base_manager.using(self.using).aggregate(max_id=Max('pk'))['max_id']
+            self.ids[model] = itertools.count((max_id or 0) + 1)
+        start = next(self.ids[model])
+        self.ids[model] = itertools.count(start + count)
+        return range(start, start + count)
+
+    def add(self, model, rows):
+        self.rows[model].extend(rows)
+        if len(self.rows[model]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Записываются все модели сразу, чтобы родительские строки попадали в базу раньше дочерних:
+        for model, rows in self.rows.items():
+            if rows:
+                self.write(model, rows)
+                self.counts[model] += len(rows)
+                rows.clear()
+
+    def finish(self):
+        """
+        Записывает оставшиеся строки и выравнивает последовательности id (явные id их не двигают).
+        Возвращает количество записанных строк по моделям
+        """
+        self.flush()
+        with self.connection.cursor() as cursor:
+            for sql in self.connection.ops.sequence_reset_sql(no_style(), list(self.ids)):
+                cursor.execute(sql)
+        return self.counts
+
+    def write(self, model, rows):
+        if self.connection.vendor == 'postgresql':
+            self.copy(model, rows)
+        else:
+            attnames = [field.attname for field in self.fields[model]]
+            model._base_manager.using(self.using).bulk_create([model(**dict(zip(attnames, row))) for row in rows])
+
+    def copy(self, model, rows):
+        """
+        Записывает строки через COPY. Поля, которых нет в строках, заполняются значениями по умолчанию,
+        поля auto_now и auto_now_add - текущим временем
+        """
+        fields = self.fields[model]
+        now = timezone.now()
+        defaults = [
+            (field, now if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+             else field.get_default())
+            for field in model._meta.concrete_fields if field not in fields
+        ]
+        quote_name = self.connection.ops.quote_name
+        columns = ', '.join(quote_name(field.column) for field in fields + [field for field, _ in defaults])
+        default_values = tuple(value for _, value in defaults)
+
+        buffer = io.StringIO()
+        buffer.writelines('\t'.join(map(format_copy_value, row + default_values)) + '\n' for row in rows)
+        buffer.seek(0)
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {quote_name(model._meta.db_table)} ({columns}) FROM STDIN', buffer)
+
+
+def zipf_weights(count, skew):
+    """
+    Вероятности по закону Ципфа: k-й по популярности элемент выбирается пропорционально 1 / k^skew
+    """
+    weights = 1 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+class DataGenerator:
+    """
+    Генератор синтетических данных: пользователи с токенами, опросы с вопросами и вариантами ответов, ответы
+    с выбранными вариантами, счётчики результатов и участие в опросах. Данные определяются seed и параметрами,
+    популярность опросов, активность пользователей и выбор вариантов распределены по закону Ципфа (skew),
+    часть респондентов бросает опрос на каждом вопросе (completion - доля продолжающих)
+    """
+
+    def __init__(self, seed=0, using='default', batch_size=DATAGEN_BATCH_SIZE):
+        self.rng = np.random.default_rng(seed)
+        self.using = using
+        self.writer = RowWriter(GENERATED_FIELDS, using, batch_size)
+        self.today = timezone.localdate()
+        self.now = timezone.now()
+        self.user_ids = []
+        self.quiz_ids = []
+
+    def generate(self, users=1000, quizzes=100, questions=10, options=5, respondents=100, anonymous=0.1,
+                 completion=0.9, skew=1.1):
+        """
+        Создаёт users пользователей и quizzes опросов по questions вопросов, в среднем по respondents респондентов
+        на опрос (anonymous - доля анонимных). Возвращает количество созданных строк по моделям
+        """
+        with transaction.atomic(using=self.using):
+            self.add_users(users)
+            self.add_quizzes(quizzes, questions, options, respondents, anonymous, completion, skew)
+            counts = self.writer.finish()
+        invalidate_quiz_cache()
+        return counts
+
+    def add_users(self, count):
+        ids = self.writer.allocate_ids(User, count)
+        keys = self.rng.bytes(20 * count).hex()
+        self.writer.add(User, ((user_id, f'user{user_id}', UNUSABLE_PASSWORD) for user_id in ids))
+        self.writer.add(Token, ((keys[40 * i:40 * (i + 1)], user_id) for i, user_id in enumerate(ids)))
+        self.user_ids.extend(ids)
+
+    def add_quizzes(self, count, questions, options, respondents, anonymous, completion, skew):
+        if not count:
+            return
+        rng = self.rng
+        # Респонденты распределяются по опросам и пользователи по активности в случайном порядке популярности:
+        respondents_counts = rng.multinomial(count * respondents, rng.permutation(zipf_weights(count, skew)))
+        user_ids = np.array(self.user_ids, dtype=np.int64)
+        user_log_weights = np.log(rng.permutation(zipf_weights(len(user_ids), skew))) if len(user_ids) else None
+
+        for respondents_count in respondents_counts.tolist():
+            anonymous_count = int(rng.binomial(respondents_count, anonymous))
+            users_count = min(respondents_count - anonymous_count, len(user_ids))
+            chosen = []
+            if users_count:
+                # Выборка пользователей без повторов с весами активности (top-k по ключам Гумбеля):
+                keys = user_log_weights + rng.gumbel(size=len(user_ids))
+                chosen = user_ids[np.argsort(-keys)[:users_count]].tolist()
+            self.add_quiz(chosen + [None] * anonymous_count, questions, options, completion, skew)
+
+    def add_quiz(self, respondent_user_ids, questions_count, options_count, completion, skew):
+        rng, writer = self.rng, self.writer
+        [quiz_id] = writer.allocate_ids(Quiz, 1)
+        start_date = self.today - timedelta(days=int(rng.integers(0, 365)))
+        end_date = start_date + timedelta(days=int(rng.integers(7, 180)))
+        writer.add(Quiz, [(quiz_id, self.words(3).capitalize(), start_date, end_date, self.words(12))])
+        self.quiz_ids.append(quiz_id)
+
+        # Каждый респондент отвечает на вопросы по порядку, пока не бросит опрос:
+        respondents_count = len(respondent_user_ids)
+        if completion < 1:
+            answered_counts = np.minimum(rng.geometric(1 - completion, size=respondents_count), questions_count)
+        else:
+            answered_counts = np.full(respondents_count, questions_count)
+        respondent_user_ids = np.array(respondent_user_ids, dtype=object)
+
+        counters = []
+        question_ids = writer.allocate_ids(Question, questions_count)
+        question_types = rng.choice(QUESTION_TYPES, size=questions_count, p=QUESTION_TYPE_WEIGHTS).tolist()
+        for position, (question_id, question_type) in enumerate(zip(question_ids, question_types)):
+            writer.add(Question, [(question_id, self.words(6).capitalize() + '?', question_type, quiz_id)])
+            option_ids = []
+            if question_type != 'TEXT':
+                option_ids = writer.allocate_ids(QuestionAnswerOptions, options_count)
+                writer.add(QuestionAnswerOptions, (
+                    (option_id, self.words(2), question_id) for option_id in option_ids
+                ))
+
+            user_ids = respondent_user_ids[answered_counts > position].tolist()
+            if user_ids:
+                counters.append(('QUESTION_ANSWERS', question_id, len(user_ids)))
+                counters += self.add_answers(question_id, question_type, option_ids, user_ids, skew)
+
+        registered = np.array([user_id is not None for user_id in respondent_user_ids.tolist()], dtype=bool)
+        participations = [
+            (user_id, quiz_id, answered_count, self.now)
+            for user_id, answered_count in zip(respondent_user_ids[registered].tolist(),
+                                               answered_counts[registered].tolist())
+        ]
+        if participations:
+            counters.append(('RESPONDENTS', quiz_id, len(participations)))
+        writer.add(QuizParticipation, (
+            (participation_id, *participation)
+            for participation_id, participation in zip(writer.allocate_ids(QuizParticipation, len(participations)),
+                                                       participations)
+        ))
+        writer.add(ResultCounter, (
+            (counter_id, quiz_id, *counter)
+            for counter_id, counter in zip(writer.allocate_ids(ResultCounter, len(counters)), counters)
+        ))
+
+    def add_answers(self, question_id, question_type, option_ids, user_ids, skew):
+        """
+        Ответы пользователей user_ids на вопрос. Возвращает счётчики выборов вариантов ответов
+        """
+        rng, writer = self.rng, self.writer
+        answer_ids = writer.allocate_ids(Answer, len(user_ids))
+        if question_type == 'TEXT':
+            texts = self.texts(len(user_ids))
+            writer.add(Answer, zip(answer_ids, texts, user_ids, itertools.repeat(question_id)))
+            return []
+        writer.add(Answer, zip(answer_ids, itertools.repeat(None), user_ids, itertools.repeat(question_id)))
+
+        option_ids = np.array(option_ids, dtype=np.int64)
+        popularity = rng.permutation(zipf_weights(len(option_ids), skew))
+        if question_type == 'SINGLE_ANSWER_OPTION':
+            answer_indexes = np.arange(len(user_ids))
+            chosen = rng.choice(option_ids, size=len(user_ids), p=popularity)
+        else:
+            # Несколько вариантов без повторов: top-k по ключам Гумбеля, k от 1 до количества вариантов:
+            keys = np.log(popularity) + rng.gumbel(size=(len(user_ids), len(option_ids)))
+            order = np.argsort(-keys, axis=1)
+            counts = 1 + rng.binomial(len(option_ids) - 1, 0.3, size=len(user_ids))
+            answer_indexes, ranks = np.nonzero(np.arange(len(option_ids)) < counts[:, None])
+            chosen = option_ids[order[answer_indexes, ranks]]
+
+        answer_ids = np.array(answer_ids, dtype=np.int64)[answer_indexes].tolist()
+        writer.add(UserAnswerOptions, zip(writer.allocate_ids(UserAnswerOptions, len(answer_ids)), answer_ids,
+                                          chosen.tolist()))
+        option_ids, selections = np.unique(chosen, return_counts=True)
+        return [('OPTION_SELECTIONS', option_id, value)
+                for option_id, value in zip(option_ids.tolist(), selections.tolist())]
+
+    def words(self, count):
+        return ' '.join(WORDS[i] for i in self.rng.integers(0, len(WORDS), size=count).tolist())
+
+    def texts(self, count):
+        """
+        count текстов ответов от 1 до 8 слов
+        """
+        lengths = self.rng.integers(1, 9, size=count)
+        words = self.rng.integers(0, len(WORDS), size=int(lengths.sum())).tolist()
+        bounds = np.concatenate([[0], np.cumsum(lengths)]).tolist()
+        return [' '.join(WORDS[i] for i in words[start:end]) for start, end in zip(bounds, bounds[1:])]
@@ -0,0 +1,105 @@
+import csv
+import json
+
+from .archive import iter_archived_answers
+from .models import Answer, Question, QuestionAnswerOptions, Quiz, UserAnswerOptions
+
+EXPORT_FIELDS = ['answer_id', 'question_id', 'question', 'question_type', 'user_id', 'text', 'answer_options']
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_quiz_answer_rows(quiz_id, chunk_size=EXPORT_CHUNK_SIZE, archived=None):
+    """
+    Построчно отдаёт все ответы на вопросы опроса вместе с названиями выбранных вариантов ответов.
+    Ответы архивного опроса читаются из архива (api.archive) по респондентам;
+    archived=None - признак архива читается из базы
+    """
+    questions = {q.id: q for q in Question.objects.filter(quiz_id=quiz_id).only('id', 'text', 'type')}
+    # Выведенные из использования варианты остаются в данных ранее ответах:
+    option_names = dict(QuestionAnswerOptions.all_objects.filter(question__quiz_id=quiz_id).values_list('id', 'name'))
+
+    if archived is None:
+        archived = Quiz.objects.filter(id=quiz_id, archived=True).exists()
+    if archived:
+        answers = (
+            (answer_id, question_id, user_id, text, option_ids)
+            for _, user_id, answer_id, question_id, text, option_ids
+            in iter_archived_answers([quiz_id], chunk_size=chunk_size)
+        )
+    else:
+        answers = iter_live_answers(quiz_id, chunk_size)
+
+    for answer_id, question_id, user_id, text, option_ids in answers:
+        # В архиве остаются ответы на вопросы, удалённые после переноса опроса в архив:
+        question = questions.get(question_id)
+        if question is None:
+            continue
+        yield {
+            'answer_id': answer_id,
+            'question_id': question_id,
+            'question': question.text,
+            'question_type': question.type,
+            'user_id': user_id,
+            'text': text,
+            'answer_options': [option_names.get(option_id, '') for option_id in option_ids],
+        }
+
+
+def iter_live_answers(quiz_id, chunk_size):
+    """
+    Ответы и выбранные варианты читаются двумя серверными курсорами, отсортированными по id ответа,
+    и склеиваются слиянием, поэтому память не зависит от количества ответов, а запросов на строку нет.
+    В памяти держатся только вопросы и варианты ответов опроса
+    """
+    answers = Answer.objects.filter(
+        question__quiz_id=quiz_id
+    ).order_by('id').values_list('id', 'question_id', 'user_id', 'text').iterator(chunk_size=chunk_size)
+    selections = UserAnswerOptions.objects.filter(
+        answer__question__quiz_id=quiz_id
+    ).order_by('answer_id', 'id').values_list('answer_id', 'answer_option_id').iterator(chunk_size=chunk_size)
+
+    selection = next(selections, None)
+    for answer_id, question_id, user_id, text in answers:
+        option_ids = []
+        while selection is not None and selection[0] <= answer_id:
+            if selection[0] == answer_id:
+                option_ids.append(selection[1])
+            selection = next(selections, None)
+        yield answer_id, question_id, user_id, text, option_ids
+
+
+class _Echo:
+    """
+    Псевдо-файл для csv.writer: возвращает записанную строку вместо буферизации
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows, chunk_rows=500):
+    writer = csv.writer(_Echo())
+    chunk = [writer.writerow(EXPORT_FIELDS)]
+    for row in rows:
+        row = dict(row, answer_options='; '.join(row['answer_options']))
+        chunk.append(writer.writerow([row[f] for f in EXPORT_FIELDS]))
+        if len(chunk) >= chunk_rows:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+def render_jsonl(rows, chunk_rows=500):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row, ensure_ascii=False) + '\n')
+        if len(chunk) >= chunk_rows:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+EXPORT_FORMATS = {
+    'csv': (render_csv, 'text/csv'),
+    'jsonl': (render_jsonl, 'application/x-ndjson'),
+}
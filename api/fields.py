@@ -0,0 +1,66 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import router
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+class BatchPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField для элементов BatchRelatedListSerializer: поле только проверяет значение,
+    а объекты всех элементов списка выбираются одним запросом в BatchRelatedListSerializer.
+    Вне такого списка работает как обычный PrimaryKeyRelatedField
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(getattr(self.parent, 'parent', None), BatchRelatedListSerializer):
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BatchRelatedListSerializer(serializers.ListSerializer):
+    """
+    many-сериализатор, который заменяет значения полей BatchPrimaryKeyRelatedField всех элементов объектами,
+    выбранными одним запросом id__in на поле, и сообщает обо всех несуществующих id сразу.
+    Родительский сериализатор может передать допустимые id методом get_batch_pks(field_name) (например, из кеша):
+    тогда id проверяются по ним, а объекты создаются без запроса и содержат только первичный ключ
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+
+        for field_name, field in self.child.fields.items():
+            if field.read_only or not isinstance(field, BatchPrimaryKeyRelatedField):
+                continue
+
+            pks = {item[field.source] for item in items if item.get(field.source) is not None}
+            if not pks:
+                continue
+
+            get_batch_pks = getattr(self.parent, 'get_batch_pks', None)
+            if get_batch_pks is not None:
+                objs = self.build_objects(field, pks & set(get_batch_pks(self.field_name)))
+            else:
+                objs = field.get_queryset().in_bulk(pks)
+            missing_pks = pks - objs.keys()
+            if missing_pks:
+                raise ValidationError({field_name: [f'Объекты с id {sorted(missing_pks)} не существуют']})
+
+            for item in items:
+                if item.get(field.source) is not None:
+                    item[field.source] = objs[item[field.source]]
+
+        return items
+
+    @staticmethod
+    def build_objects(field, pks):
+        model = field.get_queryset().model
+        db = router.db_for_read(model)
+        return {pk: model.from_db(db, [model._meta.pk.attname], [pk]) for pk in pks}
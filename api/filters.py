@@ -1,51 +1,96 @@
-from django.db.models import Count, Q, Prefetch
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import F, Prefetch
+from django.utils import timezone
 from django_filters import rest_framework as filters
+from rest_framework.exceptions import PermissionDenied
+
 from api.models import Quiz, Question, Answer
+from api.search import search_queryset
+
+
+class SearchFilterSet(filters.FilterSet):
+    """
+    Полнотекстовый поиск ?search= (api.search): результаты отсортированы по релевантности
+    """
+    search = filters.CharFilter(method='filter_search')
+
+    def filter_search(self, queryset, name, value):
+        return search_queryset(queryset, value)
 
 
-class QuizFilter(filters.FilterSet):
+class QuizFilter(SearchFilterSet):
     class Meta:
         model = Quiz
         fields = '__all__'
 
 
-class QuestionFilter(filters.FilterSet):
+class QuestionFilter(SearchFilterSet):
     class Meta:
         model = Question
         fields = '__all__'
 
 
-class AnswerFilter(filters.FilterSet):
+class AnswerFilter(SearchFilterSet):
     class Meta:
         model = Answer
         fields = '__all__'
 
+    def filter_search(self, queryset, name, value):
+        # Поиск по текстам ответов доступен только администраторам:
+        if not self.request.user.is_staff:
+            raise PermissionDenied('Поиск по ответам доступен только администраторам')
+        return super().filter_search(queryset, name, value)
+
+
+class IntegerFilter(filters.NumberFilter):
+    """
+    Фильтр по целому числу: NumberFilter принимает и дробные значения
+    """
+    field_class = forms.IntegerField
+
+
+def parse_user_id(value):
+    """
+    id пользователя из параметра ?user= так же, как его разбирает фильтр QuizUserAnswerFilter.user.
+    None, если параметр не задан или некорректен
+    """
+    try:
+        return QuizUserAnswerFilter.base_filters['user'].field_class(required=False).clean(value)
+    except ValidationError:
+        return None
+
 
 class QuizUserAnswerFilter(filters.FilterSet):
-    user = filters.CharFilter(method='filter_by_user')
+    user = IntegerFilter(method='filter_by_user')
+    active = filters.BooleanFilter(method='filter_active')
 
     def filter_by_user(self, queryset, name, value):
-        prefetch_answers = Answer.objects.filter(user_id=value)
+        """
+        Опросы, в которых участвовал пользователь, с его ответами.
+        Опросы выбираются по таблице участия, ответы - одной предзагрузкой по индексу (user_id, question_id)
+        """
+        prefetch_answers = Answer.objects.filter(user_id=value).prefetch_related('user_answer_options')
 
-        prefetch_questions = Question.objects.annotate(
-            answer_count=Count('answer', filter=Q(answer__user_id=value))
-        ).filter(
-            answer_count__gt=0
+        prefetch_questions = Question.objects.filter(
+            answer__user_id=value
         ).prefetch_related(
+            'answer_options',
             Prefetch('answer', queryset=prefetch_answers)
         )
 
-        queryset = Quiz.objects.annotate(
-            questions_count=Count('questions', filter=Q(questions__answer__user_id=value))
-        ).filter(
-            questions_count__gt=0
+        # Предзагрузка всех ответов на вопросы опросов заменяется предзагрузкой ответов пользователя:
+        return queryset.filter(
+            participations__user_id=value
+        ).annotate(
+            last_answered_at=F('participations__last_answered_at')
+        ).prefetch_related(
+            None
         ).prefetch_related(
             Prefetch('questions', queryset=prefetch_questions)
-        ).order_by('id')
-
-        return queryset
-
+        )
 
-class Meta:
-    model = Quiz
-    fields = '__all__'
+    def filter_active(self, queryset, name, value):
+        if value:
+            return queryset.filter(end_date__gt=timezone.localdate())
+        return queryset.filter(end_date__lte=timezone.localdate())
@@ -0,0 +1,319 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction, IntegrityError
+
+from .models import Answer, Question, QuestionAnswerOptions, UserAnswerOptions
+from .results import count_answers, increment_result_counters
+from .utils import bulk_create_with_ids
+
+logger = logging.getLogger('api.ingestion')
+
+# Время, на которое обработчик забирает строки очереди; после него незаписанные строки снова доступны:
+QUEUE_LEASE_SECONDS = 60
+# Сколько запрос на чтение ждёт записи ответов пользователя, уже забранных другим обработчиком:
+READ_YOUR_WRITES_TIMEOUT = 5
+
+
+class DuplicateQueuedAnswer(Exception):
+    pass
+
+
+class AnswerQueue:
+    """
+    Надёжная локальная очередь ответов в файле SQLite (журнал WAL, синхронная запись на диск).
+
+    Уникальный индекс (user_id, question_id) отсекает повторные ответы, ещё не записанные в базу.
+    Обработчик забирает строки на время QUEUE_LEASE_SECONDS и удаляет их после фиксации записи в базу,
+    поэтому строки, забранные упавшим обработчиком, будут записаны повторно другим.
+    Строки, которые нельзя записать (вопрос, вариант ответа или пользователь удалены), переносятся
+    в таблицу dead_answer с текстом ошибки и больше не обрабатываются
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS queued_answer ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, question_id INTEGER NOT NULL, '
+                'quiz_id INTEGER NOT NULL, text TEXT, answer_option_ids TEXT NOT NULL, '
+                'claimed_by TEXT, claimed_until REAL)'
+            )
+            connection.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS queued_answer_user_question '
+                'ON queued_answer (user_id, question_id) WHERE user_id IS NOT NULL'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS dead_answer ('
+                'id INTEGER PRIMARY KEY, user_id INTEGER, question_id INTEGER NOT NULL, quiz_id INTEGER NOT NULL, '
+                'text TEXT, answer_option_ids TEXT NOT NULL, error TEXT NOT NULL, failed_at REAL NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def put(self, user_id, question_id, quiz_id, text, answer_option_ids):
+        """
+        Добавляет ответ в очередь. Строка сразу забрана добавившим её запросом, чтобы обработчик не записал её
+        до окончания проверок; после них вызывается release (или remove)
+        """
+        try:
+            cursor = self.connection.execute(
+                'INSERT INTO queued_answer (user_id, question_id, quiz_id, text, answer_option_ids, claimed_by, '
+                'claimed_until) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (user_id, question_id, quiz_id, text, json.dumps(answer_option_ids), 'put',
+                 time.time() + QUEUE_LEASE_SECONDS)
+            )
+        except sqlite3.IntegrityError:
+            raise DuplicateQueuedAnswer()
+        return cursor.lastrowid
+
+    def put_many(self, rows):
+        """
+        Добавляет ответы [(user_id, question_id, quiz_id, text, answer_option_ids)] одной транзакцией очереди:
+        либо все, либо ни одного, если среди них есть повторный ответ. Строки забраны так же, как в put
+        """
+        claimed_until = time.time() + QUEUE_LEASE_SECONDS
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            ids = [
+                self.connection.execute(
+                    'INSERT INTO queued_answer (user_id, question_id, quiz_id, text, answer_option_ids, claimed_by, '
+                    'claimed_until) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (user_id, question_id, quiz_id, text, json.dumps(answer_option_ids), 'put', claimed_until)
+                ).lastrowid
+                for user_id, question_id, quiz_id, text, answer_option_ids in rows
+            ]
+        except sqlite3.IntegrityError:
+            self.connection.execute('ROLLBACK')
+            raise DuplicateQueuedAnswer()
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+        return ids
+
+    def claim(self, limit, user_id=None):
+        """
+        Забирает до limit свободных строк (в порядке поступления) и возвращает их
+        """
+        claimed_by, now = uuid.uuid4().hex, time.time()
+        user_condition = '' if user_id is None else 'AND user_id = ? '
+        params = [claimed_by, now + QUEUE_LEASE_SECONDS, now, *([] if user_id is None else [user_id]), limit]
+        self.connection.execute(
+            'UPDATE queued_answer SET claimed_by = ?, claimed_until = ? WHERE id IN ('
+            'SELECT id FROM queued_answer WHERE (claimed_until IS NULL OR claimed_until < ?) '
+            f'{user_condition}ORDER BY id LIMIT ?)',
+            params
+        )
+        rows = self.connection.execute(
+            'SELECT id, user_id, question_id, quiz_id, text, answer_option_ids FROM queued_answer '
+            'WHERE claimed_by = ? ORDER BY id', (claimed_by,)
+        ).fetchall()
+        return [
+            {'id': row[0], 'user_id': row[1], 'question_id': row[2], 'quiz_id': row[3], 'text': row[4],
+             'answer_option_ids': json.loads(row[5])}
+            for row in rows
+        ]
+
+    def remove(self, ids):
+        self.connection.executemany('DELETE FROM queued_answer WHERE id = ?', [(i,) for i in ids])
+
+    def release(self, ids):
+        self.connection.executemany(
+            'UPDATE queued_answer SET claimed_by = NULL, claimed_until = NULL WHERE id = ?', [(i,) for i in ids]
+        )
+
+    def dead_letter(self, failed):
+        """
+        Переносит строки [(строка, ошибка)] из очереди в dead_answer одной транзакцией очереди
+        """
+        failed_at = time.time()
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO dead_answer (id, user_id, question_id, quiz_id, text, answer_option_ids, '
+                'error, failed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(row['id'], row['user_id'], row['question_id'], row['quiz_id'], row['text'],
+                  json.dumps(row['answer_option_ids']), error, failed_at) for row, error in failed]
+            )
+            self.connection.executemany('DELETE FROM queued_answer WHERE id = ?', [(row['id'],) for row, _ in failed])
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def dead_count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM dead_answer').fetchone()[0]
+
+    def pending_count(self, user_id=None):
+        if user_id is None:
+            return self.connection.execute('SELECT COUNT(*) FROM queued_answer').fetchone()[0]
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM queued_answer WHERE user_id = ?', (user_id,)
+        ).fetchone()[0]
+
+
+_answer_queues = {}
+_answer_queues_lock = threading.Lock()
+
+
+def is_answer_queue_enabled():
+    return settings.ANSWER_INGESTION == 'queue'
+
+
+def get_answer_queue():
+    path = os.fspath(settings.ANSWER_INGESTION_QUEUE)
+    with _answer_queues_lock:
+        if path not in _answer_queues:
+            _answer_queues[path] = AnswerQueue(path)
+        return _answer_queues[path]
+
+
+def flush_answer_queue(batch_size=1000, user_id=None):
+    """
+    Переносит до batch_size ответов из очереди в базу одной транзакцией: ответы и выбранные варианты
+    записываются массовыми вставками, счётчики результатов обновляются одним набором запросов на опрос.
+    Возвращает количество записанных ответов
+    """
+    queue = get_answer_queue()
+    rows = queue.claim(batch_size, user_id=user_id)
+    if not rows:
+        return 0
+
+    rows, failed = split_orphaned_rows(rows)
+    try:
+        with transaction.atomic():
+            answers, insert_failed = insert_queued_answers(rows)
+            failed += insert_failed
+            user_answer_options = [
+                UserAnswerOptions(answer=answer, answer_option_id=option_id)
+                for answer, row in answers for option_id in row['answer_option_ids']
+            ]
+            UserAnswerOptions.objects.bulk_create(user_answer_options)
+
+            # Счётчики результатов: участие - по пользователю в опросе, приращения - одним набором на опрос:
+            groups = defaultdict(lambda: ([], []))
+            for answer, row in answers:
+                groups[(row['quiz_id'], row['user_id'])][0].append(answer)
+            for user_answer_option in user_answer_options:
+                answer = user_answer_option.answer
+                groups[(answer.quiz_id, answer.user_id)][1].append(user_answer_option)
+            deltas = defaultdict(Counter)
+            for (quiz_id, answer_user_id), (group_answers, group_options) in groups.items():
+                deltas[quiz_id] += count_answers(quiz_id, answer_user_id, group_answers, group_options)
+            for quiz_id, quiz_deltas in deltas.items():
+                increment_result_counters(quiz_id, quiz_deltas)
+    except Exception:
+        queue.release([row['id'] for row in rows])
+        if failed:
+            dead_letter_answers(queue, failed)
+        raise
+
+    failed_ids = {row['id'] for row, _ in failed}
+    queue.remove([row['id'] for row in rows if row['id'] not in failed_ids])
+    if failed:
+        dead_letter_answers(queue, failed)
+    return len(answers)
+
+
+def split_orphaned_rows(rows):
+    """
+    Отделяет строки очереди, вопрос, выбранные варианты ответов или пользователь которых удалены после
+    постановки в очередь: их запись нарушила бы внешние ключи и откатывала бы каждую попытку записи пачки.
+    Возвращает (строки для записи, [(строка, ошибка)])
+    """
+    question_ids = set(Question.objects.filter(id__in={row['question_id'] for row in rows}).values_list(
+        'id', flat=True
+    ))
+    option_ids = set(QuestionAnswerOptions.all_objects.filter(
+        id__in={option_id for row in rows for option_id in row['answer_option_ids']}
+    ).values_list('id', flat=True))
+    user_ids = set(get_user_model().objects.filter(
+        id__in={row['user_id'] for row in rows if row['user_id'] is not None}
+    ).values_list('id', flat=True))
+
+    valid, failed = [], []
+    for row in rows:
+        if row['question_id'] not in question_ids:
+            failed.append((row, f'Вопрос {row["question_id"]} удалён'))
+        elif not option_ids.issuperset(row['answer_option_ids']):
+            missing_ids = sorted(set(row['answer_option_ids']) - option_ids)
+            failed.append((row, f'Варианты ответов {missing_ids} удалены'))
+        elif row['user_id'] is not None and row['user_id'] not in user_ids:
+            failed.append((row, f'Пользователь {row["user_id"]} удалён'))
+        else:
+            valid.append(row)
+    return valid, failed
+
+
+def dead_letter_answers(queue, failed):
+    for row, error in failed:
+        logger.warning('Queued answer %s is moved to dead_answer: %s', row['id'], error)
+    queue.dead_letter(failed)
+
+
+def insert_queued_answers(rows):
+    """
+    Записывает ответы из очереди массовой вставкой. Если вставка нарушает целостность, ответы записываются
+    по одному: повторные (ответ уже записан в обход очереди) отбрасываются, остальные ошибки возвращаются
+    для переноса в dead_answer. Возвращает ([(ответ, строка очереди)], [(строка очереди, ошибка)])
+    """
+    def build(row):
+        answer = Answer(user_id=row['user_id'], question_id=row['question_id'], text=row['text'])
+        answer.quiz_id = row['quiz_id']
+        return answer
+
+    try:
+        with transaction.atomic():
+            answers = bulk_create_with_ids(Answer, [build(row) for row in rows])
+        return list(zip(answers, rows)), []
+    except IntegrityError:
+        pass
+
+    inserted, failed = [], []
+    for row in rows:
+        try:
+            with transaction.atomic():
+                inserted.append((bulk_create_with_ids(Answer, [build(row)])[0], row))
+        except IntegrityError as e:
+            # Повторным ответом считается только нарушение уникальности ответа пользователя на вопрос:
+            if row['user_id'] is None or not Answer.objects.filter(
+                    user_id=row['user_id'], question_id=row['question_id']).exists():
+                failed.append((row, str(e)))
+    return inserted, failed
+
+
+def flush_user_answers(user_ids, batch_size=1000):
+    """
+    Записывает в базу ответы пользователей из очереди, чтобы чтение видело их собственные ответы.
+    Строки, уже забранные другим обработчиком, дожидаются его (не дольше READ_YOUR_WRITES_TIMEOUT).
+    Возвращает True, если в очереди были ответы пользователей: они только что записаны в основную базу
+    и ещё могут отсутствовать на репликах
+    """
+    queue = get_answer_queue()
+    deadline = time.monotonic() + READ_YOUR_WRITES_TIMEOUT
+    had_pending = False
+    for user_id in user_ids:
+        while queue.pending_count(user_id):
+            had_pending = True
+            if not flush_answer_queue(batch_size, user_id=user_id):
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)
+    return had_pending
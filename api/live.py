@@ -0,0 +1,354 @@
+import json
+import logging
+import select
+import threading
+import time
+from collections import Counter, deque, namedtuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger('api.live')
+
+# Ключи счётчиков результатов (ResultCounter.kind) и поля события delta:
+DELTA_FIELDS = {'QUESTION_ANSWERS': 'answers', 'OPTION_SELECTIONS': 'selections'}
+
+# Приращений в одном уведомлении NOTIFY: размер уведомления Postgres ограничен 8000 байт:
+NOTIFY_BATCH_SIZE = 200
+# Интервал проверки соединения слушателя и пауза перед переподключением (секунды):
+LISTEN_POLL_INTERVAL = 5
+LISTEN_RECONNECT_DELAY = 1
+
+# Сообщение канала: номер, приращения с версиями записи [(версия, приращения)] и общее событие delta:
+ResultsMessage = namedtuple('ResultsMessage', ['seq', 'updates', 'event'])
+
+
+class TxidSnapshot(namedtuple('TxidSnapshot', ['xmin', 'xmax', 'xip'])):
+    """
+    Snapshot транзакций Postgres (txid_current_snapshot()), в котором прочитаны счётчики: версия записи ответов
+    в Postgres - id её транзакции (txid_current()), записи, видимые в snapshot, уже учтены в результатах
+    """
+
+    @classmethod
+    def parse(cls, value):
+        xmin, xmax, xip = value.split(':')
+        return cls(int(xmin), int(xmax), frozenset(int(txid) for txid in xip.split(',') if txid))
+
+    def includes(self, version):
+        return version < self.xmin or (version < self.xmax and version not in self.xip)
+
+
+class CounterVersion(namedtuple('CounterVersion', ['value'])):
+    """
+    Версия результатов опроса (счётчик VERSION), в которой прочитаны счётчики: в SQLite записи выполняются
+    по одной, поэтому записи с версией не больше прочитанной уже учтены в результатах
+    """
+
+    def includes(self, version):
+        return version <= self.value
+
+
+def format_event(event, data, event_id=None):
+    """
+    Событие Server-Sent Events с данными в JSON
+    """
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines += [f'event: {event}', f'data: {json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))}', '', '']
+    return '\n'.join(lines).encode()
+
+
+def format_delta_event(seq, deltas):
+    """
+    Событие delta с приращениями счётчиков результатов опроса:
+    {"respondents": n, "answers": {id вопроса: n}, "selections": {id варианта ответа: n}}
+    """
+    data = {'respondents': 0, 'answers': {}, 'selections': {}}
+    for (kind, object_id), delta in deltas.items():
+        if kind == 'RESPONDENTS':
+            data['respondents'] += delta
+        else:
+            data[DELTA_FIELDS[kind]][object_id] = delta
+    return format_event('delta', data, seq)
+
+
+class ResultsChannel:
+    """
+    Канал обновлений результатов одного опроса. Приращения счётчиков копятся в течение LIVE_RESULTS_WINDOW секунд
+    и рассылаются подписчикам одним общим сообщением; последние LIVE_RESULTS_BACKLOG сообщений хранятся в канале,
+    подписчик помнит только номер последнего прочитанного
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = []
+        self.flush_scheduled = False
+        self.seq = 0
+        self.messages = deque(maxlen=settings.LIVE_RESULTS_BACKLOG)
+        self.subscribers = 0
+
+    def add(self, version, deltas):
+        """
+        Добавляет приращения записи ответов с версией version в текущее окно.
+        Возвращает True, если окно только что открыто и его нужно закрыть
+        """
+        with self.condition:
+            self.pending.append((version, deltas))
+            if self.flush_scheduled:
+                return False
+            self.flush_scheduled = True
+            return True
+
+    def flush(self):
+        with self.condition:
+            pending, self.pending = self.pending, []
+            self.flush_scheduled = False
+            if not pending:
+                return
+            self.seq += 1
+            self.messages.append(ResultsMessage(self.seq, pending, format_delta_event(self.seq, merge_deltas(pending))))
+            self.condition.notify_all()
+
+    def reset(self):
+        """
+        Сбрасывает сообщения канала: подписчики заново получат snapshot (например, после разрыва соединения
+        слушателя, за время которого приращения могли быть потеряны)
+        """
+        with self.condition:
+            self.pending = []
+            self.seq += 1
+            self.messages.clear()
+            self.condition.notify_all()
+
+    def wait(self, after_seq, timeout):
+        """
+        Ждёт сообщения с номером больше after_seq не дольше timeout секунд. Возвращает список ResultsMessage,
+        пустой список - если сообщений не было, None - если подписчик отстал и часть сообщений уже вытеснена
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > after_seq, timeout)
+            if self.seq == after_seq:
+                return []
+            if not self.messages or self.messages[0].seq > after_seq + 1:
+                return None
+            return [message for message in self.messages if message.seq > after_seq]
+
+
+def merge_deltas(updates, snapshot_version=None):
+    """
+    Сумма приращений [(версия, приращения)], не учтённых в snapshot версии snapshot_version
+    """
+    merged = Counter()
+    for version, deltas in updates:
+        if snapshot_version is None or not snapshot_version.includes(version):
+            merged.update(deltas)
+    return merged
+
+
+def get_message_event(message, snapshot_version):
+    """
+    Событие delta сообщения для подписчика, получившего snapshot версии snapshot_version (TxidSnapshot
+    или CounterVersion): приращения, уже учтённые в snapshot, отбрасываются.
+    Обычно все приращения новее и используется общее событие сообщения
+    """
+    if not any(snapshot_version.includes(version) for version, _ in message.updates):
+        return message.event
+    deltas = merge_deltas(message.updates, snapshot_version)
+    return format_delta_event(message.seq, deltas) if deltas else b''
+
+
+class ResultsBroker:
+    """
+    Брокер обновлений результатов опросов внутри процесса: один издатель (запись ответов или слушатель
+    уведомлений Postgres) на много подписчиков (потоки Server-Sent Events).
+    Приращения опросов без подписчиков отбрасываются
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}
+
+    def publish(self, quiz_id, version, deltas):
+        with self.lock:
+            channel = self.channels.get(quiz_id)
+        if channel is None or not channel.add(version, deltas):
+            return
+        timer = threading.Timer(settings.LIVE_RESULTS_WINDOW, channel.flush)
+        timer.daemon = True
+        timer.start()
+
+    def subscribe(self, quiz_id):
+        with self.lock:
+            channel = self.channels.setdefault(quiz_id, ResultsChannel())
+            channel.subscribers += 1
+        return channel
+
+    def unsubscribe(self, quiz_id, channel):
+        with self.lock:
+            channel.subscribers -= 1
+            if channel.subscribers == 0 and self.channels.get(quiz_id) is channel:
+                del self.channels[quiz_id]
+
+    def reset(self):
+        with self.lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            channel.reset()
+
+
+class ResultsListener(threading.Thread):
+    """
+    Поток процесса, который слушает канал LIVE_RESULTS_CHANNEL (LISTEN/NOTIFY Postgres) отдельным соединением
+    и передаёт приращения всех процессов брокеру процесса. После переподключения каналы брокера сбрасываются:
+    уведомления, отправленные без слушателя, потеряны
+    """
+
+    def __init__(self, broker):
+        super().__init__(name='results-listener', daemon=True)
+        self.broker = broker
+        self.ready = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception:
+                logger.exception('Results listener failed')
+            self.ready.clear()
+            time.sleep(LISTEN_RECONNECT_DELAY)
+
+    def listen(self):
+        database = connections[DEFAULT_DB_ALIAS]
+        connection = database.get_new_connection(database.get_connection_params())
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {database.ops.quote_name(settings.LIVE_RESULTS_CHANNEL)}')
+            self.broker.reset()
+            self.ready.set()
+            while True:
+                if not select.select([connection], [], [], LISTEN_POLL_INTERVAL)[0]:
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    data = json.loads(connection.notifies.pop(0).payload)
+                    deltas = {(kind, object_id): delta for kind, object_id, delta in data['deltas']}
+                    self.broker.publish(data['quiz'], data['version'], deltas)
+        finally:
+            connection.close()
+
+
+_broker = ResultsBroker()
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_results_broker():
+    return _broker
+
+
+def is_live_results_enabled():
+    return settings.LIVE_RESULTS_ENABLED
+
+
+def is_results_fanout_enabled():
+    """
+    Приращения рассылаются всем процессам через LISTEN/NOTIFY, если основная база - Postgres;
+    иначе (SQLite в разработке) подписчики получают только приращения своего процесса
+    """
+    return connections[DEFAULT_DB_ALIAS].vendor == 'postgresql'
+
+
+def start_results_listener():
+    """
+    Запускает слушателя уведомлений процесса и ждёт LISTEN: подписчик должен получать уведомления
+    до чтения snapshot
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = ResultsListener(get_results_broker())
+            _listener.start()
+    if not _listener.ready.wait(LISTEN_POLL_INTERVAL):
+        logger.warning('Results listener is not connected')
+
+
+def publish_result_deltas(quiz_id, version, deltas):
+    """
+    Отправляет подписчикам опроса приращения счётчиков результатов с версией опроса.
+    Вызывается после фиксации записи ответов
+    """
+    if not is_live_results_enabled():
+        return
+    if not is_results_fanout_enabled():
+        get_results_broker().publish(quiz_id, version, deltas)
+        return
+
+    items = [[kind, object_id, delta] for (kind, object_id), delta in deltas.items()]
+    try:
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            for i in range(0, len(items), NOTIFY_BATCH_SIZE):
+                payload = json.dumps({'quiz': quiz_id, 'version': version, 'deltas': items[i:i + NOTIFY_BATCH_SIZE]},
+                                     separators=(',', ':'))
+                cursor.execute('SELECT pg_notify(%s, %s)', [settings.LIVE_RESULTS_CHANNEL, payload])
+    except DatabaseError:
+        # Ответы уже записаны, подписчики увидят их в следующем snapshot:
+        logger.exception('Failed to publish result deltas of quiz %s', quiz_id)
+
+
+def release_connections():
+    # Поток событий не держит соединения с базами между snapshot: потоков воркера больше, чем соединений Postgres:
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def iter_results_events(quiz_id, load_snapshot):
+    """
+    Поток событий результатов опроса для одного подписчика: snapshot с текущими результатами
+    (load_snapshot возвращает версию snapshot и результаты), затем delta с приращениями, не учтёнными в snapshot.
+    Отставший подписчик получает snapshot заново, при отсутствии обновлений отправляется комментарий,
+    чтобы соединение не закрывалось по простою.
+    Через LIVE_RESULTS_TIMEOUT секунд поток завершается, EventSource переподключается сам
+    """
+    if is_results_fanout_enabled():
+        start_results_listener()
+    broker = get_results_broker()
+    # Подписка до чтения snapshot, чтобы не потерять приращения между ними; приращения, которые snapshot
+    # уже учитывает, отбрасываются по версии:
+    channel = broker.subscribe(quiz_id)
+    try:
+        seq = channel.seq
+        version, snapshot = load_snapshot()
+        release_connections()
+        yield f'retry: {settings.LIVE_RESULTS_RETRY_MS}\n\n'.encode() + format_event('snapshot', snapshot)
+        deadline = time.monotonic() + settings.LIVE_RESULTS_TIMEOUT
+        while time.monotonic() < deadline:
+            messages = channel.wait(seq, min(settings.LIVE_RESULTS_HEARTBEAT, deadline - time.monotonic()))
+            if messages is None:
+                seq = channel.seq
+                version, snapshot = load_snapshot()
+                release_connections()
+                yield format_event('snapshot', snapshot)
+            elif messages:
+                seq = messages[-1].seq
+                events = b''.join(get_message_event(message, version) for message in messages)
+                if events:
+                    yield events
+            else:
+                yield b': keep-alive\n\n'
+    finally:
+        broker.unsubscribe(quiz_id, channel)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Рендерер text/event-stream: нужен для согласования формата с EventSource,
+    ошибки запроса отдаются событием error
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event('error', data)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from api.archive import ARCHIVE_BATCH_SIZE, archive_quiz
+from api.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Переносит ответы завершённых опросов (end_date в прошлом) в архив ответов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', dest='quiz_ids',
+                            help='id опроса; можно указать несколько раз. По умолчанию - все завершённые опросы')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                            help='Количество ответов, переносимых одним набором запросов')
+
+    def handle(self, *args, quiz_ids=None, batch_size=ARCHIVE_BATCH_SIZE, **options):
+        # Архивные опросы с ответами, записанными во время архивации, архивируются повторно:
+        quizzes = Quiz.objects.filter(end_date__lt=timezone.localdate()).filter(
+            Q(archived=False) | Q(questions__answer__isnull=False)
+        )
+        if quiz_ids:
+            quizzes = quizzes.filter(id__in=quiz_ids)
+        quiz_ids = list(quizzes.order_by('id').values_list('id', flat=True).distinct())
+
+        answers_count = 0
+        for quiz_id in quiz_ids:
+            answers_count += archive_quiz(quiz_id, batch_size)
+
+        self.stdout.write(f'Перенесено в архив опросов: {len(quiz_ids)}, ответов: {answers_count}')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import EXPORT_FORMATS, iter_quiz_answer_rows
+from api.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка всех ответов на вопросы опроса в CSV или JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv', dest='file_format')
+        parser.add_argument('--output', help='Путь к файлу выгрузки. По умолчанию - stdout')
+
+    def handle(self, *args, quiz_id, file_format='csv', output=None, **options):
+        if not Quiz.objects.filter(id=quiz_id).exists():
+            raise CommandError(f'Опрос {quiz_id} не найден')
+        render, _ = EXPORT_FORMATS[file_format]
+        chunks = render(iter_quiz_answer_rows(quiz_id))
+
+        if output:
+            with open(output, 'w', newline='', encoding='utf-8') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
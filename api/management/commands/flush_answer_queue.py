@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ingestion import flush_answer_queue
+
+
+class Command(BaseCommand):
+    help = 'Переносит ответы из очереди отложенной записи (ANSWER_INGESTION=queue) в базу пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество ответов в одной транзакции')
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, ожидая новые ответы')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Пауза в секундах, если очередь пуста (с --loop)')
+
+    def handle(self, *args, batch_size=1000, loop=False, interval=0.5, **options):
+        flushed = 0
+        while True:
+            count = flush_answer_queue(batch_size)
+            flushed += count
+            if count:
+                continue
+            if not loop:
+                break
+            time.sleep(interval)
+
+        self.stdout.write(f'Записано ответов: {flushed}')
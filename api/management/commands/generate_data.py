@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from api.datagen import DATAGEN_BATCH_SIZE, DataGenerator
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетические данные для нагрузочного тестирования: пользователей с токенами, опросы, '
+            'вопросы, варианты ответов и ответы с неравномерной популярностью. Одинаковые seed и параметры '
+            'дают одинаковые данные')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Количество пользователей')
+        parser.add_argument('--quizzes', type=int, default=100, help='Количество опросов')
+        parser.add_argument('--questions', type=int, default=10, help='Количество вопросов в опросе')
+        parser.add_argument('--options', type=int, default=5, help='Количество вариантов ответа у вопросов с выбором')
+        parser.add_argument('--respondents', type=int, default=100,
+                            help='Среднее количество респондентов на опрос')
+        parser.add_argument('--anonymous', type=float, default=0.1, help='Доля анонимных респондентов')
+        parser.add_argument('--completion', type=float, default=0.9,
+                            help='Доля респондентов, переходящих к следующему вопросу')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель закона Ципфа для популярности опросов, вариантов и активности '
+                                 'пользователей (0 - равномерно)')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=DATAGEN_BATCH_SIZE,
+                            help='Количество строк модели, записываемых одним COPY или bulk_create')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='База данных для записи')
+
+    def handle(self, *args, seed=0, batch_size=DATAGEN_BATCH_SIZE, database=DEFAULT_DB_ALIAS, **options):
+        if not 0 <= options['anonymous'] <= 1 or not 0 <= options['completion'] <= 1:
+            raise CommandError('--anonymous и --completion задаются долей от 0 до 1')
+
+        started = time.perf_counter()
+        counts = DataGenerator(seed, database, batch_size).generate(**{
+            name: options[name]
+            for name in ['users', 'quizzes', 'questions', 'options', 'respondents', 'anonymous', 'completion', 'skew']
+        })
+        elapsed = time.perf_counter() - started
+
+        rows_count = sum(counts.values())
+        for model, count in counts.items():
+            self.stdout.write(f'{model._meta.label}: {count}')
+        self.stdout.write(f'Создано строк: {rows_count} за {elapsed:.1f} с ({rows_count / elapsed:.0f} строк/с)')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Quiz
+from api.participation import rebuild_quiz_participations
+from api.results import rebuild_result_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики результатов опросов и участие пользователей в опросах по сохранённым ответам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', dest='quiz_ids',
+                            help='id опроса; можно указать несколько раз. По умолчанию - все опросы')
+        parser.add_argument('--batch-size', type=int, default=100, help='Количество опросов в одной транзакции')
+
+    def handle(self, *args, quiz_ids=None, batch_size=100, **options):
+        if not quiz_ids:
+            quiz_ids = list(Quiz.objects.order_by('id').values_list('id', flat=True))
+
+        counters_count = participations_count = 0
+        for i in range(0, len(quiz_ids), batch_size):
+            counters_count += len(rebuild_result_counters(quiz_ids[i:i + batch_size]))
+            participations_count += len(rebuild_quiz_participations(quiz_ids[i:i + batch_size]))
+
+        self.stdout.write(f'Пересчитано опросов: {len(quiz_ids)}, счётчиков: {counters_count}, '
+                          f'участий: {participations_count}')
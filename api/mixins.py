@@ -0,0 +1,216 @@
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.response import Response
+
+from .cache import get_quiz_cache, get_quiz_cache_key, seconds_until_midnight, is_quiz_cache_settled, \
+    is_user_pinned_to_primary, pin_user_to_primary
+from .compiled import CompiledSerializer, get_compiled_serializer
+from .performance import get_request_performance, get_timed_serializer_class, performance_timing
+from .prefetch import prefetch_for_serializer
+from .routers import enable_replica_reads, is_replica_reads_enabled, replica_reads_scope
+from .selection import parse_field_selection, prune_prefetches
+
+
+class SerializerPrefetchMixin:
+    """
+    Миксин для вьюсетов: предзагружает связанные сущности, которые прочитает сериализатор вьюсета,
+    чтобы количество запросов на чтение не зависело от количества объектов
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        return prefetch_for_serializer(queryset, serializer)
+
+
+class QuizCacheMixin:
+    """
+    Миксин для вьюсетов: кеширует сериализованный ответ list и retrieve в кеше опросов.
+    Кеш сбрасывается при любом изменении опросов, вопросов и вариантов ответов
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        cache = get_quiz_cache()
+        key = get_quiz_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        # Ответ с реплики сразу после изменения опросов может быть устаревшим и в кеш не кладётся:
+        if response.status_code == status.HTTP_200_OK and (not is_replica_reads_enabled() or is_quiz_cache_settled()):
+            cache.set(key, response.data, timeout=seconds_until_midnight())
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Миксин для вьюсетов: поддержка условных запросов (If-None-Match / If-Modified-Since) для list и retrieve.
+    Вьюсет реализует get_validators, который одним запросом возвращает ревизию и время последнего изменения
+    выдачи; если клиент прислал актуальные валидаторы, отдаётся 304 без сериализации ответа
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_validators(self):
+        """
+        Возвращает (ревизия, время последнего изменения) или None, если условные запросы не поддерживаются
+        """
+        return None
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        try:
+            validators = self.get_validators()
+        except (TypeError, ValueError):
+            # Некорректный id в url: ответ (404/400) формирует сам обработчик
+            validators = None
+        if validators is None:
+            return handler(request, *args, **kwargs)
+
+        revision, last_modified = validators
+        scope = 'staff' if request.user.is_staff else 'public'
+        etag = quote_etag(hashlib.md5(f'{request.build_absolute_uri()}:{scope}:{revision}'.encode()).hexdigest())
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CompiledReadMixin:
+    """
+    Миксин для вьюсетов: list и retrieve сериализуются собранным сериализатором (api.compiled) из .values(),
+    если он поддерживает сериализатор вьюсета и включён настройкой COMPILED_SERIALIZERS.
+    Предзагрузки из get_queryset (SerializerPrefetchMixin, фильтры) используются для выборки вложенных уровней
+    """
+
+    def get_compiled_serializer(self):
+        if not settings.COMPILED_SERIALIZERS:
+            return None
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        # Сериализатор с выборкой полей собирается на запрос, в кеше по классу только полные:
+        if serializer.context.get('field_selection') is not None:
+            return CompiledSerializer.compile(serializer)
+        return get_compiled_serializer(serializer)
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = compiled.prepare(queryset)
+        page = self.paginate_queryset(rows)
+        with performance_timing(request, 'serialize'):
+            data = compiled.to_representation(rows if page is None else page, queryset._prefetch_related_lookups)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        # Объектные права проверяются на экземпляре модели, для них остаётся обычный путь:
+        if compiled is None or any(type(p).has_object_permission is not BasePermission.has_object_permission
+                                   for p in self.get_permissions()):
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(compiled.prepare(queryset), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        with performance_timing(request, 'serialize'):
+            data = compiled.to_representation([row], queryset._prefetch_related_lookups)[0]
+        return Response(data)
+
+
+class PerformanceMixin:
+    """
+    Миксин для вьюсетов: время работы сериализатора вьюсета учитывается в метриках запроса (api.performance)
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if get_request_performance(self.request) is None:
+            return super().get_serializer(*args, **kwargs)
+        serializer_class = get_timed_serializer_class(self.get_serializer_class())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+
+class FieldSelectionMixin:
+    """
+    Миксин для вьюсетов: выборка полей ответа параметрами ?fields= и ?expand= (api.selection) для чтения.
+    Выборка попадает в контекст сериализатора, поэтому по ней же строятся предзагрузки SerializerPrefetchMixin
+    и собранный сериализатор; предзагрузки, добавленные фильтрами, отбрасываются, если их поля не выбраны
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request is not None and self.request.method in SAFE_METHODS:
+            context['field_selection'] = parse_field_selection(self.request.query_params)
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        context = self.get_serializer_context()
+        if context.get('field_selection') is None:
+            return queryset
+        serializer = self.get_serializer_class()(context=context)
+        return queryset.prefetch_related(None).prefetch_related(
+            *prune_prefetches(queryset._prefetch_related_lookups, serializer)
+        )
+
+
+class ReadReplicaMixin:
+    """
+    Миксин для вьюсетов: безопасные запросы вьюсетов с read_from_replica читают с реплик (api.routers).
+    После успешной записи пользователь REPLICA_LAG_SECONDS читает с основной базы, чтобы видеть свои изменения
+    """
+    read_from_replica = False
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads_scope():
+            response = super().dispatch(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and self.request.user.is_authenticated:
+            pin_user_to_primary(self.request.user.id)
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS:
+            return
+        # Аутентификация и права проверяются по основной базе, реплики включаются для самого чтения:
+        wrote = self.prepare_read(request)
+        if self.read_from_replica and not wrote and not (
+                request.user.is_authenticated and is_user_pinned_to_primary(request.user.id)):
+            enable_replica_reads()
+
+    def prepare_read(self, request):
+        """
+        Вызывается перед включением чтения с реплик, пока запросы идут в основную базу.
+        Возвращает True, если запрос только что записал данные и должен читать с основной базы
+        """
+        return False
@@ -9,14 +9,29 @@ QUESTION_TYPE_CHOICES = (
 )
 
 
+class QuizQuerySet(models.QuerySet):
+    def touch(self):
+        """
+        Отмечает опросы изменёнными. Вызывается при изменении вопросов и вариантов ответов опроса
+        """
+        return self.update(updated_at=timezone.now())
+
+
 class Quiz(models.Model):
     """
     Модель для опросов
     """
     title = models.TextField(null=False, blank=False)
     start_date = models.DateField(null=False, blank=False, default=timezone.localdate())
-    end_date = models.DateField(null=False, blank=False, default=timezone.localdate())
+    # Индекс для выборки активных опросов (end_date > текущей даты):
+    end_date = models.DateField(null=False, blank=False, default=timezone.localdate(), db_index=True)
     description = models.TextField()
+    # Время последнего изменения опроса, его вопросов или вариантов ответов:
+    updated_at = models.DateTimeField(auto_now=True)
+    # Ответы завершённого опроса перенесены в архив (ArchivedResponse), новые ответы не принимаются:
+    archived = models.BooleanField(default=False)
+
+    objects = QuizQuerySet.as_manager()
 
 
 class Question(models.Model):
@@ -28,12 +43,27 @@ class Question(models.Model):
     quiz = models.ForeignKey(Quiz, related_name='questions', on_delete=models.CASCADE)
 
 
+class ActiveAnswerOptionsManager(models.Manager):
+    """
+    Менеджер вариантов ответов без выведенных из использования (is_retired)
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_retired=False)
+
+
 class QuestionAnswerOptions(models.Model):
     """
     Модель для вариантов ответов на вопросы
     """
     name = models.TextField(null=False, blank=False)
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answer_options')
+    # Вариант убран из вопроса, но остаётся для уже данных ответов, которые его выбрали:
+    is_retired = models.BooleanField(default=False)
+
+    # Менеджер по умолчанию (и question.answer_options) отдаёт только действующие варианты:
+    objects = ActiveAnswerOptionsManager()
+    all_objects = models.Manager()
 
 
 class Answer(models.Model):
@@ -44,7 +74,76 @@ class Answer(models.Model):
     user = models.ForeignKey(User, related_name='user', null=True, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, related_name='answer', on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            # Пользователь отвечает на вопрос один раз, анонимных ответов может быть сколько угодно.
+            # Индекс ограничения используется и для выборки ответов по (user_id, question_id):
+            models.UniqueConstraint(fields=['user', 'question'], condition=models.Q(user__isnull=False),
+                                    name='unique_user_question_answer'),
+        ]
+
 
 class UserAnswerOptions(models.Model):
     answer_option = models.ForeignKey(QuestionAnswerOptions, on_delete=models.CASCADE, null=True)
     answer = models.ForeignKey(Answer, on_delete=models.CASCADE, related_name='user_answer_options', null=True)
+
+
+RESULT_COUNTER_KIND_CHOICES = (
+    ('RESPONDENTS', 'RESPONDENTS'),
+    ('QUESTION_ANSWERS', 'QUESTION_ANSWERS'),
+    ('OPTION_SELECTIONS', 'OPTION_SELECTIONS'),
+    ('VERSION', 'VERSION'),
+)
+
+
+class ResultCounter(models.Model):
+    """
+    Модель для счётчиков результатов опросов.
+    object_id - id опроса (RESPONDENTS), вопроса (QUESTION_ANSWERS) или варианта ответа (OPTION_SELECTIONS).
+    VERSION (object_id - id опроса) - количество записей ответов опроса, упорядочивает приращения живых результатов
+    в SQLite (в Postgres версия записи - id транзакции)
+    """
+    quiz = models.ForeignKey(Quiz, related_name='result_counters', on_delete=models.CASCADE)
+    kind = models.CharField(choices=RESULT_COUNTER_KIND_CHOICES, max_length=30)
+    object_id = models.IntegerField()
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_result_counter'),
+        ]
+
+
+class QuizParticipation(models.Model):
+    """
+    Модель для участия пользователей в опросах: количество ответов пользователя на вопросы опроса
+    и время последнего ответа. Обновляется при записи ответов
+    """
+    user = models.ForeignKey(User, related_name='quiz_participations', on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, related_name='participations', on_delete=models.CASCADE)
+    answered_count = models.IntegerField(default=0)
+    last_answered_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'quiz'], name='unique_quiz_participation'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'last_answered_at'], name='participation_user_last_idx'),
+        ]
+
+
+class ArchivedResponse(models.Model):
+    """
+    Модель для архива ответов завершённых опросов: одна строка на респондента опроса (на каждый анонимный ответ -
+    отдельная строка). В data упакованы ответы: JSON [[id ответа, id вопроса, текст, [id вариантов ответов]], ...],
+    сжатый zlib (api.archive)
+    """
+    quiz = models.ForeignKey(Quiz, related_name='archived_responses', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='archived_responses', null=True, on_delete=models.CASCADE)
+    data = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quiz', 'user'], name='archived_quiz_user_idx'),
+        ]
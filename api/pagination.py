@@ -0,0 +1,111 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+from .search import SEARCH_RANK
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по составному ключу сортировки.
+
+    Курсор хранит значения всех полей сортировки последнего элемента страницы, а последним полем
+    сортировки всегда идёт id, поэтому позиция уникальна: следующая страница выбирается условием
+    по индексу без OFFSET, а общее количество строк (COUNT) не считается вовсе.
+    Сортировка берётся из атрибута ordering вьюсета, результаты поиска сортируются по релевантности.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('id',)
+    position_separator = '|'
+
+    def get_ordering(self, request, queryset, view):
+        # Результаты полнотекстового поиска (api.search) сортируются по релевантности:
+        if SEARCH_RANK in queryset.query.annotations:
+            return '-' + SEARCH_RANK, '-id'
+        self.ordering = getattr(view, 'ordering', None) or self.ordering
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            _, reverse, current_position = self.cursor
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self.get_keyset_condition(ordering, current_position))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # Запрашиваем на один элемент больше, чтобы понять, есть ли следующая страница:
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_keyset_condition(self, ordering, position):
+        """
+        Условие "строго после позиции" для составного ключа:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        values = position.split(self.position_separator)
+        if len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        for i, order in enumerate(ordering):
+            lookup = order.lstrip('-') + ('__lt' if order.startswith('-') else '__gt')
+            equal = {o.lstrip('-'): v for o, v in zip(ordering[:i], values[:i])}
+            condition |= Q(**equal, **{lookup: values[i]})
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                values.append(str(instance[field_name]))
+            else:
+                values.append(str(getattr(instance, field_name)))
+        return self.position_separator.join(values)
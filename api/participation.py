@@ -0,0 +1,63 @@
+from django.db import transaction, IntegrityError
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .archive import count_archived_answers
+from .models import Answer, QuizParticipation
+
+
+def record_participation(quiz_id, user_id, answered_count):
+    """
+    Учитывает новые ответы пользователя на вопросы опроса в таблице участия.
+    Возвращает True, если это первые ответы пользователя в опросе.
+    Вызывается в той же транзакции, что и запись ответов
+    """
+    now = timezone.now()
+    updated = QuizParticipation.objects.filter(user_id=user_id, quiz_id=quiz_id).update(
+        answered_count=F('answered_count') + answered_count, last_answered_at=now
+    )
+    if updated:
+        return False
+
+    try:
+        with transaction.atomic():
+            QuizParticipation.objects.create(
+                user_id=user_id, quiz_id=quiz_id, answered_count=answered_count, last_answered_at=now
+            )
+    except IntegrityError:
+        # Строку участия успела создать параллельная запись ответов этого же пользователя:
+        QuizParticipation.objects.filter(user_id=user_id, quiz_id=quiz_id).update(
+            answered_count=F('answered_count') + answered_count, last_answered_at=now
+        )
+        return False
+    return True
+
+
+def rebuild_quiz_participations(quiz_ids):
+    """
+    Пересчитывает участие пользователей в опросах по сохранённым ответам, включая архив.
+    Время ответа в ответах не хранится, поэтому для новых строк берётся текущее время,
+    а у существующих строк оно сохраняется
+    """
+    now = timezone.now()
+    last_answered_at = {
+        (quiz_id, user_id): value for quiz_id, user_id, value in QuizParticipation.objects.filter(
+            quiz_id__in=quiz_ids
+        ).values_list('quiz_id', 'user_id', 'last_answered_at')
+    }
+    _, answered_counts = count_archived_answers(quiz_ids)
+    for quiz_id, user_id, value in Answer.objects.filter(
+            question__quiz_id__in=quiz_ids, user__isnull=False
+    ).values_list('question__quiz_id', 'user_id').annotate(value=Count('id')).order_by():
+        answered_counts[(quiz_id, user_id)] += value
+
+    participations = [
+        QuizParticipation(quiz_id=quiz_id, user_id=user_id, answered_count=value,
+                          last_answered_at=last_answered_at.get((quiz_id, user_id), now))
+        for (quiz_id, user_id), value in answered_counts.items()
+    ]
+
+    with transaction.atomic():
+        QuizParticipation.objects.filter(quiz_id__in=quiz_ids).delete()
+        QuizParticipation.objects.bulk_create(participations, batch_size=1000)
+    return participations
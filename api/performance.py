@@ -0,0 +1,175 @@
+import heapq
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.fields import empty
+
+logger = logging.getLogger('api.performance')
+
+# Сколько самых долгих запросов к базе хранится для лога медленного запроса:
+TOP_QUERIES = 5
+
+
+class RequestPerformance:
+    """
+    Метрики одного запроса: SQL-запросы и время базы, время сериализации и отрисовки ответа.
+    Запросы к базе считаются через connection.execute_wrapper и не зависят от DEBUG
+    """
+
+    def __init__(self):
+        self.tag = None
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = {'serialize': 0.0, 'render': 0.0}
+        self.top_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += duration
+            # Куча минимального размера хранит только TOP_QUERIES самых долгих запросов:
+            if len(self.top_queries) < TOP_QUERIES:
+                heapq.heappush(self.top_queries, (duration, sql))
+            elif duration > self.top_queries[0][0]:
+                heapq.heapreplace(self.top_queries, (duration, sql))
+
+    @contextmanager
+    def timing(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - started
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """
+        Значение заголовка Server-Timing (длительности в миллисекундах)
+        """
+        metrics = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            *(f'{name};dur={value * 1000:.1f}' for name, value in self.timings.items()),
+            f'total;dur={self.total_time * 1000:.1f}',
+        ]
+        if self.tag:
+            metrics.append(f'view;desc="{self.tag}"')
+        return ', '.join(metrics)
+
+
+def get_request_performance(request):
+    """
+    Метрики запроса или None, если запрос не попал в выборку
+    """
+    return getattr(request, 'performance', None)
+
+
+@contextmanager
+def performance_timing(request, name):
+    """
+    Учитывает время блока в метрике name, если запрос попал в выборку
+    """
+    performance = get_request_performance(request) if request is not None else None
+    if performance is None:
+        yield
+    else:
+        with performance.timing(name):
+            yield
+
+
+_timed_serializer_classes = {}
+
+
+def get_timed_serializer_class(serializer_class):
+    """
+    Подкласс сериализатора, который учитывает время to_representation и run_validation в метрике serialize.
+    Время вложенных сериализаторов входит во время корневого, запросы к базе из сериализатора - и в db
+    """
+    if serializer_class not in _timed_serializer_classes:
+        def to_representation(self, instance):
+            with performance_timing(self.context.get('request'), 'serialize'):
+                return super(timed_class, self).to_representation(instance)
+
+        def run_validation(self, data=empty):
+            with performance_timing(self.context.get('request'), 'serialize'):
+                return super(timed_class, self).run_validation(data)
+
+        timed_class = type(serializer_class)(serializer_class.__name__, (serializer_class,), {
+            '__module__': serializer_class.__module__,
+            'to_representation': to_representation,
+            'run_validation': run_validation,
+        })
+        _timed_serializer_classes[serializer_class] = timed_class
+    return _timed_serializer_classes[serializer_class]
+
+
+class PerformanceMiddleware:
+    """
+    Собирает метрики запросов к API (доля запросов задаётся PERFORMANCE_SAMPLE_RATE), отдаёт их
+    в заголовке Server-Timing (кроме потоковых ответов) и пишет в лог запросы дольше PERFORMANCE_SLOW_REQUEST_MS
+    с самыми долгими SQL.
+    Запросы помечаются вьюсетом и действием: QuizViewSet.list, AnswerViewSet.create, ...
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith('/api/') or random.random() >= settings.PERFORMANCE_SAMPLE_RATE:
+            return self.get_response(request)
+
+        performance = request.performance = RequestPerformance()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(performance))
+            response = self.get_response(request)
+
+        # Тело потокового ответа формируется после выхода из middleware, его метрики были бы неполными:
+        if response.streaming:
+            return response
+        response['Server-Timing'] = performance.server_timing()
+
+        total_ms = performance.total_time * 1000
+        if total_ms >= settings.PERFORMANCE_SLOW_REQUEST_MS:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.1f мс, SQL: %s запросов за %.1f мс, самые долгие: %s',
+                request.method, request.path, performance.tag, total_ms, performance.queries,
+                performance.db_time * 1000,
+                [(round(duration * 1000, 1), sql) for duration, sql in sorted(performance.top_queries, reverse=True)]
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        performance = get_request_performance(request)
+        view_class = getattr(view_func, 'cls', None)
+        if performance is None or view_class is None:
+            return None
+        # Для вьюсетов действие берётся из отображения методов на действия, для остальных вью - метод:
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        performance.tag = f'{view_class.__name__}.{action}'
+        return None
+
+    def process_template_response(self, request, response):
+        # Ответ DRF отрисовывается после этого хука, учитывается время самого response.render():
+        performance = get_request_performance(request)
+        if performance is not None:
+            render = response.render
+
+            def timed_render():
+                with performance.timing('render'):
+                    return render()
+
+            response.render = timed_render
+        return response
@@ -0,0 +1,37 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def prefetch_for_serializer(queryset, serializer):
+    """
+    Добавляет в queryset предзагрузку всех связанных сущностей, которые прочитает сериализатор
+    """
+    return queryset.prefetch_related(*get_serializer_prefetches(queryset.model, serializer))
+
+
+def get_serializer_prefetches(model, serializer):
+    """
+    Обходит дерево полей сериализатора и возвращает список Prefetch для вложенных сериализаторов
+    и many-полей. Вложенные сериализаторы обрабатываются рекурсивно, поэтому стоимость выборки
+    не зависит от количества объектов на каждом уровне
+    """
+    prefetches = []
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+
+        if isinstance(field, serializers.ManyRelatedField):
+            prefetches.append(field.source)
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            nested_serializer = field.child
+        elif isinstance(field, serializers.BaseSerializer):
+            nested_serializer = field
+        else:
+            continue
+
+        related_model = model._meta.get_field(field.source).related_model
+        queryset = prefetch_for_serializer(related_model._default_manager.all(), nested_serializer)
+        prefetches.append(Prefetch(field.source, queryset=queryset))
+
+    return prefetches
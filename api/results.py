@@ -0,0 +1,176 @@
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction, connections, router
+from django.db.models import Count, F, Q
+
+from .archive import count_archived_answers
+from .live import CounterVersion, TxidSnapshot, is_live_results_enabled, publish_result_deltas
+from .models import Answer, ResultCounter, UserAnswerOptions
+from .participation import record_participation
+
+
+def increment_result_counters(quiz_id, deltas):
+    """
+    Атомарно увеличивает счётчики результатов опроса.
+    deltas - словарь {(kind, object_id): приращение}
+    """
+    if not deltas:
+        return
+
+    # Недостающие счётчики создаются с нулевым значением, существующие не трогаются:
+    ResultCounter.objects.bulk_create([
+        ResultCounter(quiz_id=quiz_id, kind=kind, object_id=object_id) for kind, object_id in deltas
+    ], ignore_conflicts=True)
+
+    # Одно UPDATE ... SET value = value + delta на каждое различное приращение:
+    keys_by_delta = defaultdict(lambda: defaultdict(list))
+    for (kind, object_id), delta in deltas.items():
+        keys_by_delta[delta][kind].append(object_id)
+    for delta, keys in keys_by_delta.items():
+        condition = reduce(or_, (Q(kind=kind, object_id__in=ids) for kind, ids in keys.items()))
+        ResultCounter.objects.filter(condition).update(value=F('value') + delta)
+
+    if not is_live_results_enabled():
+        return
+
+    # Подписчики живых результатов получают приращения с версией записи после фиксации транзакции:
+    version = get_result_version(quiz_id)
+    deltas = dict(deltas)
+    transaction.on_commit(lambda: publish_result_deltas(quiz_id, version, deltas))
+
+
+def get_result_version(quiz_id):
+    """
+    Версия записи ответов для живых результатов.
+    В Postgres это id текущей транзакции (txid_current()) без блокировок: видна ли запись в snapshot счётчиков,
+    определяет txid_current_snapshot(). В SQLite записи выполняются по одной, и версия - счётчик VERSION опроса,
+    увеличенный одним запросом (UPDATE ... RETURNING)
+    """
+    connection = connections[router.db_for_write(ResultCounter)]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT txid_current()')
+            return cursor.fetchone()[0]
+
+        ResultCounter.objects.bulk_create([ResultCounter(quiz_id=quiz_id, kind='VERSION', object_id=quiz_id)],
+                                          ignore_conflicts=True)
+        table = connection.ops.quote_name(ResultCounter._meta.db_table)
+        cursor.execute(f'UPDATE {table} SET value = value + 1 WHERE kind = %s AND object_id = %s RETURNING value',
+                       ['VERSION', quiz_id])
+        return cursor.fetchone()[0]
+
+
+def count_answers(quiz_id, user_id, answers, user_answer_options):
+    """
+    Приращения счётчиков результатов для только что записанных ответов одного пользователя на вопросы опроса.
+    Заодно учитывает ответы в участии пользователя в опросе
+    """
+    deltas = Counter()
+    for answer in answers:
+        deltas[('QUESTION_ANSWERS', answer.question_id)] += 1
+    for user_answer_option in user_answer_options:
+        deltas[('OPTION_SELECTIONS', user_answer_option.answer_option_id)] += 1
+
+    # Респондентами считаются авторизованные пользователи, для которых эти ответы - первые в опросе:
+    if user_id is not None and record_participation(quiz_id, user_id, len(answers)):
+        deltas[('RESPONDENTS', quiz_id)] += 1
+    return deltas
+
+
+def record_answers(quiz_id, user_id, answers, user_answer_options):
+    """
+    Учитывает в счётчиках результатов и в участии пользователя только что записанные ответы
+    на вопросы одного опроса. Вызывается в той же транзакции, что и запись ответов
+    """
+    increment_result_counters(quiz_id, count_answers(quiz_id, user_id, answers, user_answer_options))
+
+
+def get_quiz_results(quiz):
+    """
+    Результаты опроса по счётчикам. Вопросы и варианты ответов должны быть предзагружены
+    """
+    return build_quiz_results(quiz, load_result_counters(quiz.result_counters.all()))
+
+
+def get_live_results(quiz):
+    """
+    Версия snapshot и результаты опроса для живых результатов. Счётчики читаются с основной базы одним запросом
+    вместе с версией: в Postgres - со snapshot транзакций (txid_current_snapshot()), в SQLite - со счётчиком VERSION.
+    Результаты учитывают все записи ответов, которые включает версия snapshot
+    """
+    connection = connections[router.db_for_write(ResultCounter)]
+    if connection.vendor != 'postgresql':
+        counters = load_result_counters(quiz.result_counters.using(connection.alias))
+        return CounterVersion(counters.get(('VERSION', quiz.id), 0)), build_quiz_results(quiz, counters)
+
+    table = connection.ops.quote_name(ResultCounter._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT txid_current_snapshot()::text, c.kind, c.object_id, c.value FROM (SELECT 1) s '
+                       f'LEFT JOIN {table} c ON c.quiz_id = %s', [quiz.id])
+        rows = cursor.fetchall()
+    counters = {(kind, object_id): value for _, kind, object_id, value in rows if kind is not None}
+    return TxidSnapshot.parse(rows[0][0]), build_quiz_results(quiz, counters)
+
+
+def load_result_counters(queryset):
+    return {
+        (kind, object_id): value
+        for kind, object_id, value in queryset.values_list('kind', 'object_id', 'value')
+    }
+
+
+def build_quiz_results(quiz, counters):
+    return {
+        'id': quiz.id,
+        'title': quiz.title,
+        'respondents': counters.get(('RESPONDENTS', quiz.id), 0),
+        'questions': [
+            {
+                'id': question.id,
+                'text': question.text,
+                'type': question.type,
+                'answers': counters.get(('QUESTION_ANSWERS', question.id), 0),
+                'answer_options': [
+                    {
+                        'id': option.id,
+                        'name': option.name,
+                        'selections': counters.get(('OPTION_SELECTIONS', option.id), 0),
+                    } for option in question.answer_options.all()
+                ]
+            } for question in quiz.questions.all()
+        ]
+    }
+
+
+def rebuild_result_counters(quiz_ids):
+    """
+    Пересчитывает счётчики результатов опросов по сохранённым ответам, включая архив
+    """
+    answers = Answer.objects.filter(question__quiz_id__in=quiz_ids)
+    respondents = answers.filter(user__isnull=False).values_list('question__quiz_id').annotate(
+        value=Count('user_id', distinct=True)
+    )
+    question_answers = answers.values_list('question__quiz_id', 'question_id').annotate(value=Count('id'))
+    option_selections = UserAnswerOptions.objects.filter(
+        answer_option__question__quiz_id__in=quiz_ids
+    ).values_list('answer_option__question__quiz_id', 'answer_option_id').annotate(value=Count('id'))
+
+    values, _ = count_archived_answers(quiz_ids)
+    for quiz_id, value in respondents:
+        values[(quiz_id, 'RESPONDENTS', quiz_id)] += value
+    for quiz_id, question_id, value in question_answers:
+        values[(quiz_id, 'QUESTION_ANSWERS', question_id)] += value
+    for quiz_id, option_id, value in option_selections:
+        values[(quiz_id, 'OPTION_SELECTIONS', option_id)] += value
+    counters = [
+        ResultCounter(quiz_id=quiz_id, kind=kind, object_id=object_id, value=value)
+        for (quiz_id, kind, object_id), value in values.items()
+    ]
+
+    with transaction.atomic():
+        # Версии опросов сохраняются: подписчики живых результатов сравнивают с ними приращения:
+        ResultCounter.objects.filter(quiz_id__in=quiz_ids).exclude(kind='VERSION').delete()
+        ResultCounter.objects.bulk_create(counters, batch_size=1000)
+    return counters
@@ -0,0 +1,58 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Разрешены ли чтения с реплик в текущем потоке (включается вьюсетами, api.mixins.ReadReplicaMixin):
+_state = threading.local()
+
+
+@contextmanager
+def replica_reads_scope():
+    """
+    Область запроса: внутри неё чтения можно перевести на реплики вызовом enable_replica_reads,
+    после выхода восстанавливается прежнее состояние
+    """
+    previous = getattr(_state, 'enabled', False)
+    _state.enabled = False
+    try:
+        yield
+    finally:
+        _state.enabled = previous
+
+
+def enable_replica_reads():
+    _state.enabled = True
+
+
+def is_replica_reads_enabled():
+    """
+    Идут ли сейчас чтения на реплики: они разрешены для запроса, реплики настроены и нет транзакции основной базы
+    """
+    return (getattr(_state, 'enabled', False) and bool(settings.REPLICA_DATABASES)
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block)
+
+
+class ReadReplicaRouter:
+    """
+    Направляет чтения на случайную реплику из REPLICA_DATABASES, если они разрешены для текущего запроса,
+    остальное - на основную базу. Внутри транзакции основной базы чтения остаются на ней,
+    чтобы код записи видел свои изменения. Миграции применяются только к основной базе
+    """
+
+    def db_for_read(self, model, **hints):
+        if not is_replica_reads_enabled():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база:
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,135 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Quiz, Question, Answer
+
+# Поля полнотекстового поиска по моделям:
+SEARCH_FIELDS = {
+    Quiz: ['title', 'description'],
+    Question: ['text'],
+    Answer: ['text'],
+}
+# Аннотация релевантности результатов поиска (чем больше, тем выше), по ней сортирует пагинация:
+SEARCH_RANK = 'search_rank'
+
+
+def get_search_config():
+    config = settings.SEARCH_CONFIG
+    # Конфигурация подставляется в SQL литералом, чтобы выражение запроса совпадало с выражением индекса:
+    if not re.fullmatch(r'\w+', config):
+        raise ValueError(f'Некорректная конфигурация полнотекстового поиска: {config}')
+    return config
+
+
+def get_search_table(model):
+    return f'{model._meta.db_table}_search'
+
+
+def get_search_columns(model):
+    """
+    Колонки поиска с именем таблицы, чтобы выражения не зависели от присоединённых в запросе таблиц
+    """
+    table = model._meta.db_table
+    return [f'"{table}"."{model._meta.get_field(name).column}"' for name in SEARCH_FIELDS[model]]
+
+
+def get_search_vector(model):
+    """
+    Выражение tsvector индекса Postgres: поля модели через пробел
+    """
+    columns = " || ' ' || ".join(get_search_columns(model))
+    return f"to_tsvector('{get_search_config()}', {columns})"
+
+
+def get_search_condition(model):
+    """
+    Условие частичного индекса Postgres: строки без текста (ответы на вопросы с вариантами) в индекс не попадают
+    """
+    return ' AND '.join(f'{column} IS NOT NULL' for column in get_search_columns(model))
+
+
+def create_search_indexes(using='default'):
+    """
+    Создаёт полнотекстовые индексы, которые база обновляет сама при любой записи, в том числе массовой:
+    в Postgres - GIN-индексы по выражению tsvector, в SQLite - таблицы FTS5 с внешним содержимым и триггеры.
+    Вызывается после миграций (post_migrate), повторный вызов ничего не меняет
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model, field_names in SEARCH_FIELDS.items():
+            table = model._meta.db_table
+            index = get_search_table(model)
+            columns = [model._meta.get_field(name).column for name in field_names]
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS "{index}_idx" ON "{table}" '
+                               f'USING gin (({get_search_vector(model)})) WHERE {get_search_condition(model)}')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('SELECT 1 FROM sqlite_master WHERE name = %s', [index])
+                if cursor.fetchone():
+                    continue
+                column_list = ', '.join(columns)
+                new_values = ', '.join(f'new.{column}' for column in columns)
+                old_values = ', '.join(f'old.{column}' for column in columns)
+                cursor.execute(f"CREATE VIRTUAL TABLE {index} USING fts5({column_list}, content='{table}', "
+                               f"content_rowid='id')")
+                cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+                insert = f'INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values});'
+                delete = f"INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+                cursor.execute(f'CREATE TRIGGER {index}_ai AFTER INSERT ON {table} BEGIN {insert} END')
+                cursor.execute(f'CREATE TRIGGER {index}_ad AFTER DELETE ON {table} BEGIN {delete} END')
+                cursor.execute(f'CREATE TRIGGER {index}_au AFTER UPDATE OF {column_list} ON {table} '
+                               f'BEGIN {delete} {insert} END')
+
+
+def create_search_indexes_on_migrate(sender, using, **kwargs):
+    if router.allow_migrate(using, sender.label):
+        create_search_indexes(using)
+
+
+def filter_search_match(queryset, condition):
+    # Условие на сырых выражениях фильтруется через аннотацию (filter по выражению появился в Django 3.0):
+    return queryset.annotate(search_match=condition).filter(search_match=True)
+
+
+def search_queryset(queryset, query):
+    """
+    Отбирает строки queryset, содержащие все слова запроса, и аннотирует их релевантностью (SEARCH_RANK).
+    В Postgres слова приводятся к словарной форме (конфигурация SEARCH_CONFIG), в SQLite ищутся по началу слова
+    """
+    model = queryset.model
+    words = re.findall(r'\w+', query)
+    if not words:
+        return queryset.none()
+
+    table, pk_column = model._meta.db_table, model._meta.pk.column
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        vector = get_search_vector(model)
+        tsquery = f"plainto_tsquery('{get_search_config()}', %s)"
+        query = ' '.join(words)
+        return filter_search_match(queryset, RawSQL(
+            f'{get_search_condition(model)} AND {vector} @@ {tsquery}', [query], BooleanField()
+        )).annotate(**{SEARCH_RANK: RawSQL(f'ts_rank({vector}, {tsquery})::float8', [query], FloatField())})
+    if vendor == 'sqlite':
+        index = get_search_table(model)
+        match = ' '.join(f'"{word}"*' for word in words)
+        # rank в FTS5 тем меньше, чем выше релевантность:
+        return filter_search_match(queryset, RawSQL(
+            f'"{table}"."{pk_column}" IN (SELECT rowid FROM {index} WHERE {index} MATCH %s)', [match], BooleanField()
+        )).annotate(**{SEARCH_RANK: RawSQL(
+            f'SELECT -rank FROM {index} WHERE {index} MATCH %s AND rowid = "{table}"."{pk_column}"', [match],
+            FloatField()
+        )})
+
+    # Базы без полнотекстового поиска - поиск подстрок без ранжирования:
+    condition = reduce(and_, (
+        reduce(or_, (Q(**{f'{name}__icontains': word}) for name in SEARCH_FIELDS[model]))
+        for word in words
+    ))
+    return queryset.filter(condition).annotate(**{SEARCH_RANK: Value(0.0, FloatField())})
@@ -0,0 +1,108 @@
+from django.db.models import Prefetch
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_field_selection(query_params):
+    """
+    Разбирает параметры ?fields= и ?expand= в деревья имён полей ({'questions': {'text': {}}}).
+    ?fields=id,title,questions.text - выбранные поля (вложенные через точку), без него - все поля модели;
+    ?expand=questions,questions.answer_options - вложенные сущности, которые отдаются целиком.
+    Возвращает (fields или None, expand) или None, если выборка полей не запрошена
+    """
+    fields, expand = query_params.get('fields'), query_params.get('expand')
+    if fields is None and expand is None:
+        return None
+    return (parse_field_paths(fields) if fields is not None else None), parse_field_paths(expand or '')
+
+
+def parse_field_paths(value):
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def get_nested_serializer(field):
+    """
+    Вложенный сериализатор поля (для many - сериализатор элемента) или None для простых полей
+    """
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+def select_fields(serializer, fields, expand, path=''):
+    """
+    Убирает из сериализатора невыбранные поля. Простые поля остаются, если выбраны в fields (или fields не задан),
+    вложенные сериализаторы - только если выбраны в fields или expand; внутри них выборка применяется рекурсивно
+    """
+    unknown = set(fields or ()) | set(expand)
+    for name, field in list(serializer.fields.items()):
+        unknown.discard(name)
+        nested = get_nested_serializer(field)
+        if nested is None:
+            if fields is not None and name not in fields:
+                serializer.fields.pop(name)
+            continue
+        if name not in (fields or ()) and name not in expand:
+            serializer.fields.pop(name)
+            continue
+        select_fields(nested, (fields or {}).get(name) or None, expand.get(name, {}), f'{path}{name}.')
+
+    if unknown:
+        raise ValidationError({'ValidationError': f'Неизвестные поля: {sorted(path + name for name in unknown)}'})
+
+
+def prune_prefetches(lookups, serializer):
+    """
+    Оставляет из предзагрузок queryset только те, которые прочитает сериализатор с выборкой полей,
+    в том числе внутри queryset'ов Prefetch (например, добавленных фильтрами)
+    """
+    pruned = []
+    for lookup in lookups:
+        path = lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+        nested = serializer
+        for name in path.split(LOOKUP_SEP):
+            field = nested.fields.get(name) if nested is not None else None
+            if field is None or field.write_only:
+                break
+            nested = get_nested_serializer(field)
+        else:
+            if isinstance(lookup, Prefetch) and lookup.queryset is not None and nested is not None:
+                queryset = lookup.queryset
+                queryset = queryset.prefetch_related(None).prefetch_related(
+                    *prune_prefetches(queryset._prefetch_related_lookups, nested)
+                )
+                lookup = Prefetch(lookup.prefetch_through, queryset=queryset, to_attr=lookup.to_attr)
+            pruned.append(lookup)
+    return pruned
+
+
+def is_root_serializer(serializer):
+    parent = serializer.parent
+    return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+
+class SelectableFieldsMixin:
+    """
+    Миксин для сериализаторов верхнего уровня: применяет выборку полей из контекста (field_selection),
+    которую вьюсет разбирает из ?fields= и ?expand= (mixins.FieldSelectionMixin)
+    """
+
+    @cached_property
+    def fields(self):
+        fields = super().fields
+        selection = self.context.get('field_selection')
+        if selection is not None and is_root_serializer(self):
+            select_fields(self, *selection)
+        return fields
@@ -1,9 +1,54 @@
 from django.contrib.auth.models import AnonymousUser
+from django.db import transaction, router, IntegrityError
 from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from .cache import get_question_meta
+from .fields import BatchPrimaryKeyRelatedField, BatchRelatedListSerializer
+from .ingestion import get_answer_queue, is_answer_queue_enabled, DuplicateQueuedAnswer
 from .models import Quiz, Question, Answer, QuestionAnswerOptions, UserAnswerOptions
+from .results import record_answers
+from .selection import SelectableFieldsMixin
+from .signals import quiz_content_changed
+from .utils import bulk_create_with_ids
+
+
+def validate_answer_options(question_type, answer_option_ids, question_answer_option_ids):
+    """
+    Валидация выбранных вариантов ответов по типу вопроса
+    """
+    if question_type == 'SINGLE_ANSWER_OPTION':
+        if len(answer_option_ids) != 1:
+            raise ValidationError({
+                'ValidationError': 'Для вопроса с типом "SINGLE_ANSWER_OPTION" '
+                                   'должно быть заполнен один вариант ответа'})
+    elif question_type == 'MULTIPLE_ANSWER_OPTION':
+        if len(answer_option_ids) < 1:
+            raise ValidationError({
+                'ValidationError': 'Для вопроса с типом "MULTIPLE_ANSWER_OPTION" '
+                                   'должно быть заполнен хотя бы один вариант ответа'})
+
+    check_answer_options = set(answer_option_ids) - set(question_answer_option_ids)
+    if check_answer_options:
+        raise ValidationError({'ValidationError': 'В запросе присутствуют варианты ответов, не соответствующие '
+                                                  f'предложенным в вопросе: {check_answer_options}'})
+
+
+def get_referenced_answer_option_ids(question, answer_option_ids):
+    """
+    Варианты ответов из answer_option_ids, на которые могут ссылаться ответы: выбранные в ответах,
+    а также все варианты архивного опроса (архив хранит id вариантов) и при отложенной записи ответов
+    (ответы в очереди ещё не записаны в базу).
+    Вызывается в транзакции после блокировки вариантов (select_for_update): ответ, записанный параллельно,
+    либо уже виден, либо ждёт конца транзакции и не ссылается на удалённый вариант
+    """
+    if question.quiz.archived or is_answer_queue_enabled():
+        return set(answer_option_ids)
+    return set(UserAnswerOptions.objects.filter(answer_option_id__in=answer_option_ids).values_list(
+        'answer_option_id', flat=True
+    ).distinct())
 
 
 class UserAnswerOptionsSerializer(serializers.ModelSerializer):
@@ -11,26 +56,54 @@ class UserAnswerOptionsSerializer(serializers.ModelSerializer):
     Сериализатор для выбранных пользователем вариантов ответов
     """
 
+    answer_option = BatchPrimaryKeyRelatedField(queryset=QuestionAnswerOptions.objects.all())
+
     class Meta:
         model = UserAnswerOptions
         fields = ['answer_option', ]
+        # Выбранные варианты ответов всего списка выбираются одним запросом:
+        list_serializer_class = BatchRelatedListSerializer
 
 
 class QuestionsAnswerOptionsSerializer(serializers.ModelSerializer):
     """
-    Сериализатор для вариантов ответа на вопрос
+    Сериализатор для вариантов ответа на вопрос. При изменении вопроса id связывает вариант запроса с существующим
     """
 
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = QuestionAnswerOptions
         fields = ['id', 'name', ]
 
 
-class AnswerSerializer(serializers.ModelSerializer):
+class QuestionMetaField(serializers.PrimaryKeyRelatedField):
+    """
+    Поле вопроса, которое проверяет id по метаданным вопроса (api.cache.get_question_meta)
+    и возвращает экземпляр Question без отдельного запроса
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            question_id = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        meta = get_question_meta(question_id, self.context.get('request'))
+        if meta is None:
+            self.fail('does_not_exist', pk_value=data)
+        return Question.from_db(router.db_for_read(Question), ['id', 'type', 'quiz_id'],
+                                [meta.id, meta.type, meta.quiz_id])
+
+
+class AnswerSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для ответов
     """
 
+    question = QuestionMetaField(queryset=Question.objects.all())
     user_answer_options = UserAnswerOptionsSerializer(many=True)
 
     class Meta:
@@ -39,31 +112,45 @@ class AnswerSerializer(serializers.ModelSerializer):
 
     def get_fields(self):
         fields = super().get_fields()
+        question_meta = self.get_question_meta()
+        if question_meta is not None and question_meta.type == 'TEXT':
+            fields['text'].required = True
+            fields['user_answer_options'].required = False
+
+        return fields
+
+    def get_question_meta(self):
+        """
+        Метаданные вопроса из данных запроса или None
+        """
         request = self.context.get('request')
         question_id = request.data.get('question')
+        # При чтении (и во вложенных сериализаторах) вопроса в запросе нет:
+        if question_id is None:
+            return None
         try:
-            question_obj = Question.objects.get(id=question_id)
-            if question_obj.type == 'TEXT':
-                fields['text'].required = True
-                fields['user_answer_options'].required = False
-        except Question.DoesNotExist:
-            pass
+            return get_question_meta(int(question_id), request)
+        except (TypeError, ValueError):
+            return None
 
-        return fields
+    def get_batch_pks(self, field_name):
+        # Выбранные варианты ответов проверяются по закешированным вариантам вопроса, без запроса:
+        question_meta = self.get_question_meta()
+        if question_meta is None:
+            return frozenset()
+        return question_meta.answer_option_ids
 
     def validate(self, attrs):
         user = self.context['request'].user
         question = attrs['question']
         user_answer_options = attrs.get('user_answer_options')
 
-        # Валидация пользователя:
-        if isinstance(user, AnonymousUser):
-            attrs.update({'user': None})
-        else:
-            check_answer = Answer.objects.filter(user=user, question=question)
-            if check_answer:
-                raise ValidationError({'ValidationError': 'Вы уже ответили на данный вопрос'})
-            attrs.update({'user': user})
+        # Ответы на вопросы опросов, перенесённых в архив, не принимаются:
+        if get_question_meta(question.id, self.context['request']).quiz_archived:
+            raise ValidationError({'ValidationError': 'Опрос перенесён в архив и не принимает ответы'})
+
+        # Валидация пользователя (повторный ответ отсекается ограничением уникальности при записи):
+        attrs.update({'user': None if isinstance(user, AnonymousUser) else user})
 
         # Валидация ответов по типу вопроса:
         if question.type == 'TEXT':
@@ -71,54 +158,216 @@ class AnswerSerializer(serializers.ModelSerializer):
                 attrs.pop('user_answer_options')
             except KeyError:
                 pass
-        elif question.type == 'SINGLE_ANSWER_OPTION':
-            if len(user_answer_options) != 1:
-                raise ValidationError({
-                    'ValidationError': 'Для вопроса с типом "SINGLE_ANSWER_OPTION" '
-                                       'должно быть заполнен один вариант ответа'})
-        elif question.type == 'MULTIPLE_ANSWER_OPTION':
-            if len(user_answer_options) < 1:
-                raise ValidationError({
-                    'ValidationError': 'Для вопроса с типом "MULTIPLE_ANSWER_OPTION" '
-                                       'должно быть заполнен хотя бы один вариант ответа'})
-
-        if user_answer_options:
+        else:
             try:
                 attrs.pop('text')
             except KeyError:
                 pass
 
-            existing_answer_options_ids = {a.id for a in question.answer_options.all()}
-            user_answer_options_ids = {a['answer_option'].id for a in user_answer_options}
-            check_answer_options = user_answer_options_ids - existing_answer_options_ids
-            if check_answer_options:
-                raise ValidationError({'ValidationError': 'В запросе присутствуют варианты ответов, не соответствующие '
-                                                          f'предложенным в вопросе: {check_answer_options}'})
+            user_answer_options_ids = [a['answer_option'].id for a in user_answer_options or []]
+            question_meta = get_question_meta(question.id, self.context['request'])
+            validate_answer_options(question.type, user_answer_options_ids, question_meta.answer_option_ids)
 
         return attrs
 
     def create(self, validated_data):
-        user_answer_options = validated_data.get('user_answer_options')
-        if user_answer_options is not None:
-            validated_data.pop('user_answer_options')
-            answer = super().create(validated_data)
-            user_answer_options_objs = [UserAnswerOptions(
-                answer_option=a['answer_option'], answer=answer
-            ) for a in
-                user_answer_options
+        user_answer_options = validated_data.pop('user_answer_options', None) or []
+        try:
+            with transaction.atomic():
+                answer = super().create(validated_data)
+                user_answer_options_objs = [UserAnswerOptions(
+                    answer_option_id=a['answer_option'].id, answer=answer
+                ) for a in
+                    user_answer_options
+                ]
+                UserAnswerOptions.objects.bulk_create(user_answer_options_objs)
+                # Обновление счётчиков результатов опроса:
+                record_answers(answer.question.quiz_id, answer.user_id, [answer], user_answer_options_objs)
+        except IntegrityError:
+            # Повторным ответом считается только нарушение уникальности ответа пользователя на вопрос:
+            user, question = validated_data['user'], validated_data['question']
+            if user is not None and Answer.objects.filter(user=user, question_id=question.id).exists():
+                raise ValidationError({'ValidationError': 'Вы уже ответили на данный вопрос'})
+            raise
+        # Выбранные варианты известны, ответ сериализуется без повторного чтения:
+        answer._prefetched_objects_cache = {'user_answer_options': user_answer_options_objs}
+        return answer
+
+    def enqueue(self):
+        """
+        Ставит проверенный ответ в очередь отложенной записи (ANSWER_INGESTION=queue) вместо записи в базу.
+        Возвращает ещё не записанный ответ
+        """
+        question, user = self.validated_data['question'], self.validated_data['user']
+        text = self.validated_data.get('text')
+        user_answer_options = self.validated_data.get('user_answer_options') or []
+
+        queue = get_answer_queue()
+        try:
+            queue_id = queue.put(user and user.id, question.id, question.quiz_id, text,
+                                 [a['answer_option'].id for a in user_answer_options])
+        except DuplicateQueuedAnswer:
+            raise ValidationError({'ValidationError': 'Вы уже ответили на данный вопрос'})
+        # Ответ, уже записанный в базу, ищется после постановки в очередь: строка очереди закрывает
+        # повторную отправку, а обработчик не заберёт её до release:
+        if user is not None and Answer.objects.filter(user=user, question_id=question.id).exists():
+            queue.remove([queue_id])
+            raise ValidationError({'ValidationError': 'Вы уже ответили на данный вопрос'})
+        queue.release([queue_id])
+
+        self.instance = Answer(question=question, user=user, text=text)
+        self.instance._prefetched_objects_cache = {'user_answer_options': [
+            UserAnswerOptions(answer_option=a['answer_option']) for a in user_answer_options
+        ]}
+        return self.instance
+
+
+class AnswerOptionIdSerializer(serializers.Serializer):
+    """
+    Сериализатор для выбранного варианта ответа в пакетной отправке ответов
+    """
+    answer_option = serializers.IntegerField()
+
+
+class QuizAnswerItemSerializer(serializers.Serializer):
+    """
+    Сериализатор для ответа на один вопрос в пакетной отправке ответов
+    """
+    question = serializers.IntegerField()
+    text = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    user_answer_options = AnswerOptionIdSerializer(many=True, required=False)
+
+
+class QuizAnswersSerializer(serializers.Serializer):
+    """
+    Сериализатор для отправки ответов сразу на все вопросы опроса.
+    Валидация выполняется фиксированным количеством запросов, запись - массовыми вставками в одной транзакции
+    """
+    quiz = serializers.PrimaryKeyRelatedField(queryset=Quiz.objects.all())
+    answers = QuizAnswerItemSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        quiz = attrs['quiz']
+        answers = attrs['answers']
+        if quiz.archived:
+            raise ValidationError({'ValidationError': 'Опрос перенесён в архив и не принимает ответы'})
+        questions = {q.id: q for q in quiz.questions.prefetch_related('answer_options')}
+
+        # Валидация состава вопросов:
+        question_ids = [a['question'] for a in answers]
+        unknown_question_ids = set(question_ids) - questions.keys()
+        if unknown_question_ids:
+            raise ValidationError({'ValidationError': f'В опросе нет вопросов: {sorted(unknown_question_ids)}'})
+        if len(question_ids) != len(set(question_ids)):
+            raise ValidationError({'ValidationError': 'В запросе несколько ответов на один вопрос'})
+
+        # Валидация пользователя (повторные ответы отсекаются ограничением уникальности при записи):
+        attrs.update({'user': None if isinstance(user, AnonymousUser) else user})
+
+        # Валидация ответов по типу вопроса:
+        for answer in answers:
+            question = questions[answer['question']]
+            if question.type == 'TEXT':
+                if 'text' not in answer:
+                    raise ValidationError({'ValidationError': f'Для вопроса {question.id} не заполнен ответ'})
+                answer.pop('user_answer_options', None)
+            else:
+                answer.pop('text', None)
+                answer_option_ids = [a['answer_option'] for a in answer.get('user_answer_options', [])]
+                validate_answer_options(question.type, answer_option_ids, {a.id for a in question.answer_options.all()})
+
+        return attrs
+
+    def create(self, validated_data):
+        user = validated_data['user']
+        try:
+            with transaction.atomic():
+                answers = bulk_create_with_ids(Answer, [
+                    Answer(question_id=a['question'], text=a.get('text'), user=user) for a in validated_data['answers']
+                ])
+                user_answer_options = [
+                    UserAnswerOptions(answer=answer, answer_option_id=o['answer_option'])
+                    for answer, a in zip(answers, validated_data['answers'])
+                    for o in a.get('user_answer_options', [])
+                ]
+                UserAnswerOptions.objects.bulk_create(user_answer_options)
+                # Обновление счётчиков результатов опроса:
+                record_answers(validated_data['quiz'].id, user and user.id, answers, user_answer_options)
+        except IntegrityError:
+            # Как и для одного ответа, повторными считаются только уже записанные ответы пользователя:
+            if user is not None and Answer.objects.filter(
+                    user=user, question_id__in=[a['question'] for a in validated_data['answers']]).exists():
+                raise ValidationError({'ValidationError': 'Вы уже ответили на вопросы этого опроса'})
+            raise
+
+        return {'quiz': validated_data['quiz'], 'answers': answers, 'user_answer_options': user_answer_options}
+
+    def enqueue(self):
+        """
+        Ставит проверенные ответы в очередь отложенной записи (ANSWER_INGESTION=queue) одной транзакцией очереди
+        вместо записи в базу. Возвращает ещё не записанные ответы
+        """
+        quiz, user = self.validated_data['quiz'], self.validated_data['user']
+        answers = self.validated_data['answers']
+
+        queue = get_answer_queue()
+        try:
+            queue_ids = queue.put_many([
+                (user and user.id, a['question'], quiz.id, a.get('text'),
+                 [o['answer_option'] for o in a.get('user_answer_options', [])])
+                for a in answers
+            ])
+        except DuplicateQueuedAnswer:
+            raise ValidationError({'ValidationError': 'Вы уже ответили на вопросы этого опроса'})
+        # Как и для одного ответа, записанные в базу ответы ищутся после постановки в очередь:
+        if user is not None and Answer.objects.filter(
+                user=user, question_id__in=[a['question'] for a in answers]).exists():
+            queue.remove(queue_ids)
+            raise ValidationError({'ValidationError': 'Вы уже ответили на вопросы этого опроса'})
+        queue.release(queue_ids)
+
+        answer_objs = [Answer(question_id=a['question'], text=a.get('text'), user=user) for a in answers]
+        self.instance = {
+            'quiz': quiz,
+            'answers': answer_objs,
+            'user_answer_options': [
+                UserAnswerOptions(answer=answer, answer_option_id=o['answer_option'])
+                for answer, a in zip(answer_objs, answers)
+                for o in a.get('user_answer_options', [])
+            ],
+        }
+        return self.instance
+
+    def to_representation(self, instance):
+        # Варианты группируются по объекту ответа: у ответов из очереди ещё нет id:
+        user_answer_options = {}
+        for a in instance['user_answer_options']:
+            user_answer_options.setdefault(id(a.answer), []).append({'answer_option': a.answer_option_id})
+
+        return {
+            'quiz': instance['quiz'].id,
+            'answers': [
+                {
+                    'id': a.id,
+                    'text': a.text,
+                    'question': a.question_id,
+                    'user': a.user_id,
+                    'user_answer_options': user_answer_options.get(id(a), []),
+                } for a in instance['answers']
             ]
-            UserAnswerOptions.objects.bulk_create(user_answer_options_objs)
-            return answer
-        return super().create(validated_data)
+        }
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для вопросов
     """
 
     answer_options = QuestionsAnswerOptionsSerializer(many=True)
 
+    DEFAULT_TYPE = Question._meta.get_field('type').default
+
     class Meta:
         model = Question
         fields = ['id', 'text', 'type', 'quiz', 'answer_options', ]
@@ -133,7 +382,8 @@ class QuestionSerializer(serializers.ModelSerializer):
         return fields
 
     def validate(self, attrs):
-        question_type = attrs['type'] if self.context['view'].action == 'create' else self.instance.type
+        # При создании тип берётся из запроса, при изменении - у вопроса:
+        question_type = attrs.get('type', self.DEFAULT_TYPE) if self.instance is None else self.instance.type
         # Валидация по типу вопроса:
         if question_type == 'TEXT':
             try:
@@ -141,23 +391,51 @@ class QuestionSerializer(serializers.ModelSerializer):
             except KeyError:
                 pass
         elif question_type in ['SINGLE_ANSWER_OPTION', 'MULTIPLE_ANSWER_OPTION']:
+            # При изменении вопроса без answer_options варианты ответов не меняются:
+            if self.instance is not None and 'answer_options' not in attrs:
+                return attrs
             # Валидация answer_options:
-            answer_options = attrs['answer_options']
+            answer_options = attrs.get('answer_options', [])
             if len(answer_options) == 0:
                 raise ValidationError({'ValidationError': 'Укажите непустое значение для поля "answer_options"'})
+            if self.instance is not None:
+                answer_options = attrs['answer_options'] = self.match_answer_options(answer_options)
 
             answer_options_set = {a['name'] for a in answer_options}
             if len(answer_options) != len(answer_options_set):
                 raise ValidationError({'ValidationError': 'В вариантах ответа содержатся дубли'})
-
-            if self.context['view'].action in ['update', 'partial_update']:
-                existing_answer_options = {a.name for a in self.instance.answer_options.all()}
-                duplicate_answer_options = existing_answer_options & answer_options_set
-                if duplicate_answer_options:
-                    raise ValidationError({'ValidationError': f'У вопроса уже есть следующие варианты ответов: '
-                                                              f'{sorted(duplicate_answer_options)}'})
         return attrs
 
+    @cached_property
+    def existing_answer_options(self):
+        """
+        Действующие варианты ответов изменяемого вопроса {id: название}, читаются одним запросом
+        """
+        return dict(self.instance.answer_options.values_list('id', 'name'))
+
+    def match_answer_options(self, answer_options):
+        """
+        Сопоставляет варианты ответов запроса с вариантами вопроса по id: варианты без id будут созданы,
+        варианты с id без названия сохраняют текущее название. При PATCH варианты только добавляются
+        и переименовываются, при PUT запрос задаёт набор вариантов целиком
+        """
+        option_ids = [a['id'] for a in answer_options if 'id' in a]
+        unknown_option_ids = set(option_ids) - self.existing_answer_options.keys()
+        if unknown_option_ids:
+            raise ValidationError({'ValidationError': f'У вопроса нет вариантов ответов: {sorted(unknown_option_ids)}'})
+        if len(option_ids) != len(set(option_ids)):
+            raise ValidationError({'ValidationError': 'В вариантах ответа содержатся дубли'})
+
+        matched = []
+        for a in answer_options:
+            if 'id' in a:
+                matched.append({'id': a['id'], 'name': a.get('name', self.existing_answer_options[a['id']])})
+            elif 'name' in a:
+                matched.append({'name': a['name']})
+            else:
+                raise ValidationError({'ValidationError': 'Укажите название нового варианта ответа'})
+        return matched
+
     def create(self, validated_data):
         # Обработка вложенного поля answer_options:
         answer_options = validated_data.get('answer_options')
@@ -170,20 +448,53 @@ class QuestionSerializer(serializers.ModelSerializer):
                 for a in answer_options
             ]
             QuestionAnswerOptions.objects.bulk_create(answer_options_objs)
+            # bulk_create не отправляет сигналы, изменение опроса отмечается явно:
+            quiz_content_changed([question.quiz_id])
             return question
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
         # Обработка вложенного поля answer_options:
-        answer_options = validated_data.get('answer_options')
-        if answer_options and instance.type in ['SINGLE_ANSWER_OPTION', 'MULTIPLE_ANSWER_OPTION']:
-            # Создание связанных сущностей QuestionAnswerOptions:
-            answer_options_objs = [
-                QuestionAnswerOptions(name=a['name'], question=instance)
-                for a in answer_options
-            ]
-            QuestionAnswerOptions.objects.bulk_create(answer_options_objs)
-        return super().update(instance, validated_data)
+        answer_options = validated_data.pop('answer_options', None)
+        with transaction.atomic():
+            if answer_options is not None and instance.type in ['SINGLE_ANSWER_OPTION', 'MULTIPLE_ANSWER_OPTION']:
+                self.update_answer_options(instance, answer_options, replace=not self.partial)
+            return super().update(instance, validated_data)
+
+    def update_answer_options(self, question, answer_options, replace):
+        """
+        Применяет варианты ответов из запроса массовыми операциями: варианты без id создаются, изменённые
+        переименовываются. При замене (replace, PUT) отсутствующие в запросе варианты удаляются, а варианты,
+        которые могут быть выбраны в ответах, не удаляются, а выводятся из использования (is_retired).
+        Количество запросов на создание и переименование не зависит от количества вариантов
+        """
+        existing = self.existing_answer_options
+        removed_ids = set()
+        if replace:
+            removed_ids = existing.keys() - {a['id'] for a in answer_options if 'id' in a}
+        renamed = [
+            QuestionAnswerOptions(id=a['id'], name=a['name'])
+            for a in answer_options if 'id' in a and a['name'] != existing[a['id']]
+        ]
+        created = [QuestionAnswerOptions(name=a['name'], question=question) for a in answer_options if 'id' not in a]
+
+        if removed_ids:
+            # Блокировка удаляемых вариантов до проверки ссылок на них:
+            removed_ids = set(QuestionAnswerOptions.objects.select_for_update().filter(
+                id__in=removed_ids
+            ).values_list('id', flat=True))
+            retired_ids = get_referenced_answer_option_ids(question, removed_ids)
+            if retired_ids:
+                QuestionAnswerOptions.objects.filter(id__in=retired_ids).update(is_retired=True)
+            if removed_ids - retired_ids:
+                QuestionAnswerOptions.objects.filter(id__in=removed_ids - retired_ids).delete()
+        if renamed:
+            QuestionAnswerOptions.objects.bulk_update(renamed, ['name'])
+        if created:
+            QuestionAnswerOptions.objects.bulk_create(created)
+        if removed_ids or renamed or created:
+            # Массовые операции не отправляют сигналы, изменение опроса отмечается явно:
+            quiz_content_changed([question.quiz_id])
 
 
 class QuestionAnswerSerializer(QuestionSerializer):
@@ -197,7 +508,7 @@ class QuestionAnswerSerializer(QuestionSerializer):
         fields = ['id', 'text', 'type', 'quiz', 'answer_options', 'answer', ]
 
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для опросов. Содержит базовую информацию
     """
@@ -223,7 +534,79 @@ class QuizSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class QuizUserAnswerSerializer(serializers.ModelSerializer):
+class QuestionImportSerializer(QuestionSerializer):
+    """
+    Сериализатор для вопроса с вариантами ответов внутри импортируемого опроса
+    """
+
+    answer_options = QuestionsAnswerOptionsSerializer(many=True, required=False)
+
+    class Meta(QuestionSerializer.Meta):
+        read_only_fields = ['quiz', ]
+
+
+class QuizImportSerializer(QuizSerializer):
+    """
+    Сериализатор для создания опроса вместе с вопросами и вариантами ответов одним запросом
+    или клонирования опроса (source - id опроса, поля запроса заменяют поля копии).
+    Опрос и вопросы проверяются по правилам QuizSerializer и QuestionSerializer,
+    запись - по одной массовой вставке на модель в одной транзакции
+    """
+
+    source = serializers.PrimaryKeyRelatedField(queryset=Quiz.objects.all(), required=False, write_only=True)
+    questions = QuestionImportSerializer(many=True, required=False)
+
+    class Meta(QuizSerializer.Meta):
+        fields = QuizSerializer.Meta.fields + ['source', ]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # При клонировании название и описание берутся у исходного опроса:
+        if 'source' in getattr(self, 'initial_data', {}):
+            fields['title'].required = False
+            fields['description'].required = False
+        return fields
+
+    def validate(self, attrs):
+        source = attrs.pop('source', None)
+        if source is not None:
+            if 'questions' in attrs:
+                raise ValidationError({'ValidationError': 'Укажите либо "source", либо "questions"'})
+            attrs.setdefault('title', source.title)
+            attrs.setdefault('description', source.description)
+            # Копия начинается сегодня и длится столько же, сколько исходный опрос:
+            attrs.setdefault('start_date', timezone.localdate())
+            attrs.setdefault('end_date', attrs['start_date'] + (source.end_date - source.start_date))
+            attrs['questions'] = [
+                {'text': q.text, 'type': q.type, 'answer_options': [{'name': a.name} for a in q.answer_options.all()]}
+                for q in source.questions.prefetch_related('answer_options').order_by('id')
+            ]
+        # Значения дат по умолчанию у модели вычисляются при запуске процесса, поэтому задаются явно:
+        attrs.setdefault('start_date', timezone.localdate())
+        attrs.setdefault('end_date', attrs['start_date'])
+        return super().validate(attrs)
+
+    def create(self, validated_data):
+        questions = validated_data.pop('questions', [])
+        with transaction.atomic():
+            quiz = Quiz.objects.create(**validated_data)
+            question_objs = bulk_create_with_ids(Question, [
+                Question(quiz=quiz, text=q['text'], type=q.get('type', QuestionSerializer.DEFAULT_TYPE))
+                for q in questions
+            ])
+            answer_options_objs = [
+                [QuestionAnswerOptions(question=question, name=a['name']) for a in q.get('answer_options', [])]
+                for question, q in zip(question_objs, questions)
+            ]
+            bulk_create_with_ids(QuestionAnswerOptions, [a for objs in answer_options_objs for a in objs])
+        # Созданные вопросы и варианты ответов известны, опрос сериализуется без повторного чтения:
+        quiz._prefetched_objects_cache = {'questions': question_objs}
+        for question, objs in zip(question_objs, answer_options_objs):
+            question._prefetched_objects_cache = {'answer_options': objs}
+        return quiz
+
+
+class QuizUserAnswerSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для опросов, расширенный информацией с вопросами
     """
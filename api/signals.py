@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .cache import invalidate_quiz_cache_on_commit, forget_question_meta, invalidate_token_cache
+from .models import Quiz, Question, QuestionAnswerOptions
+
+
+def quiz_content_changed(quiz_ids):
+    """
+    Отмечает опросы изменёнными и сбрасывает кеш опросов.
+    Вызывается явно после массовых операций, которые не отправляют сигналы
+    """
+    Quiz.objects.filter(id__in=quiz_ids).touch()
+    invalidate_quiz_cache_on_commit()
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, **kwargs):
+    invalidate_quiz_cache_on_commit()
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    forget_question_meta(instance.id)
+    quiz_content_changed([instance.quiz_id])
+
+
+@receiver([post_save, post_delete], sender=QuestionAnswerOptions)
+def answer_option_changed(sender, instance, **kwargs):
+    forget_question_meta(instance.question_id)
+    quiz_content_changed(Question.objects.filter(id=instance.question_id).values('quiz_id'))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token_cache([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    # Вместе с токеном кешируется пользователь (is_active, is_staff), поэтому сбрасывается любое изменение:
+    if not created:
+        invalidate_token_cache(Token.objects.filter(user=instance).values_list('key', flat=True))
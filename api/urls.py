@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import QuizViewSet, QuestionViewSet, AnswerViewSet, QuizUserAnswerViewSet
+from .views import QuizViewSet, QuestionViewSet, AnswerViewSet, QuizUserAnswerViewSet, TokenCacheStatsView
 
 router = DefaultRouter()
 router.register('quiz', QuizViewSet, 'quiz')
@@ -9,5 +9,6 @@ router.register('answer', AnswerViewSet, 'answer')
 router.register('quizuseranswer', QuizUserAnswerViewSet, 'quizuseranswer')
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('stats/token-cache/', TokenCacheStatsView.as_view(), name='token-cache-stats'),
 ]
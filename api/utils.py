@@ -0,0 +1,19 @@
+from django.db import connections, router
+
+
+def bulk_create_with_ids(model, objs, batch_size=None):
+    """
+    bulk_create, гарантирующий заполнение id у созданных объектов.
+    Если база не умеет возвращать id из массовой вставки (sqlite), строки вставляются по одной,
+    но так же, как и в bulk_create, без вызова save() и сигналов
+    """
+    using = router.db_for_write(model)
+    if connections[using].features.can_return_ids_from_bulk_insert:
+        return model.objects.using(using).bulk_create(objs, batch_size=batch_size)
+
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    for obj in objs:
+        obj.pk = model._base_manager.using(using)._insert([obj], fields=fields, return_id=True)
+        obj._state.adding = False
+        obj._state.db = using
+    return objs
@@ -1,19 +1,46 @@
+from django.db.models import Count, Max, Sum
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from rest_framework import viewsets
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError, NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .filters import QuizFilter, QuestionFilter, AnswerFilter, QuizUserAnswerFilter
-from .models import Quiz, Question, Answer
-from .serializers import QuizSerializer, QuestionSerializer, QuizUserAnswerSerializer, AnswerSerializer
+from .analytics import get_quiz_analytics
+from .archive import get_archived_questions
+from .authentication import get_token_cache_stats
+from .cache import get_quiz_cache, get_quiz_cache_key, seconds_until_midnight, is_quiz_cache_settled, \
+    pin_user_to_primary
+from .export import EXPORT_FORMATS, iter_quiz_answer_rows
+from .ingestion import is_answer_queue_enabled, flush_user_answers
+from .live import EventStreamRenderer, is_live_results_enabled, iter_results_events
+from .filters import QuizFilter, QuestionFilter, AnswerFilter, QuizUserAnswerFilter, parse_user_id
+from .mixins import SerializerPrefetchMixin, QuizCacheMixin, ConditionalGetMixin, CompiledReadMixin, PerformanceMixin, \
+    FieldSelectionMixin, ReadReplicaMixin
+from .models import Quiz, Question, Answer, QuizParticipation
+from .results import get_quiz_results, get_live_results
+from .routers import is_replica_reads_enabled
+from .serializers import QuizSerializer, QuestionSerializer, QuizUserAnswerSerializer, AnswerSerializer, \
+    QuizAnswersSerializer, QuizImportSerializer
 
 
-class QuizViewSet(viewsets.ModelViewSet):
+class QuizViewSet(PerformanceMixin, ReadReplicaMixin, ConditionalGetMixin, QuizCacheMixin, CompiledReadMixin,
+                  FieldSelectionMixin, SerializerPrefetchMixin, viewsets.ModelViewSet):
     serializer_class = QuizSerializer
+    read_from_replica = True
     queryset = Quiz.objects.all()
     filterset_class = QuizFilter
+    ordering = ('end_date', 'id')
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'results', 'results_stream', 'export',
+                           'import_quiz', 'analytics']:
             return [IsAuthenticated(), IsAdminUser()]
         return []
 
@@ -24,9 +51,100 @@ class QuizViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(end_date__gt=timezone.localdate()).all()
         return queryset
 
+    def get_validators(self):
+        # Валидаторы кешируются вместе с ответом и сбрасываются при тех же изменениях:
+        cache = get_quiz_cache()
+        key = f'{get_quiz_cache_key(self.request)}:validators'
+        validators = cache.get(key)
+        if validators is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            if self.action == 'retrieve':
+                queryset = queryset.filter(pk=self.kwargs['pk'])
+            aggregate = queryset.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+            validators = f'{aggregate["count"]}:{aggregate["last_modified"]}', aggregate['last_modified']
+            if not is_replica_reads_enabled() or is_quiz_cache_settled():
+                cache.set(key, validators, timeout=seconds_until_midnight())
+        return validators
+
+    @action(detail=True, methods=['get'])
+    def results(self, request, pk=None):
+        """
+        Результаты опроса по счётчикам: количество респондентов, ответов на вопросы и выборов вариантов ответов
+        """
+        return Response(get_quiz_results(self.get_object()))
+
+    @action(detail=True, methods=['get'], url_path='results/stream',
+            renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def results_stream(self, request, pk=None):
+        """
+        Результаты опроса в реальном времени (Server-Sent Events): событие snapshot с текущими результатами,
+        затем события delta с приращениями счётчиков, накопленными за LIVE_RESULTS_WINDOW секунд.
+        При LIVE_RESULTS_ENABLED=0 поток недоступен
+        """
+        if not is_live_results_enabled():
+            raise NotFound()
+        quiz_id = self.get_object().id
+        events = iter_results_events(quiz_id, lambda: get_live_results(self.get_object()))
+        response = StreamingHttpResponse(events, content_type=EventStreamRenderer.media_type)
+        response['Cache-Control'] = 'no-cache'
+        # Прокси не должен буферизовать поток:
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """
+        Аналитика ответов опроса: воронка прохождения по вопросам, совместные выборы вариантов вопросов
+        с несколькими вариантами и таблица сопряжённости двух вопросов с вариантами (?crosstab=<id>,<id>)
+        """
+        # Для аналитики нужны только поля ключа кеша и признак архива, без предзагрузки вопросов и вариантов:
+        quiz = get_object_or_404(Quiz.objects.only('id', 'updated_at', 'archived'), pk=pk)
+        self.check_object_permissions(request, quiz)
+        crosstab = request.query_params.get('crosstab')
+        if crosstab is not None:
+            option_question_ids = set(quiz.questions.filter(
+                type__in=['SINGLE_ANSWER_OPTION', 'MULTIPLE_ANSWER_OPTION']
+            ).values_list('id', flat=True))
+            try:
+                crosstab = tuple(int(question_id) for question_id in crosstab.split(','))
+            except ValueError:
+                crosstab = ()
+            if len(crosstab) != 2 or not option_question_ids.issuperset(crosstab):
+                raise ValidationError({'ValidationError': 'Параметр crosstab - два id вопросов опроса с вариантами '
+                                                          'ответов через запятую'})
+        return Response(get_quiz_analytics(quiz, crosstab))
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """
+        Потоковая выгрузка всех ответов на вопросы опроса в CSV или JSON Lines (?file_format=csv|jsonl)
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'ValidationError': f'Доступные форматы выгрузки: {sorted(EXPORT_FORMATS)}'})
+        render, content_type = EXPORT_FORMATS[file_format]
+
+        quiz = self.get_object()
+        rows = iter_quiz_answer_rows(quiz.id, archived=quiz.archived)
+        response = StreamingHttpResponse(render(rows), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="quiz_{quiz.id}_answers.{file_format}"'
+        return response
 
-class QuestionViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='import', serializer_class=QuizImportSerializer)
+    def import_quiz(self, request):
+        """
+        Создание опроса вместе с вопросами и вариантами ответов одним запросом или клонирование опроса (source)
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class QuestionViewSet(PerformanceMixin, ReadReplicaMixin, ConditionalGetMixin, FieldSelectionMixin,
+                      SerializerPrefetchMixin, viewsets.ModelViewSet):
     serializer_class = QuestionSerializer
+    read_from_replica = True
     queryset = Question.objects.all()
     filterset_class = QuestionFilter
 
@@ -35,16 +153,143 @@ class QuestionViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated(), IsAdminUser()]
         return []
 
+    def get_validators(self):
+        # Изменения вопросов и вариантов ответов отмечаются в updated_at опроса:
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            queryset = queryset.filter(pk=self.kwargs['pk'])
+        validators = queryset.aggregate(count=Count('id'), last_modified=Max('quiz__updated_at'))
+        return f'{validators["count"]}:{validators["last_modified"]}', validators['last_modified']
+
 
-class AnswerViewSet(viewsets.ModelViewSet):
+class AnswerViewSet(PerformanceMixin, ReadReplicaMixin, FieldSelectionMixin, SerializerPrefetchMixin,
+                    viewsets.ModelViewSet):
     serializer_class = AnswerSerializer
-    queryset = Answer.objects.prefetch_related().all()
+    queryset = Answer.objects.all()
     http_method_names = ['get', 'post', ]
     filterset_class = AnswerFilter
 
+    def create(self, request, *args, **kwargs):
+        if not is_answer_queue_enabled():
+            return super().create(request, *args, **kwargs)
+        # Отложенная запись: ответ проверяется как обычно и ставится в очередь, в базу его пишет flush_answer_queue
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.enqueue()
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
-class QuizUserAnswerViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk', serializer_class=QuizAnswersSerializer)
+    def bulk_create(self, request):
+        """
+        Отправка ответов сразу на все вопросы опроса одним запросом
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if is_answer_queue_enabled():
+            serializer.enqueue()
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class QuizUserAnswerViewSet(PerformanceMixin, ReadReplicaMixin, ConditionalGetMixin, CompiledReadMixin,
+                            FieldSelectionMixin, SerializerPrefetchMixin, viewsets.ModelViewSet):
     serializer_class = QuizUserAnswerSerializer
+    read_from_replica = True
     queryset = Quiz.objects.all()
     http_method_names = ['get', ]
     filterset_class = QuizUserAnswerFilter
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    ordering = ('id',)
+
+    def prepare_read(self, request):
+        # Отложенная запись: ответы пользователя из очереди записываются в основную базу до чтения,
+        # записанные ответы читаются с неё же (и в следующих запросах, пока реплики отстают):
+        if not is_answer_queue_enabled():
+            return False
+        user_ids = self.get_reader_user_ids()
+        if not flush_user_answers(user_ids):
+            return False
+        for user_id in user_ids:
+            pin_user_to_primary(user_id)
+        return True
+
+    def get_reader_user_ids(self):
+        user_ids = {self.request.user.id} if self.request.user.is_authenticated else set()
+        if self.get_filter_user_id() is not None:
+            user_ids.add(self.get_filter_user_id())
+        return user_ids
+
+    def get_filter_user_id(self):
+        return parse_user_id(self.request.query_params.get('user'))
+
+    def paginate_queryset(self, queryset):
+        # Строки страницы нужны, чтобы подставить в ответ данные архивных опросов:
+        self.page_rows = super().paginate_queryset(queryset)
+        return self.page_rows
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and getattr(self, 'page_rows', None):
+            archived = [
+                (row['id'], item) if isinstance(row, dict) else (row.id, item)
+                for row, item in zip(self.page_rows, response.data['results'])
+                if (row['archived'] if isinstance(row, dict) else row.archived)
+            ]
+            self.read_through_archive(archived)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and 'questions' in response.data:
+            if Quiz.objects.filter(id=self.kwargs['pk'], archived=True).exists():
+                self.read_through_archive([(int(self.kwargs['pk']), response.data)])
+        return response
+
+    def read_through_archive(self, archived):
+        """
+        Подставляет в сериализованные архивные опросы [(id опроса, данные)] вопросы с ответами из архива (api.archive)
+        тем же вложенным сериализатором, что и для остальных опросов
+        """
+        archived = [(quiz_id, item) for quiz_id, item in archived if 'questions' in item]
+        if not archived:
+            return
+        questions_field = self.get_serializer().fields['questions']
+        questions = get_archived_questions(
+            [quiz_id for quiz_id, _ in archived], self.get_filter_user_id(),
+            with_answer_options='answer_options' in questions_field.child.fields
+        )
+        for quiz_id, item in archived:
+            item['questions'] = questions_field.to_representation(questions.get(quiz_id, []))
+
+    @property
+    def ordering_fields(self):
+        # Время последнего ответа есть только у опросов, выбранных по пользователю:
+        if self.get_filter_user_id() is not None:
+            return ['id', 'end_date', 'last_answered_at']
+        return ['id', 'end_date']
+
+    def get_validators(self):
+        # Ревизия ответов на вопросы опроса (или участия пользователя в опросах) и время изменения опросов:
+        if self.action == 'retrieve':
+            validators = Answer.objects.filter(question__quiz_id=self.kwargs['pk']).aggregate(
+                count=Count('id'), latest=Max('id'), last_modified=Max('question__quiz__updated_at')
+            )
+        elif self.get_filter_user_id() is not None:
+            validators = QuizParticipation.objects.filter(user_id=self.get_filter_user_id()).aggregate(
+                count=Sum('answered_count'), latest=Max('last_answered_at'), last_modified=Max('quiz__updated_at')
+            )
+        else:
+            return None
+        revision = f'{validators["count"]}:{validators["latest"]}:{validators["last_modified"]}'
+        return revision, validators['last_modified']
+
+
+class TokenCacheStatsView(APIView):
+    """
+    Статистика кеша токенов аутентификации процесса, обработавшего запрос
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response(get_token_cache_stats())
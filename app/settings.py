@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,14 +89,92 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: хосты через запятую, остальные параметры подключения - как у основной базы.
+# Безопасные запросы quiz, question и quizuseranswer читают с реплик (api.routers.ReadReplicaRouter);
+# REPLICA_LAG_SECONDS - допустимое отставание реплик: столько после своей записи пользователь читает с основной базы
+for index, host in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica_{index}'] = dict(DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'})
+REPLICA_DATABASES = [alias for alias in DATABASES if alias.startswith('replica_')]
+REPLICA_LAG_SECONDS = float(os.getenv('REPLICA_LAG_SECONDS', '5'))
+DATABASE_ROUTERS = ['api.routers.ReadReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кеш опросов; локальная память годится только для одного процесса gunicorn,
+    # для нескольких воркеров или инстансов указывается общий бэкенд (например, redis)
+    'quiz': {
+        'BACKEND': os.getenv('QUIZ_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('QUIZ_CACHE_LOCATION', 'quiz'),
+    },
+    # Кеш токенов аутентификации: общий для всех процессов (как и кеш опросов, задаётся окружением)
+    # и локальный кеш процесса перед ним. TIMEOUT локального кеша - предельное время, в течение которого
+    # другие процессы ещё принимают удалённый токен
+    'token': {
+        'BACKEND': os.getenv('TOKEN_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('TOKEN_CACHE_LOCATION', 'token'),
+        'TIMEOUT': 60,
+    },
+    'token_local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'token_local',
+        'TIMEOUT': 5,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Закрепление пользователей за основной базой после записи (общий бэкенд для нескольких инстансов):
+    'replica_pin': {
+        'BACKEND': os.getenv('REPLICA_PIN_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('REPLICA_PIN_CACHE_LOCATION', 'replica_pin'),
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
-            'django_filters.rest_framework.DjangoFilterBackend']
+            'django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 20,
 }
 
+# Запись ответов (POST /api/answer/): direct - сразу в базу, queue - в локальную очередь на диске,
+# из которой ответы пачками переносит в базу команда flush_answer_queue (python manage.py flush_answer_queue --loop)
+ANSWER_INGESTION = os.getenv('ANSWER_INGESTION', 'direct')
+ANSWER_INGESTION_QUEUE = os.getenv('ANSWER_INGESTION_QUEUE', os.path.join(BASE_DIR, 'answer_queue.sqlite3'))
+
+# Метрики запросов к API (заголовок Server-Timing): доля запросов, попадающих в выборку, и порог в миллисекундах,
+# после которого запрос пишется в лог вместе с самыми долгими SQL-запросами
+PERFORMANCE_SAMPLE_RATE = float(os.getenv('PERFORMANCE_SAMPLE_RATE', '1'))
+PERFORMANCE_SLOW_REQUEST_MS = float(os.getenv('PERFORMANCE_SLOW_REQUEST_MS', '500'))
+
+# Конфигурация полнотекстового поиска Postgres (?search=); при её смене индексы пересоздаются вручную
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+
+# Время хранения аналитики ответов опроса в кеше опросов (секунды); новые ответы сбрасывают запись раньше
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', str(24 * 60 * 60)))
+
+# Живые результаты опросов (Server-Sent Events): окно накопления приращений в секундах, количество последних
+# сообщений канала для отставших подписчиков, интервал комментариев keep-alive и длительность соединения в секундах,
+# задержка переподключения EventSource в миллисекундах. С Postgres приращения рассылаются процессам через
+# LISTEN/NOTIFY канала LIVE_RESULTS_CHANNEL. LIVE_RESULTS_ENABLED=0 отключает поток, версии записей
+# и рассылку приращений
+LIVE_RESULTS_ENABLED = os.getenv('LIVE_RESULTS_ENABLED', '1') == '1'
+LIVE_RESULTS_WINDOW = float(os.getenv('LIVE_RESULTS_WINDOW', '0.5'))
+LIVE_RESULTS_BACKLOG = int(os.getenv('LIVE_RESULTS_BACKLOG', '32'))
+LIVE_RESULTS_HEARTBEAT = float(os.getenv('LIVE_RESULTS_HEARTBEAT', '15'))
+LIVE_RESULTS_TIMEOUT = float(os.getenv('LIVE_RESULTS_TIMEOUT', '600'))
+LIVE_RESULTS_RETRY_MS = int(os.getenv('LIVE_RESULTS_RETRY_MS', '3000'))
+LIVE_RESULTS_CHANNEL = os.getenv('LIVE_RESULTS_CHANNEL', 'live_results')
+
+# Быстрая сериализация list/retrieve опросов из .values() без экземпляров моделей и полей DRF на каждый объект;
+# COMPILED_SERIALIZERS=0 возвращает обычные сериализаторы DRF
+COMPILED_SERIALIZERS = os.getenv('COMPILED_SERIALIZERS', '1') == '1'
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
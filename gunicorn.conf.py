@@ -0,0 +1,10 @@
+import os
+
+# Воркеры многопоточные (gthread): запрос занимает поток, а не процесс, поэтому потоковые ответы (живые результаты
+# опросов, выгрузка) не блокируют остальные запросы воркера, а timeout ограничивает зависание воркера,
+# а не длительность запроса. Потоков на воркер - GUNICORN_THREADS, запросы сверх них ждут свободного потока
+bind = '0.0.0.0:8000'
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
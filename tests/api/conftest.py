@@ -112,6 +112,7 @@ def question_answer_options_factory():
 @pytest.fixture
 def answer_factory(user):
     def factory(*args, **kwargs):
-        return baker.make('Answer', user=user, *args, **kwargs)
+        kwargs.setdefault('user', user)
+        return baker.make('Answer', *args, **kwargs)
 
     return factory
@@ -0,0 +1,89 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN, \
+    HTTP_404_NOT_FOUND
+
+from api.models import Answer, UserAnswerOptions
+
+
+@pytest.fixture
+def analytics_quiz(user, admin, quiz_factory, question_factory, question_answer_options_factory):
+    quiz = quiz_factory()
+    single = question_factory(quiz=quiz, type='SINGLE_ANSWER_OPTION')
+    multiple = question_factory(quiz=quiz, type='MULTIPLE_ANSWER_OPTION')
+    text = question_factory(quiz=quiz, type='TEXT')
+    a, b = question_answer_options_factory(question=single, _quantity=2)
+    x, y, z = question_answer_options_factory(question=multiple, _quantity=3)
+    other_user = baker.make('User')
+
+    def answer(respondent, question, options=()):
+        answer = Answer.objects.create(user=respondent, question=question, text='text' if not options else None)
+        UserAnswerOptions.objects.bulk_create([UserAnswerOptions(answer=answer, answer_option=o) for o in options])
+
+    answer(user, single, [a])
+    answer(user, multiple, [x, y])
+    answer(user, text)
+    answer(other_user, single, [b])
+    answer(other_user, multiple, [y])
+    answer(admin, single, [a])
+    answer(None, multiple, [x, z])
+    return quiz, single, multiple, text
+
+
+@pytest.mark.django_db
+def test_quiz_analytics(admin_api_client, analytics_quiz):
+    quiz, single, multiple, text = analytics_quiz
+
+    resp = admin_api_client.get(reverse('quiz-analytics', args=[quiz.id]), {'crosstab': f'{single.id},{multiple.id}'})
+    assert resp.status_code == HTTP_200_OK
+    data = resp.json()
+
+    # Три пользователя и анонимный ответ:
+    assert data['respondents'] == 4
+    assert data['funnel'] == [
+        {'question': single.id, 'answered': 3, 'completed': 3},
+        {'question': multiple.id, 'answered': 2, 'completed': 2},
+        {'question': text.id, 'answered': 1, 'completed': 1},
+    ]
+    [co_occurrence] = data['co_occurrence']
+    assert co_occurrence['question'] == multiple.id
+    assert co_occurrence['matrix'] == [[2, 1, 1], [1, 2, 0], [1, 0, 1]]
+    assert data['crosstab']['matrix'] == [[1, 1, 0], [0, 1, 0]]
+    by_option_ids = [option['id'] for option in data['crosstab']['by_answer_options']]
+    assert by_option_ids == [option['id'] for option in co_occurrence['answer_options']]
+
+
+@pytest.mark.django_db
+def test_quiz_analytics_cached_until_new_answers(admin_api_client, analytics_quiz, django_assert_max_num_queries):
+    quiz, _, _, text = analytics_quiz
+    url = reverse('quiz-analytics', args=[quiz.id])
+    first = admin_api_client.get(url).json()
+
+    # Токен, опрос (без вопросов и вариантов ответов), счётчики результатов:
+    with django_assert_max_num_queries(3):
+        assert admin_api_client.get(url).json() == first
+
+    resp = admin_api_client.post(reverse('answer-list'), data={'question': text.id, 'text': 'text'})
+    assert resp.status_code == HTTP_201_CREATED
+    assert admin_api_client.get(url).json()['funnel'][2]['answered'] == 2
+
+
+@pytest.mark.django_db
+def test_quiz_analytics_invalid_crosstab(admin_api_client, analytics_quiz):
+    quiz, single, _, text = analytics_quiz
+    url = reverse('quiz-analytics', args=[quiz.id])
+
+    for crosstab in [f'{single.id}', f'{single.id},{text.id}', 'a,b']:
+        assert admin_api_client.get(url, {'crosstab': crosstab}).status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_quiz_analytics_not_found(admin_api_client):
+    assert admin_api_client.get(reverse('quiz-analytics', args=[0])).status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_quiz_analytics_by_user(user_api_client, analytics_quiz):
+    resp = user_api_client.get(reverse('quiz-analytics', args=[analytics_quiz[0].id]))
+    assert resp.status_code == HTTP_403_FORBIDDEN
@@ -1,8 +1,12 @@
 import random
 
 import pytest
+from django.db import connection, IntegrityError
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST
+
+from api.models import Answer, UserAnswerOptions
 
 
 @pytest.mark.django_db
@@ -27,7 +31,7 @@ def test_answer_list(user_api_client, answer_factory):
 
     resp_json = resp.json()
     expected_ids = {a.id for a in answer_list}
-    response_ids = {a['id'] for a in resp_json}
+    response_ids = {a['id'] for a in resp_json['results']}
     assert expected_ids == response_ids
 
 
@@ -86,3 +90,183 @@ def test_multiple_answer_option_post(user_api_client, question_factory, question
 
     resp_json = resp.json()
     assert resp_json['user_answer_options'] == payload['user_answer_options']
+
+
+@pytest.fixture
+def bulk_answer_payload(quiz_factory, question_factory, question_answer_options_factory):
+    quiz = quiz_factory()
+    answers = []
+    for question_type in ['TEXT', 'SINGLE_ANSWER_OPTION', 'MULTIPLE_ANSWER_OPTION'] * 3:
+        question = question_factory(quiz=quiz, type=question_type)
+        options = question_answer_options_factory(question=question, _quantity=3)
+        if question_type == 'TEXT':
+            answers.append({'question': question.id, 'text': 'something'})
+        else:
+            chosen = options[:1] if question_type == 'SINGLE_ANSWER_OPTION' else options[:2]
+            answers.append({'question': question.id, 'user_answer_options': [{'answer_option': o.id} for o in chosen]})
+    return {'quiz': quiz.id, 'answers': answers}
+
+
+@pytest.mark.django_db
+def test_bulk_answer_create(user_api_client, user, bulk_answer_payload):
+    url = reverse('answer-bulk-create')
+
+    with CaptureQueriesContext(connection) as queries:
+        resp = user_api_client.post(url, data=bulk_answer_payload, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+
+    # Токен, опрос, вопросы, варианты ответов:
+    selects = [q for q in queries if q['sql'].startswith('SELECT')]
+    assert len(selects) == 4
+
+    resp_json = resp.json()
+    assert [a['question'] for a in resp_json['answers']] == [a['question'] for a in bulk_answer_payload['answers']]
+    assert Answer.objects.filter(user=user).count() == len(bulk_answer_payload['answers'])
+    assert UserAnswerOptions.objects.filter(answer__user=user).count() == 9
+
+
+@pytest.mark.django_db
+def test_bulk_answer_create_twice(user_api_client, bulk_answer_payload):
+    url = reverse('answer-bulk-create')
+
+    user_api_client.post(url, data=bulk_answer_payload, format='json')
+    resp = user_api_client.post(url, data=bulk_answer_payload, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_bulk_answer_create_with_wrong_option(user_api_client, bulk_answer_payload, question_answer_options_factory):
+    url = reverse('answer-bulk-create')
+    bulk_answer_payload['answers'][1]['user_answer_options'] = [
+        {'answer_option': question_answer_options_factory().id}
+    ]
+
+    resp = user_api_client.post(url, data=bulk_answer_payload, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert not Answer.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('user_answer_options', [[{'answer_option': None}], [{}]])
+def test_bulk_answer_option_required(user_api_client, bulk_answer_payload, user_answer_options):
+    bulk_answer_payload['answers'][1]['user_answer_options'] = user_answer_options
+
+    resp = user_api_client.post(reverse('answer-bulk-create'), data=bulk_answer_payload, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert not Answer.objects.exists()
+
+
+@pytest.mark.django_db
+def test_answer_create_twice(user_api_client, question_factory):
+    url = reverse('answer-list')
+    payload = {'question': question_factory().id, 'text': 'something'}
+
+    resp = user_api_client.post(url, data=payload, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+    resp = user_api_client.post(url, data=payload, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert Answer.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_answer_create_other_integrity_error(monkeypatch, user_api_client, question_factory):
+    def record_answers(*args):
+        raise IntegrityError('FOREIGN KEY constraint failed')
+
+    # Ошибки целостности, не связанные с повторным ответом, не превращаются в ошибку валидации:
+    monkeypatch.setattr('api.serializers.record_answers', record_answers)
+    with pytest.raises(IntegrityError):
+        user_api_client.post(reverse('answer-list'), data={'question': question_factory().id, 'text': 'something'},
+                             format='json')
+    assert not Answer.objects.exists()
+
+
+@pytest.mark.django_db
+def test_answer_create_reads_question_once(user_api_client, admin_api_client, question_factory):
+    question = question_factory(type='TEXT')
+    url = reverse('answer-list')
+
+    with CaptureQueriesContext(connection) as queries:
+        resp = user_api_client.post(url, data={'question': question.id, 'text': 'something'}, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+    # Токен и метаданные вопроса:
+    selects = [q for q in queries if q['sql'].startswith('SELECT')]
+    assert len(selects) == 2
+
+    # Метаданные вопроса берутся из кеша процесса, остаётся только токен:
+    with CaptureQueriesContext(connection) as queries:
+        resp = admin_api_client.post(url, data={'question': question.id, 'text': 'something'}, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+    selects = [q for q in queries if q['sql'].startswith('SELECT')]
+    assert len(selects) == 1
+
+
+@pytest.mark.django_db
+def test_answer_create_sees_new_answer_option(user_api_client, question_factory, question_answer_options_factory):
+    question = question_factory(type='SINGLE_ANSWER_OPTION')
+    option = question_answer_options_factory(question=question)
+    url = reverse('answer-list')
+
+    resp = user_api_client.post(url, data={'question': question.id, 'user_answer_options': [{'answer_option': 0}]},
+                                format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+    # Новый вариант ответа сбрасывает закешированные метаданные вопроса:
+    new_option = question_answer_options_factory(question=question)
+    resp = user_api_client.post(url, data={'question': question.id,
+                                           'user_answer_options': [{'answer_option': new_option.id}]}, format='json')
+    assert resp.status_code == HTTP_201_CREATED, resp.json()
+    assert option.id != new_option.id
+
+
+@pytest.mark.django_db
+def test_answer_create_unknown_question(user_api_client):
+    resp = user_api_client.post(reverse('answer-list'), data={'question': 0, 'text': 'something'}, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert 'question' in resp.json()
+
+
+@pytest.mark.django_db
+def test_multiple_answer_options_resolved_without_query(user_api_client, question_factory,
+                                                        question_answer_options_factory):
+    question = question_factory(type='MULTIPLE_ANSWER_OPTION')
+    options = question_answer_options_factory(question=question, _quantity=10)
+    payload = {'question': question.id, 'user_answer_options': [{'answer_option': o.id} for o in options]}
+
+    with CaptureQueriesContext(connection) as queries:
+        resp = user_api_client.post(reverse('answer-list'), data=payload, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+    # Токен и метаданные вопроса, выбранные варианты ответов проверяются по метаданным:
+    selects = [q for q in queries if q['sql'].startswith('SELECT')]
+    assert len(selects) == 2
+    assert [a['answer_option'] for a in resp.json()['user_answer_options']] == [o.id for o in options]
+    assert UserAnswerOptions.objects.filter(answer_id=resp.json()['id']).count() == 10
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('user_answer_options', [[{'answer_option': None}], [{}]])
+def test_answer_option_required(user_api_client, question_factory, user_answer_options):
+    question = question_factory(type='MULTIPLE_ANSWER_OPTION')
+
+    resp = user_api_client.post(reverse('answer-list'), data={
+        'question': question.id, 'user_answer_options': user_answer_options
+    }, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert 'answer_option' in resp.json()['user_answer_options'][0]
+    assert not Answer.objects.exists()
+
+
+@pytest.mark.django_db
+def test_answer_options_of_other_question_reported_together(user_api_client, question_factory,
+                                                            question_answer_options_factory):
+    question = question_factory(type='MULTIPLE_ANSWER_OPTION')
+    option = question_answer_options_factory(question=question)
+    other_options = question_answer_options_factory(question=question_factory(), _quantity=2)
+    payload = {'question': question.id,
+               'user_answer_options': [{'answer_option': o.id} for o in [option, *other_options]]}
+
+    resp = user_api_client.post(reverse('answer-list'), data=payload, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    error = resp.json()['user_answer_options']['answer_option'][0]
+    assert str(sorted(o.id for o in other_options)) in error
+    assert Answer.objects.count() == 0
@@ -0,0 +1,147 @@
+import datetime
+import json
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST
+from rest_framework.test import APIClient
+
+from api.models import Answer, ArchivedResponse, QuizParticipation, ResultCounter, UserAnswerOptions
+
+
+@pytest.fixture
+def answered_quiz(admin_api_client, user_api_client, quiz_factory, question_factory,
+                  question_answer_options_factory):
+    quiz = quiz_factory()
+    text_question = question_factory(quiz=quiz, type='TEXT')
+    option_question = question_factory(quiz=quiz, type='MULTIPLE_ANSWER_OPTION')
+    options = question_answer_options_factory(question=option_question, _quantity=3)
+
+    # Два пользователя отвечают на все вопросы, анонимный - на один:
+    for client, selected in [(user_api_client, [0, 2]), (admin_api_client, [1])]:
+        resp = client.post(reverse('answer-bulk-create'), data={
+            'quiz': quiz.id,
+            'answers': [
+                {'question': text_question.id, 'text': 'текст'},
+                {'question': option_question.id,
+                 'user_answer_options': [{'answer_option': options[i].id} for i in selected]},
+            ]
+        }, format='json')
+        assert resp.status_code == HTTP_201_CREATED
+    resp = APIClient().post(reverse('answer-list'), data={'question': text_question.id, 'text': 'аноним'})
+    assert resp.status_code == HTTP_201_CREATED
+
+    quiz.end_date = timezone.localdate() - datetime.timedelta(days=1)
+    quiz.save()
+    return quiz, text_question, option_question, options
+
+
+def archive():
+    call_command('archive_quizzes', batch_size=2)
+
+
+def read_export(client, quiz):
+    resp = client.get(reverse('quiz-export', args=[quiz.id]), {'file_format': 'jsonl'})
+    assert resp.status_code == HTTP_200_OK
+    rows = [json.loads(line) for line in b''.join(resp.streaming_content).decode().splitlines()]
+    return sorted(rows, key=lambda row: row['answer_id'])
+
+
+@pytest.mark.django_db
+def test_archive_quizzes(answered_quiz):
+    quiz = answered_quiz[0]
+
+    archive()
+
+    quiz.refresh_from_db()
+    assert quiz.archived
+    assert not Answer.objects.exists()
+    assert not UserAnswerOptions.objects.exists()
+    # По строке на пользователя и на анонимный ответ:
+    assert ArchivedResponse.objects.filter(quiz=quiz).count() == 3
+
+    # Повторный запуск ничего не переносит:
+    archive()
+    assert ArchivedResponse.objects.filter(quiz=quiz).count() == 3
+
+
+@pytest.mark.django_db
+def test_active_quiz_not_archived(answered_quiz, quiz_factory, question_factory, answer_factory):
+    active_answer = answer_factory(question=question_factory(quiz=quiz_factory()), user=None)
+
+    archive()
+
+    assert list(Answer.objects.all()) == [active_answer]
+    assert not active_answer.question.quiz.archived
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('compiled', [True, False])
+def test_quiz_user_answers_read_through(settings, compiled, admin_api_client, user, answered_quiz):
+    settings.COMPILED_SERIALIZERS = compiled
+    quiz = answered_quiz[0]
+    requests = [
+        (reverse('quizuseranswer-list'), {'user': user.id}),
+        (reverse('quizuseranswer-list'), {}),
+        (reverse('quizuseranswer-detail', args=[quiz.id]), {}),
+        (reverse('quizuseranswer-list'), {'user': user.id, 'fields': 'id,questions.answer'}),
+    ]
+    before = [admin_api_client.get(url, params).json() for url, params in requests]
+
+    archive()
+
+    after = [admin_api_client.get(url, params).json() for url, params in requests]
+    assert after == before
+    assert [len(q['answer']) for q in after[0]['results'][0]['questions']] == [1, 1]
+
+
+@pytest.mark.django_db
+def test_export_and_results_read_through(admin_api_client, answered_quiz):
+    quiz = answered_quiz[0]
+    export = read_export(admin_api_client, quiz)
+    results = admin_api_client.get(reverse('quiz-results', args=[quiz.id])).json()
+
+    archive()
+
+    assert read_export(admin_api_client, quiz) == export
+    assert admin_api_client.get(reverse('quiz-results', args=[quiz.id])).json() == results
+
+
+@pytest.mark.django_db
+def test_export_skips_deleted_questions_of_archived_quiz(admin_api_client, answered_quiz):
+    quiz, text_question, option_question, _ = answered_quiz
+    export = read_export(admin_api_client, quiz)
+
+    archive()
+    # Ответы на удалённый вопрос остаются в архиве, но не выгружаются:
+    text_question.delete()
+
+    assert read_export(admin_api_client, quiz) == [row for row in export if row['question_id'] == option_question.id]
+
+
+@pytest.mark.django_db
+def test_rebuild_counters_from_archive(answered_quiz):
+    quiz = answered_quiz[0]
+    counters = set(ResultCounter.objects.values_list('kind', 'object_id', 'value'))
+    participations = set(QuizParticipation.objects.values_list('user_id', 'answered_count'))
+
+    archive()
+    call_command('rebuild_result_counters', quiz_ids=[quiz.id])
+
+    assert set(ResultCounter.objects.values_list('kind', 'object_id', 'value')) == counters
+    assert set(QuizParticipation.objects.values_list('user_id', 'answered_count')) == participations
+
+
+@pytest.mark.django_db
+def test_archived_quiz_rejects_answers(answered_quiz):
+    quiz, text_question, _, _ = answered_quiz
+    archive()
+
+    resp = APIClient().post(reverse('answer-list'), data={'question': text_question.id, 'text': 'поздно'})
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    resp = APIClient().post(reverse('answer-bulk-create'), data={
+        'quiz': quiz.id, 'answers': [{'question': text_question.id, 'text': 'поздно'}]
+    }, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
@@ -0,0 +1,80 @@
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
+
+from api.authentication import CachedTokenAuthentication, get_token_cache_stats, reset_token_cache_stats
+from api.cache import get_token_caches, get_token_cache_key
+
+
+@pytest.fixture(autouse=True)
+def token_cache_stats():
+    reset_token_cache_stats()
+
+
+@pytest.mark.django_db
+def test_token_cached_after_first_request(user_api_client, django_assert_num_queries):
+    url = reverse('answer-list')
+
+    with django_assert_num_queries(2):
+        assert user_api_client.get(url).status_code == HTTP_200_OK
+    # Токен берётся из кеша, остаётся только выборка ответов:
+    with django_assert_num_queries(1):
+        assert user_api_client.get(url).status_code == HTTP_200_OK
+
+    stats = get_token_cache_stats()
+    assert stats['misses'] == 1
+    assert stats['local_hits'] == 1
+    assert stats['hit_rate'] == 0.5
+
+
+@pytest.mark.django_db
+def test_token_deleted(user_api_client, user_token):
+    url = reverse('answer-list')
+    assert user_api_client.get(url).status_code == HTTP_200_OK
+
+    user_token.delete()
+    assert user_api_client.get(url).status_code == HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_user_deactivated(user_api_client, user):
+    url = reverse('answer-list')
+    assert user_api_client.get(url).status_code == HTTP_200_OK
+
+    user.is_active = False
+    user.save()
+    assert user_api_client.get(url).status_code == HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_user_loses_staff(admin_api_client, admin):
+    url = reverse('token-cache-stats')
+    assert admin_api_client.get(url).status_code == HTTP_200_OK
+
+    admin.is_staff = False
+    admin.save()
+    assert admin_api_client.get(url).status_code == HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+def test_cached_token_has_no_credentials(user_api_client, user, user_token):
+    assert user_api_client.get(reverse('answer-list')).status_code == HTTP_200_OK
+
+    cached = [cache.get(get_token_cache_key(user_token.key)) for cache in get_token_caches()]
+    assert cached[0] == cached[1]
+    created, user_values = cached[1]
+    assert created == user_token.created
+    assert user.password not in user_values
+
+
+@pytest.mark.django_db
+def test_cached_user_save_keeps_password(user, user_token):
+    CachedTokenAuthentication().authenticate_credentials(user_token.key)
+    cached_user, _ = CachedTokenAuthentication().authenticate_credentials(user_token.key)
+    assert get_token_cache_stats()['local_hits'] == 1
+
+    # Некешированные поля отложены: save() обновляет только кешированные поля:
+    cached_user.save()
+    user.refresh_from_db()
+    assert user.password == 'password'
+    assert cached_user.password == 'password'
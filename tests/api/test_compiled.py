@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+from django.core.cache import caches
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import serializers
+from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+
+from api.compiled import CompiledSerializer
+from api.models import Quiz
+
+
+@pytest.fixture
+def quiz_answers(user, quiz_factory, question_factory, question_answer_options_factory, answer_factory):
+    quizzes = quiz_factory(end_date=timezone.localdate() + datetime.timedelta(days=1), _quantity=3)
+    for quiz in quizzes:
+        answer_factory(question=question_factory(quiz=quiz, type='TEXT'), text='text')
+        question = question_factory(quiz=quiz, type='MULTIPLE_ANSWER_OPTION')
+        options = question_answer_options_factory(question=question, _quantity=3)
+        answer = answer_factory(question=question, text=None)
+        answer.user_answer_options.create(answer_option=options[0])
+        answer.user_answer_options.create(answer_option=options[2])
+        baker.make('QuizParticipation', user=user, quiz=quiz, answered_count=2)
+    # Опрос без вопросов:
+    quizzes.append(quiz_factory(end_date=timezone.localdate() + datetime.timedelta(days=1)))
+    return quizzes
+
+
+def get_content(client, settings, compiled, url, data=None):
+    settings.COMPILED_SERIALIZERS = compiled
+    for cache in caches.all():
+        cache.clear()
+    resp = client.get(url, data)
+    assert resp.status_code == HTTP_200_OK
+    return resp.content
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url_name, detail, params', [
+    ('quiz-list', False, None),
+    ('quiz-list', False, {'page_size': 2}),
+    ('quiz-detail', True, None),
+    ('quizuseranswer-list', False, {'user': 'user'}),
+    ('quizuseranswer-list', False, {'user': 'user', 'ordering': '-last_answered_at', 'page_size': 2}),
+    ('quizuseranswer-detail', True, None),
+])
+def test_compiled_output_matches_serializer(admin_api_client, user, settings, quiz_answers, url_name, detail, params):
+    url = reverse(url_name, args=[quiz_answers[0].id] if detail else None)
+    params = {k: user.id if v == 'user' else v for k, v in (params or {}).items()}
+
+    assert get_content(admin_api_client, settings, True, url, params) == \
+        get_content(admin_api_client, settings, False, url, params)
+
+
+@pytest.mark.django_db
+def test_compiled_retrieve_not_found(user_api_client):
+    resp = user_api_client.get(reverse('quiz-detail', args=[0]))
+    assert resp.status_code == HTTP_404_NOT_FOUND
+
+
+def test_compile_unsupported_serializer():
+    class QuizQuestionsCountSerializer(serializers.ModelSerializer):
+        questions_count = serializers.SerializerMethodField()
+
+        class Meta:
+            model = Quiz
+            fields = ['id', 'title', 'questions_count']
+
+    assert CompiledSerializer.compile(QuizQuestionsCountSerializer()) is None
@@ -0,0 +1,80 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+def test_quiz_list_not_modified(admin_api_client, quiz_factory, question_factory, question_answer_options_factory):
+    quiz = quiz_factory()
+    question = question_factory(quiz=quiz, type='SINGLE_ANSWER_OPTION')
+    url = reverse('quiz-list')
+
+    resp = admin_api_client.get(url)
+    etag = resp['ETag']
+
+    resp = admin_api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_304_NOT_MODIFIED
+
+    question_answer_options_factory(question=question)
+    resp = admin_api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_200_OK
+    assert resp['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_quiz_detail_not_modified_since(admin_api_client, quiz_factory):
+    quiz = quiz_factory()
+    url = reverse('quiz-detail', args=[quiz.id])
+
+    resp = admin_api_client.get(url)
+    resp = admin_api_client.get(url, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+    assert resp.status_code == HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+def test_question_detail_not_modified(admin_api_client, question_factory, django_assert_num_queries):
+    question = question_factory()
+    url = reverse('question-detail', args=[question.id])
+
+    etag = admin_api_client.get(url)['ETag']
+    # Валидаторы условного запроса (токен уже в кеше):
+    with django_assert_num_queries(1):
+        resp = admin_api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+def test_quizuseranswer_list_modified_by_new_answer(user_api_client, user, question_factory, answer_factory):
+    question, other_question = question_factory(_quantity=2)
+    answer_factory(question=question)
+    url = reverse('quizuseranswer-list')
+
+    etag = user_api_client.get(url, {'user': user.id})['ETag']
+    resp = user_api_client.get(url, {'user': user.id}, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_304_NOT_MODIFIED
+
+    resp = user_api_client.post(reverse('answer-list'), data={'question': other_question.id, 'text': 'something'},
+                                format='json')
+    assert resp.status_code == HTTP_201_CREATED
+
+    resp = user_api_client.get(url, {'user': user.id}, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_quizuseranswer_list_etag_by_parsed_user(user_api_client, user, question_factory, answer_factory):
+    # ETag считается по тому же id пользователя, по которому фильтруются опросы:
+    question = question_factory()
+    answer_factory(question=question)
+    baker.make('QuizParticipation', user=user, quiz=question.quiz, answered_count=1, last_answered_at=timezone.now())
+    url = reverse('quizuseranswer-list')
+
+    params = {'user': f'{user.id}.0', 'ordering': '-last_answered_at'}
+    resp = user_api_client.get(url, params)
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.json()['results']) == 1
+
+    resp = user_api_client.get(url, params, HTTP_IF_NONE_MATCH=resp['ETag'])
+    assert resp.status_code == HTTP_304_NOT_MODIFIED
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+
+
+@pytest.fixture
+def quiz_answers(quiz_factory, question_factory, question_answer_options_factory, answer_factory):
+    quiz = quiz_factory()
+    text_question = question_factory(quiz=quiz, type='TEXT')
+    option_question = question_factory(quiz=quiz, type='MULTIPLE_ANSWER_OPTION')
+    options = question_answer_options_factory(question=option_question, _quantity=3)
+
+    # Каждый пользователь отвечает на вопрос один раз:
+    users = baker.make(User, _quantity=5)
+    answers = [answer_factory(question=text_question, text='something', user=u) for u in users]
+    for answer in [answer_factory(question=option_question, user=u) for u in users]:
+        answer.user_answer_options.create(answer_option=options[0])
+        answer.user_answer_options.create(answer_option=options[2])
+        answers.append(answer)
+    return quiz, answers, options
+
+
+def read_streaming_content(resp):
+    return b''.join(resp.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_quiz_export_csv(admin_api_client, quiz_answers, django_assert_max_num_queries):
+    quiz, answers, options = quiz_answers
+    url = reverse('quiz-export', args=[quiz.id])
+
+    # Токен, опрос, вопросы, варианты ответов для предзагрузки и выгрузки, ответы, выбранные варианты:
+    with django_assert_max_num_queries(8):
+        resp = admin_api_client.get(url)
+        assert resp.status_code == HTTP_200_OK
+        rows = list(csv.DictReader(io.StringIO(read_streaming_content(resp))))
+
+    assert [int(r['answer_id']) for r in rows] == [a.id for a in answers]
+    assert rows[0]['text'] == 'something'
+    assert rows[-1]['answer_options'] == f'{options[0].name}; {options[2].name}'
+
+
+@pytest.mark.django_db
+def test_quiz_export_jsonl(admin_api_client, quiz_answers):
+    quiz, answers, options = quiz_answers
+    url = reverse('quiz-export', args=[quiz.id])
+
+    resp = admin_api_client.get(url, {'file_format': 'jsonl'})
+    assert resp.status_code == HTTP_200_OK
+
+    rows = [json.loads(line) for line in read_streaming_content(resp).splitlines()]
+    assert [r['answer_id'] for r in rows] == [a.id for a in answers]
+    assert rows[-1]['answer_options'] == [options[0].name, options[2].name]
+
+
+@pytest.mark.django_db
+def test_quiz_export_wrong_format(admin_api_client, quiz_factory):
+    url = reverse('quiz-export', args=[quiz_factory().id])
+
+    resp = admin_api_client.get(url, {'file_format': 'xlsx'})
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_quiz_export_by_user(user_api_client, quiz_factory):
+    url = reverse('quiz-export', args=[quiz_factory().id])
+
+    resp = user_api_client.get(url)
+    assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+def test_export_quiz_answers_command(quiz_answers):
+    quiz, answers, _ = quiz_answers
+    stdout = io.StringIO()
+
+    call_command('export_quiz_answers', quiz.id, '--format', 'jsonl', stdout=stdout)
+
+    rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [r['answer_id'] for r in rows] == [a.id for a in answers]
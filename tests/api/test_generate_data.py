@@ -0,0 +1,95 @@
+import io
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from rest_framework.authtoken.models import Token
+
+from api.datagen import DataGenerator, format_copy_value
+from api.models import Quiz, Question, QuestionAnswerOptions, Answer, UserAnswerOptions, ResultCounter, \
+    QuizParticipation
+from api.participation import rebuild_quiz_participations
+from api.results import rebuild_result_counters
+
+GENERATE_OPTIONS = {'users': 30, 'quizzes': 8, 'questions': 4, 'options': 4, 'respondents': 12, 'skew': 1.5}
+
+
+def dump_data():
+    return {
+        model: list(model._base_manager.order_by('pk').values_list(*fields))
+        for model, fields in [
+            (User, ['username']),
+            (Token, ['key', 'user__username']),
+            (Quiz, ['title', 'description', 'start_date', 'end_date']),
+            (Question, ['text', 'type', 'quiz__title']),
+            (QuestionAnswerOptions, ['name', 'question__text']),
+            (Answer, ['text', 'user__username', 'question__text']),
+            (UserAnswerOptions, ['answer__user__username', 'answer_option__name']),
+        ]
+    }
+
+
+def dump_derived_data(quiz_ids):
+    return (
+        sorted(ResultCounter.objects.filter(quiz_id__in=quiz_ids).values_list('quiz_id', 'kind', 'object_id', 'value')),
+        sorted(QuizParticipation.objects.filter(quiz_id__in=quiz_ids).values_list(
+            'quiz_id', 'user_id', 'answered_count'
+        )),
+    )
+
+
+@pytest.mark.django_db
+def test_generate_data():
+    generator = DataGenerator(seed=1, batch_size=50)
+    counts = generator.generate(**GENERATE_OPTIONS)
+
+    assert counts[User] == counts[Token] == User.objects.count() == 30
+    assert counts[Quiz] == len(generator.quiz_ids) == 8
+    assert counts[Question] == Question.objects.count() == 32
+    assert counts[Answer] == Answer.objects.count()
+    assert counts[UserAnswerOptions] == UserAnswerOptions.objects.count()
+    # Варианты ответов выбираются только из вариантов вопроса ответа:
+    assert not UserAnswerOptions.objects.exclude(answer_option__question_id=F('answer__question_id')).exists()
+
+    # Счётчики результатов и участие совпадают с пересчётом по ответам:
+    generated = dump_derived_data(generator.quiz_ids)
+    rebuild_result_counters(generator.quiz_ids)
+    rebuild_quiz_participations(generator.quiz_ids)
+    assert dump_derived_data(generator.quiz_ids) == generated
+
+    # Популярность опросов неравномерна:
+    respondents = sorted(ResultCounter.objects.filter(kind='RESPONDENTS').values_list('value', flat=True))
+    assert respondents[-1] >= 3 * respondents[0]
+
+
+@pytest.mark.django_db
+def test_generate_data_is_deterministic():
+    DataGenerator(seed=1).generate(**GENERATE_OPTIONS)
+    first = dump_data()
+    for model in first:
+        model._base_manager.all().delete()
+
+    DataGenerator(seed=1).generate(**GENERATE_OPTIONS)
+    assert dump_data() == first
+
+    # Следующие данные дописываются после существующих:
+    DataGenerator(seed=2).generate(**GENERATE_OPTIONS)
+    assert User.objects.count() == 60
+    assert dump_data()[Quiz][:8] == first[Quiz]
+
+
+@pytest.mark.django_db
+def test_generate_data_command():
+    out = io.StringIO()
+    call_command('generate_data', '--users', '5', '--quizzes', '2', '--respondents', '3', stdout=out)
+    assert 'api.Quiz: 2' in out.getvalue()
+    assert Quiz.objects.count() == 2
+
+    with pytest.raises(CommandError):
+        call_command('generate_data', '--anonymous', '2', stdout=io.StringIO())
+
+
+def test_format_copy_value():
+    values = [None, True, False, 1, 'a\tb\\c\nd']
+    assert [format_copy_value(v) for v in values] == ['\\N', 't', 'f', '1', 'a\\tb\\\\c\\nd']
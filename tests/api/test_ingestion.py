@@ -0,0 +1,136 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.status import HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST, HTTP_200_OK
+
+from api.ingestion import get_answer_queue, flush_answer_queue
+from api.models import Answer, ResultCounter, UserAnswerOptions, QuizParticipation
+
+
+@pytest.fixture
+def answer_queue(settings, tmp_path):
+    settings.ANSWER_INGESTION = 'queue'
+    settings.ANSWER_INGESTION_QUEUE = str(tmp_path / 'answer_queue.sqlite3')
+    return get_answer_queue()
+
+
+@pytest.fixture
+def option_question(question_factory, question_answer_options_factory):
+    question = question_factory(type='MULTIPLE_ANSWER_OPTION')
+    return question, question_answer_options_factory(question=question, _quantity=3)
+
+
+@pytest.mark.django_db
+def test_answer_queued_and_flushed(user_api_client, user, answer_queue, option_question):
+    question, options = option_question
+    payload = {'question': question.id, 'user_answer_options': [{'answer_option': o.id} for o in options[:2]]}
+
+    resp = user_api_client.post(reverse('answer-list'), data=payload, format='json')
+    assert resp.status_code == HTTP_202_ACCEPTED
+    assert resp.json()['user_answer_options'] == payload['user_answer_options']
+    assert Answer.objects.count() == 0
+    assert answer_queue.pending_count() == 1
+
+    call_command('flush_answer_queue')
+    assert answer_queue.pending_count() == 0
+    answer = Answer.objects.get()
+    assert (answer.user_id, answer.question_id) == (user.id, question.id)
+    assert sorted(UserAnswerOptions.objects.values_list('answer_option_id', flat=True)) == [o.id for o in options[:2]]
+    assert QuizParticipation.objects.get(user=user).answered_count == 1
+    counters = dict(ResultCounter.objects.values_list('kind', 'value').filter(
+        kind__in=['RESPONDENTS', 'QUESTION_ANSWERS']
+    ))
+    assert counters == {'RESPONDENTS': 1, 'QUESTION_ANSWERS': 1}
+
+
+@pytest.mark.django_db
+def test_queued_answer_duplicate(user_api_client, answer_queue, question_factory):
+    url = reverse('answer-list')
+    payload = {'question': question_factory(type='TEXT').id, 'text': 'something'}
+
+    assert user_api_client.post(url, data=payload, format='json').status_code == HTTP_202_ACCEPTED
+    # Повтор, пока ответ в очереди:
+    assert user_api_client.post(url, data=payload, format='json').status_code == HTTP_400_BAD_REQUEST
+    flush_answer_queue()
+    # Повтор после записи в базу:
+    assert user_api_client.post(url, data=payload, format='json').status_code == HTTP_400_BAD_REQUEST
+    assert answer_queue.pending_count() == 0
+    assert Answer.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_quizuseranswer_reads_own_queued_answers(user_api_client, user, answer_queue, question_factory):
+    question = question_factory(type='TEXT')
+    resp = user_api_client.post(reverse('answer-list'), data={'question': question.id, 'text': 'mine'}, format='json')
+    assert resp.status_code == HTTP_202_ACCEPTED
+
+    resp = user_api_client.get(reverse('quizuseranswer-list'), {'user': user.id})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['results'][0]['questions'][0]['answer'][0]['text'] == 'mine'
+    assert answer_queue.pending_count() == 0
+
+
+@pytest.mark.django_db
+def test_flush_dead_letters_orphaned_answers(user_api_client, user, answer_queue, question_factory, option_question):
+    text_question = question_factory(type='TEXT')
+    question, options = option_question
+    url = reverse('answer-list')
+    resp = user_api_client.post(url, data={'question': text_question.id, 'text': 'text'}, format='json')
+    assert resp.status_code == HTTP_202_ACCEPTED
+    resp = user_api_client.post(url, data={'question': question.id, 'user_answer_options': [
+        {'answer_option': o.id} for o in options[:2]
+    ]}, format='json')
+    assert resp.status_code == HTTP_202_ACCEPTED
+
+    # Вопрос и выбранный вариант ответа удалены до записи ответов в базу:
+    text_question.delete()
+    options[0].delete()
+    assert flush_answer_queue() == 0
+    assert flush_answer_queue() == 0
+    assert answer_queue.pending_count() == 0
+    assert answer_queue.dead_count() == 2
+
+    resp = user_api_client.get(reverse('quizuseranswer-list'), {'user': user.id})
+    assert resp.status_code == HTTP_200_OK
+    assert not Answer.objects.exists()
+
+
+@pytest.mark.django_db
+def test_flush_skips_answers_written_directly(user, answer_queue, question_factory, answer_factory):
+    questions = question_factory(type='TEXT', _quantity=3)
+    for question in questions:
+        answer_queue.release([answer_queue.put(user.id, question.id, question.quiz_id, 'queued', [])])
+    answer_factory(question=questions[1], text='direct')
+
+    assert flush_answer_queue() == 2
+    assert answer_queue.pending_count() == 0
+    assert sorted(Answer.objects.values_list('text', flat=True)) == ['direct', 'queued', 'queued']
+
+
+@pytest.mark.django_db
+def test_bulk_answers_queued(user_api_client, user, answer_queue, question_factory, option_question):
+    question, options = option_question
+    text_question = question_factory(type='TEXT', quiz=question.quiz)
+    payload = {'quiz': question.quiz_id, 'answers': [
+        {'question': question.id, 'user_answer_options': [{'answer_option': o.id} for o in options[:2]]},
+        {'question': text_question.id, 'text': 'text'},
+    ]}
+    url = reverse('answer-bulk-create')
+
+    resp = user_api_client.post(url, data=payload, format='json')
+    assert resp.status_code == HTTP_202_ACCEPTED
+    assert [a['user_answer_options'] for a in resp.json()['answers']] == [
+        [{'answer_option': o.id} for o in options[:2]], []
+    ]
+    assert Answer.objects.count() == 0
+    assert answer_queue.pending_count() == 2
+    # Повтор, пока ответы в очереди, отклоняется целиком:
+    assert user_api_client.post(url, data=payload, format='json').status_code == HTTP_400_BAD_REQUEST
+    assert answer_queue.pending_count() == 2
+
+    assert flush_answer_queue() == 2
+    assert UserAnswerOptions.objects.count() == 2
+    assert QuizParticipation.objects.get(user=user).answered_count == 2
+    # Повтор после записи в базу:
+    assert user_api_client.post(url, data=payload, format='json').status_code == HTTP_400_BAD_REQUEST
+    assert answer_queue.pending_count() == 0
@@ -0,0 +1,173 @@
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND
+
+from api.live import ResultsBroker, ResultsMessage, CounterVersion, TxidSnapshot, format_delta_event, \
+    get_message_event, iter_results_events
+from api.results import get_live_results
+
+
+@pytest.fixture
+def live_settings(settings):
+    settings.LIVE_RESULTS_WINDOW = 0.01
+    settings.LIVE_RESULTS_HEARTBEAT = 1
+    settings.LIVE_RESULTS_BACKLOG = 2
+    return settings
+
+
+def parse_events(chunk):
+    events = []
+    for block in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_broker_coalesces_deltas(live_settings):
+    broker = ResultsBroker()
+    channel = broker.subscribe(1)
+
+    broker.publish(1, 1, {('OPTION_SELECTIONS', 10): 1, ('QUESTION_ANSWERS', 5): 1})
+    broker.publish(1, 2, {('OPTION_SELECTIONS', 10): 1, ('RESPONDENTS', 1): 1})
+    # Опросы без подписчиков не копят приращения:
+    broker.publish(2, 1, {('QUESTION_ANSWERS', 6): 1})
+
+    messages = channel.wait(0, timeout=1)
+    assert len(messages) == 1
+    assert parse_events(messages[0].event) == [
+        ('delta', {'respondents': 1, 'answers': {'5': 1}, 'selections': {'10': 2}})
+    ]
+    assert list(broker.channels) == [1]
+
+    broker.unsubscribe(1, channel)
+    assert not broker.channels
+
+
+def test_broker_lagging_subscriber(live_settings):
+    broker = ResultsBroker()
+    channel = broker.subscribe(1)
+    for version in range(1, 4):
+        channel.add(version, {('QUESTION_ANSWERS', 5): 1})
+        channel.flush()
+
+    assert channel.wait(0, timeout=0) is None
+    assert [message.seq for message in channel.wait(1, timeout=0)] == [2, 3]
+    assert channel.wait(3, timeout=0) == []
+
+    # После сброса канала (переподключение слушателя) подписчики получают snapshot заново:
+    channel.reset()
+    assert channel.wait(3, timeout=0) is None
+
+
+def test_message_event_skips_deltas_in_snapshot():
+    updates = [(1, {('QUESTION_ANSWERS', 5): 1}), (2, {('QUESTION_ANSWERS', 5): 1, ('OPTION_SELECTIONS', 10): 1})]
+    event = format_delta_event(1, {('QUESTION_ANSWERS', 5): 2, ('OPTION_SELECTIONS', 10): 1})
+    message = ResultsMessage(1, updates, event)
+
+    assert get_message_event(message, CounterVersion(0)) is message.event
+    assert parse_events(get_message_event(message, CounterVersion(1))) == [
+        ('delta', {'respondents': 0, 'answers': {'5': 1}, 'selections': {'10': 1}})
+    ]
+    assert get_message_event(message, CounterVersion(2)) == b''
+
+
+def test_txid_snapshot_includes_committed_transactions():
+    snapshot = TxidSnapshot.parse('100:105:101,103')
+    assert snapshot == TxidSnapshot(100, 105, frozenset({101, 103}))
+    # Зафиксированы до snapshot:
+    assert snapshot.includes(99)
+    assert snapshot.includes(102)
+    # Выполнялись во время чтения snapshot или начались после него:
+    assert not snapshot.includes(101)
+    assert not snapshot.includes(105)
+    assert TxidSnapshot.parse('100:100:') == TxidSnapshot(100, 100, frozenset())
+
+    message = ResultsMessage(1, [(102, {('QUESTION_ANSWERS', 5): 1}), (103, {('QUESTION_ANSWERS', 5): 1})], b'')
+    assert parse_events(get_message_event(message, snapshot)) == [
+        ('delta', {'respondents': 0, 'answers': {'5': 1}, 'selections': {}})
+    ]
+
+
+@pytest.mark.django_db
+def test_results_stream_disabled(settings, admin_api_client, question_factory, question_answer_options_factory):
+    settings.LIVE_RESULTS_ENABLED = False
+    question = question_factory(type='SINGLE_ANSWER_OPTION')
+    option = question_answer_options_factory(question=question)
+
+    resp = admin_api_client.get(reverse('quiz-results-stream', args=[question.quiz_id]))
+    assert resp.status_code == HTTP_404_NOT_FOUND
+
+    # Счётчики результатов обновляются, версия записи не ведётся:
+    resp = admin_api_client.post(reverse('answer-list'), data={
+        'question': question.id, 'user_answer_options': [{'answer_option': option.id}]
+    }, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+    counters = dict(question.quiz.result_counters.values_list('kind', 'value'))
+    assert counters == {'RESPONDENTS': 1, 'QUESTION_ANSWERS': 1, 'OPTION_SELECTIONS': 1}
+
+
+@pytest.mark.django_db
+def test_results_stream_by_user(user_api_client, quiz_factory):
+    resp = user_api_client.get(reverse('quiz-results-stream', args=[quiz_factory().id]))
+    assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+# Приращения отправляются после фиксации транзакции записи ответа:
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_results_stream(live_settings, admin_api_client, user_api_client, question_factory,
+                        question_answer_options_factory, replicate):
+    question = question_factory(type='SINGLE_ANSWER_OPTION')
+    option = question_answer_options_factory(question=question)
+    replicate()
+
+    resp = admin_api_client.get(reverse('quiz-results-stream', args=[question.quiz_id]))
+    assert resp.status_code == HTTP_200_OK
+    assert resp['Content-Type'] == 'text/event-stream'
+    events = iter(resp.streaming_content)
+
+    [(event, snapshot)] = parse_events(next(events))
+    assert event == 'snapshot'
+    assert snapshot['questions'][0]['answer_options'][0]['selections'] == 0
+
+    resp_answer = user_api_client.post(reverse('answer-list'), data={
+        'question': question.id, 'user_answer_options': [{'answer_option': option.id}]
+    }, format='json')
+    assert resp_answer.status_code == HTTP_201_CREATED
+
+    assert parse_events(next(events)) == [
+        ('delta', {'respondents': 1, 'answers': {str(question.id): 1}, 'selections': {str(option.id): 1}})
+    ]
+    resp.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_results_stream_answer_during_snapshot(live_settings, admin_api_client, user_api_client, question_factory,
+                                               question_answer_options_factory):
+    question = question_factory(type='SINGLE_ANSWER_OPTION')
+    option = question_answer_options_factory(question=question)
+
+    def answer(client):
+        resp = client.post(reverse('answer-list'), data={
+            'question': question.id, 'user_answer_options': [{'answer_option': option.id}]
+        }, format='json')
+        assert resp.status_code == HTTP_201_CREATED
+
+    def load_snapshot():
+        # Ответ записывается и рассылается после подписки, но до чтения snapshot:
+        answer(user_api_client)
+        return get_live_results(question.quiz)
+
+    events = iter_results_events(question.quiz_id, load_snapshot)
+    [(event, snapshot)] = parse_events(next(events))
+    assert event == 'snapshot'
+    assert snapshot['questions'][0]['answer_options'][0]['selections'] == 1
+
+    # Приращение ответа, учтённого в snapshot, не отправляется повторно:
+    answer(admin_api_client)
+    assert parse_events(next(events)) == [
+        ('delta', {'respondents': 1, 'answers': {str(question.id): 1}, 'selections': {str(option.id): 1}})
+    ]
+    events.close()
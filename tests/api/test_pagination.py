@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import localdate
+from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+
+
+def get_all_pages(client, url, params):
+    ids, queries = [], []
+    resp = client.get(url, params)
+    while True:
+        assert resp.status_code == HTTP_200_OK
+        resp_json = resp.json()
+        ids.extend(i['id'] for i in resp_json['results'])
+        if resp_json['next'] is None:
+            return ids, queries
+        with CaptureQueriesContext(connection) as captured:
+            resp = client.get(resp_json['next'])
+        queries.extend(q['sql'] for q in captured)
+
+
+@pytest.mark.django_db
+def test_answer_list_pages(user_api_client, answer_factory):
+    answer_list = answer_factory(_quantity=25)
+    url = reverse('answer-list')
+
+    ids, queries = get_all_pages(user_api_client, url, {'page_size': 10})
+
+    assert ids == sorted(a.id for a in answer_list)
+    assert not any('COUNT(' in q.upper() or 'OFFSET' in q.upper() for q in queries)
+
+
+@pytest.mark.django_db
+def test_quiz_list_pages_ordered_by_end_date(admin_api_client, quiz_factory):
+    end_dates = [localdate() + datetime.timedelta(days=d) for d in (3, 1, 2)]
+    quiz_list = [q for end_date in end_dates for q in quiz_factory(end_date=end_date, _quantity=4)]
+    url = reverse('quiz-list')
+
+    ids, _ = get_all_pages(admin_api_client, url, {'page_size': 5})
+
+    assert ids == [q.id for q in sorted(quiz_list, key=lambda q: (q.end_date, q.id))]
+
+
+@pytest.mark.django_db
+def test_page_size_is_capped(admin_api_client, question_factory):
+    question_factory(_quantity=110)
+    url = reverse('question-list')
+
+    resp = admin_api_client.get(url, {'page_size': 1000})
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.json()['results']) == 100
+
+
+@pytest.mark.django_db
+def test_previous_page(admin_api_client, question_factory):
+    question_list = question_factory(_quantity=15)
+    url = reverse('question-list')
+
+    first_page = admin_api_client.get(url, {'page_size': 5}).json()
+    second_page = admin_api_client.get(first_page['next']).json()
+    resp = admin_api_client.get(second_page['previous'])
+
+    assert [q['id'] for q in resp.json()['results']] == [q.id for q in question_list[:5]]
+
+
+@pytest.mark.django_db
+def test_invalid_cursor(admin_api_client):
+    url = reverse('question-list')
+
+    resp = admin_api_client.get(url, {'cursor': 'cD1hYmM='})
+    assert resp.status_code == HTTP_404_NOT_FOUND
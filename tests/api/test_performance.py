@@ -0,0 +1,85 @@
+import logging
+
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@pytest.mark.django_db
+def test_server_timing(settings, admin_api_client, quiz_factory):
+    settings.DEBUG = False
+    quiz_factory(_quantity=3)
+
+    response = admin_api_client.get(reverse('quiz-list'))
+    assert response.status_code == HTTP_200_OK
+
+    metrics = parse_server_timing(response['Server-Timing'])
+    assert metrics['view']['desc'] == '"QuizViewSet.list"'
+    # Запросы считаются и без DEBUG: токен, количество и страница опросов, вопросы:
+    assert int(metrics['db']['desc'].strip('"').split()[0]) >= 2
+    for name in ('db', 'serialize', 'render', 'total'):
+        assert float(metrics[name]['dur']) >= 0
+
+
+@pytest.mark.django_db
+def test_server_timing_action(user_api_client, question_factory):
+    question = question_factory(type='TEXT')
+
+    response = user_api_client.post(reverse('answer-list'), data={'question': question.id, 'text': 'text'})
+    assert response.status_code == HTTP_201_CREATED
+    assert parse_server_timing(response['Server-Timing'])['view']['desc'] == '"AnswerViewSet.create"'
+
+
+@pytest.mark.django_db
+def test_server_timing_render(admin_api_client, quiz_factory):
+    quiz_factory(_quantity=3)
+
+    metrics = parse_server_timing(admin_api_client.get(reverse('quiz-list'))['Server-Timing'])
+    # Учитывается только отрисовка ответа, без остальной обработки запроса:
+    assert 0 <= float(metrics['render']['dur']) <= float(metrics['total']['dur'])
+
+
+@pytest.mark.django_db
+def test_server_timing_streaming(admin_api_client, quiz_factory):
+    response = admin_api_client.get(reverse('quiz-export', args=[quiz_factory().id]))
+    assert response.status_code == HTTP_200_OK
+    # Тело потокового ответа формируется позже заголовков, метрики не отдаются:
+    assert 'Server-Timing' not in response
+
+
+@pytest.mark.django_db
+def test_not_sampled(settings, admin_api_client):
+    settings.PERFORMANCE_SAMPLE_RATE = 0
+
+    response = admin_api_client.get(reverse('quiz-list'))
+    assert response.status_code == HTTP_200_OK
+    assert 'Server-Timing' not in response
+
+
+@pytest.mark.django_db
+def test_slow_request_logged(settings, caplog, admin_api_client):
+    settings.PERFORMANCE_SLOW_REQUEST_MS = 0
+
+    with caplog.at_level(logging.WARNING, logger='api.performance'):
+        assert admin_api_client.get(reverse('quiz-list')).status_code == HTTP_200_OK
+
+    [record] = caplog.records
+    assert 'QuizViewSet.list' in record.getMessage()
+    assert 'SELECT' in record.getMessage()
+
+
+@pytest.mark.django_db
+def test_fast_request_not_logged(settings, caplog, admin_api_client):
+    settings.PERFORMANCE_SLOW_REQUEST_MS = 60000
+
+    with caplog.at_level(logging.WARNING, logger='api.performance'):
+        assert admin_api_client.get(reverse('quiz-list')).status_code == HTTP_200_OK
+    assert not caplog.records
@@ -1,8 +1,13 @@
 import random
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT, \
+    HTTP_400_BAD_REQUEST
+
+from api.models import QuestionAnswerOptions, UserAnswerOptions
 
 
 @pytest.mark.django_db
@@ -27,7 +32,7 @@ def test_question_list(admin_api_client, question_factory):
 
     resp_json = resp.json()
     expected_ids = {q.id for q in question_list}
-    response_ids = {q['id'] for q in resp_json}
+    response_ids = {q['id'] for q in resp_json['results']}
     assert expected_ids == response_ids
 
 
@@ -129,5 +134,110 @@ def test_question_delete_by_admin(admin_api_client, question_factory):
 
     assert resp.status_code == HTTP_204_NO_CONTENT
 
-    existing_ids = [q['id'] for q in admin_api_client.get(reverse('question-list')).json()]
+    existing_ids = [q['id'] for q in admin_api_client.get(reverse('question-list')).json()['results']]
     assert random_question.id not in existing_ids
+
+
+@pytest.mark.django_db
+def test_question_list_query_count(admin_api_client, question_factory, question_answer_options_factory,
+                                   django_assert_num_queries):
+    for question in question_factory(type='MULTIPLE_ANSWER_OPTION', _quantity=10):
+        question_answer_options_factory(question=question, _quantity=3)
+    url = reverse('question-list')
+
+    # Токен, валидаторы условного запроса, вопросы, варианты ответов:
+    with django_assert_num_queries(4):
+        resp = admin_api_client.get(url)
+    assert resp.status_code == HTTP_200_OK
+    assert all(len(q['answer_options']) == 3 for q in resp.json()['results'])
+
+
+@pytest.mark.django_db
+def test_question_answer_options_update(admin_api_client, user_api_client, question_factory,
+                                        question_answer_options_factory):
+    question = question_factory(type='SINGLE_ANSWER_OPTION')
+    renamed, kept, answered, removed = question_answer_options_factory(question=question, _quantity=4)
+    resp = user_api_client.post(reverse('answer-list'), data={
+        'question': question.id, 'user_answer_options': [{'answer_option': answered.id}]
+    }, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+
+    resp = admin_api_client.put(reverse('question-detail', args=[question.id]), data={
+        'text': question.text, 'quiz': question.quiz_id,
+        'answer_options': [{'id': renamed.id, 'name': 'renamed'}, {'id': kept.id, 'name': kept.name}, {'name': 'new'}]
+    }, format='json')
+    assert resp.status_code == HTTP_200_OK
+    assert [a['name'] for a in resp.json()['answer_options']] == ['renamed', kept.name, 'new']
+
+    # Выбранный в ответе вариант выводится из использования, невыбранный - удаляется:
+    assert QuestionAnswerOptions.all_objects.get(id=answered.id).is_retired
+    assert not QuestionAnswerOptions.all_objects.filter(id=removed.id).exists()
+    assert UserAnswerOptions.objects.get().answer_option_id == answered.id
+
+    # Выведенный из использования вариант нельзя выбрать в новом ответе:
+    resp = admin_api_client.post(reverse('answer-list'), data={
+        'question': question.id, 'user_answer_options': [{'answer_option': answered.id}]
+    }, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_question_answer_options_update_query_count(admin_api_client, question_factory,
+                                                    question_answer_options_factory):
+    def update_options(options_count):
+        question = question_factory(type='MULTIPLE_ANSWER_OPTION')
+        options = question_answer_options_factory(question=question, _quantity=options_count)
+        payload = {'text': question.text, 'quiz': question.quiz_id,
+                   'answer_options': [{'id': o.id, 'name': f'renamed{o.id}'} for o in options[1:]] +
+                                     [{'name': f'new{i}'} for i in range(options_count)]}
+        with CaptureQueriesContext(connection) as context:
+            resp = admin_api_client.put(reverse('question-detail', args=[question.id]), data=payload,
+                                        format='json')
+        assert resp.status_code == HTTP_200_OK
+        assert len(resp.json()['answer_options']) == len(payload['answer_options'])
+        return len(context.captured_queries)
+
+    # Первый запрос читает токен, кеш которого используют следующие:
+    update_options(3)
+    assert update_options(3) == update_options(30)
+
+
+@pytest.mark.django_db
+def test_question_answer_options_patch_appends(admin_api_client, question_factory, question_answer_options_factory):
+    question = question_factory(type='SINGLE_ANSWER_OPTION')
+    renamed, kept = question_answer_options_factory(question=question, _quantity=2)
+
+    # PATCH не удаляет варианты, отсутствующие в запросе:
+    resp = admin_api_client.patch(reverse('question-detail', args=[question.id]), data={
+        'answer_options': [{'id': renamed.id, 'name': 'renamed'}, {'name': 'new'}]
+    }, format='json')
+    assert resp.status_code == HTTP_200_OK
+    assert [a['name'] for a in resp.json()['answer_options']] == ['renamed', kept.name, 'new']
+
+
+@pytest.mark.django_db
+def test_question_update_keeps_answer_options(admin_api_client, question_factory, question_answer_options_factory):
+    question = question_factory(type='SINGLE_ANSWER_OPTION')
+    options = question_answer_options_factory(question=question, _quantity=2)
+
+    resp = admin_api_client.patch(reverse('question-detail', args=[question.id]), data={'text': 'patched'},
+                                  format='json')
+    assert resp.status_code == HTTP_200_OK
+    assert [a['id'] for a in resp.json()['answer_options']] == [o.id for o in options]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('answer_options', [
+    [{'id': 0, 'name': 'unknown'}],
+    [{'name': 'a'}, {'name': 'a'}],
+    [{'id': None}],
+])
+def test_question_answer_options_update_invalid(admin_api_client, question_factory, question_answer_options_factory,
+                                                answer_options):
+    question = question_factory(type='SINGLE_ANSWER_OPTION')
+    question_answer_options_factory(question=question, _quantity=2)
+
+    resp = admin_api_client.patch(reverse('question-detail', args=[question.id]),
+                                  data={'answer_options': answer_options}, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert QuestionAnswerOptions.objects.filter(question=question).count() == 2
@@ -27,7 +27,7 @@ def test_quiz_list(admin_api_client, quiz_factory):
 
     resp_json = resp.json()
     expected_ids = {q.id for q in quiz_list}
-    response_ids = {q['id'] for q in resp_json}
+    response_ids = {q['id'] for q in resp_json['results']}
     assert expected_ids == response_ids
 
 
@@ -99,5 +99,23 @@ def test_quiz_delete_by_admin(admin_api_client, quiz_factory):
 
     assert resp.status_code == HTTP_204_NO_CONTENT
 
-    existing_ids = [q['id'] for q in admin_api_client.get(reverse('quiz-list')).json()]
+    existing_ids = [q['id'] for q in admin_api_client.get(reverse('quiz-list')).json()['results']]
     assert random_quiz.id not in existing_ids
+
+
+@pytest.mark.django_db
+def test_quiz_list_query_count(admin_api_client, quiz_factory, question_factory, question_answer_options_factory,
+                               django_assert_num_queries):
+    for quiz in quiz_factory(_quantity=10):
+        for question in question_factory(quiz=quiz, type='SINGLE_ANSWER_OPTION', _quantity=5):
+            question_answer_options_factory(question=question, _quantity=3)
+    url = reverse('quiz-list')
+
+    # Токен, валидаторы условного запроса, опросы, вопросы, варианты ответов:
+    with django_assert_num_queries(5):
+        resp = admin_api_client.get(url)
+    assert resp.status_code == HTTP_200_OK
+
+    resp_json = resp.json()
+    assert all(len(q['questions']) == 5 for q in resp_json['results'])
+    assert all(len(a['answer_options']) == 3 for q in resp_json['results'] for a in q['questions'])
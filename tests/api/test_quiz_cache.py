@@ -0,0 +1,44 @@
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+from rest_framework.test import APIClient
+
+
+@pytest.mark.django_db
+def test_quiz_list_is_cached(quiz_factory, django_assert_num_queries):
+    quiz_factory(_quantity=5)
+    client = APIClient()
+    url = reverse('quiz-list')
+
+    first = client.get(url)
+    with django_assert_num_queries(0):
+        second = client.get(url)
+
+    assert second.status_code == HTTP_200_OK
+    assert first.json() == second.json()
+
+
+@pytest.mark.django_db
+def test_quiz_cache_invalidated_by_question_create(admin_api_client, quiz_create_payload,
+                                                   question_answer_options_payload):
+    quiz = admin_api_client.post(reverse('quiz-list'), data=quiz_create_payload, format='json').json()
+    url = reverse('quiz-detail', args=[quiz['id']])
+    assert APIClient().get(url).json()['questions'] == []
+
+    payload = {'text': 'something', 'type': 'SINGLE_ANSWER_OPTION', 'quiz': quiz['id'],
+               **question_answer_options_payload}
+    resp = admin_api_client.post(reverse('question-list'), data=payload, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+
+    questions = APIClient().get(url).json()['questions']
+    assert len(questions) == 1
+    assert len(questions[0]['answer_options']) == 3
+
+
+@pytest.mark.django_db
+def test_quiz_cache_is_separate_for_staff(admin_api_client, quiz_factory):
+    quiz_factory(end_date='2000-01-01')
+    url = reverse('quiz-list')
+
+    assert APIClient().get(url).json()['results'] == []
+    assert len(admin_api_client.get(url).json()['results']) == 1
@@ -0,0 +1,116 @@
+import datetime
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import localdate
+from rest_framework.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+
+from api.models import Quiz, Question, QuestionAnswerOptions
+
+
+def import_payload(quiz_create_payload, questions_count):
+    questions = []
+    for i in range(questions_count):
+        if i % 2:
+            questions.append({'text': f'question{i}', 'type': 'TEXT'})
+        else:
+            questions.append({'text': f'question{i}', 'type': 'MULTIPLE_ANSWER_OPTION',
+                              'answer_options': [{'name': f'option{i}_{j}'} for j in range(3)]})
+    return {**quiz_create_payload, 'questions': questions}
+
+
+def question_tree(quiz):
+    return [
+        (q.text, q.type, [a.name for a in q.answer_options.order_by('id')])
+        for q in quiz.questions.order_by('id')
+    ]
+
+
+@pytest.mark.django_db
+def test_quiz_import_by_user(user_api_client, quiz_create_payload):
+    resp = user_api_client.post(reverse('quiz-import-quiz'), data=import_payload(quiz_create_payload, 2),
+                                format='json')
+    assert resp.status_code == HTTP_403_FORBIDDEN
+    assert not Quiz.objects.exists()
+
+
+@pytest.mark.django_db
+def test_quiz_import_by_admin(admin_api_client, quiz_create_payload):
+    payload = import_payload(quiz_create_payload, 4)
+
+    resp = admin_api_client.post(reverse('quiz-import-quiz'), data=payload, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+
+    quiz = Quiz.objects.get()
+    assert quiz.title == payload['title']
+    assert question_tree(quiz) == [
+        (q['text'], q['type'], [a['name'] for a in q.get('answer_options', [])]) for q in payload['questions']
+    ]
+    # Ответ совпадает с выдачей опроса:
+    assert resp.json() == admin_api_client.get(reverse('quiz-detail', args=[quiz.id])).json()
+
+
+@pytest.mark.django_db
+def test_quiz_import_query_count(admin_api_client, quiz_create_payload):
+    with CaptureQueriesContext(connection) as context:
+        resp = admin_api_client.post(reverse('quiz-import-quiz'), data=import_payload(quiz_create_payload, 20),
+                                     format='json')
+    assert resp.status_code == HTTP_201_CREATED
+    assert QuestionAnswerOptions.objects.count() == 30
+
+    inserts = [q['sql'] for q in context.captured_queries if q['sql'].startswith('INSERT')]
+    assert len([sql for sql in inserts if 'api_quiz"' in sql]) == 1
+    # Вопросы и варианты ответов вставляются одним запросом, если база возвращает id из массовой вставки:
+    bulk_insert = connection.features.can_return_ids_from_bulk_insert
+    assert len([sql for sql in inserts if 'api_question"' in sql]) == (1 if bulk_insert else 20)
+    assert len([sql for sql in inserts if 'api_questionansweroptions' in sql]) == (1 if bulk_insert else 30)
+    assert not [q for q in context.captured_queries if q['sql'].startswith('SELECT') and 'api_question' in q['sql']]
+
+
+@pytest.mark.django_db
+def test_quiz_clone(admin_api_client, quiz_factory, question_factory, question_answer_options_factory):
+    source = quiz_factory(start_date=localdate() - datetime.timedelta(days=40),
+                          end_date=localdate() - datetime.timedelta(days=10))
+    question_factory(quiz=source, type='TEXT')
+    question = question_factory(quiz=source, type='SINGLE_ANSWER_OPTION')
+    question_answer_options_factory(question=question, _quantity=2)
+
+    resp = admin_api_client.post(reverse('quiz-import-quiz'), data={'source': source.id, 'title': 'copy'},
+                                 format='json')
+    assert resp.status_code == HTTP_201_CREATED
+
+    clone = Quiz.objects.get(id=resp.json()['id'])
+    assert clone.title == 'copy'
+    assert clone.description == source.description
+    assert clone.start_date == localdate()
+    assert clone.end_date == localdate() + datetime.timedelta(days=30)
+    assert question_tree(clone) == question_tree(source)
+    assert Question.objects.count() == 4
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('questions', [
+    [{'text': 'question', 'type': 'SINGLE_ANSWER_OPTION'}],
+    [{'text': 'question', 'type': 'MULTIPLE_ANSWER_OPTION', 'answer_options': [{'name': 'a'}, {'name': 'a'}]}],
+    [{'text': 'question', 'type': 'UNKNOWN'}],
+])
+def test_quiz_import_invalid_question(admin_api_client, quiz_create_payload, questions):
+    resp = admin_api_client.post(reverse('quiz-import-quiz'), data={**quiz_create_payload, 'questions': questions},
+                                 format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert not Quiz.objects.exists()
+
+
+@pytest.mark.django_db
+def test_quiz_import_invalid_dates(admin_api_client, quiz_create_payload, quiz_factory):
+    payload = {**quiz_create_payload, 'start_date': localdate() - datetime.timedelta(days=1)}
+    resp = admin_api_client.post(reverse('quiz-import-quiz'), data=payload, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+    resp = admin_api_client.post(reverse('quiz-import-quiz'), data={
+        'source': quiz_factory().id, 'questions': []
+    }, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert Quiz.objects.count() == 1
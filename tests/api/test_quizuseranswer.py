@@ -1,8 +1,13 @@
+import datetime
 import random
 
 import pytest
 from django.urls import reverse
-from rest_framework.status import HTTP_200_OK
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+
+from api.filters import parse_user_id
 
 
 @pytest.mark.django_db
@@ -11,11 +16,87 @@ def test_quiz_retrieve_by_user_id(user_api_client, user, quiz_factory, question_
     [q.questions.set(question_factory(_quantity=10)) for q in quiz_list]
     random_quiz = random.choice(quiz_list)
     [answer_factory(question=q, _quantity=1) for q in random_quiz.questions.all()]
+    baker.make('QuizParticipation', user=user, quiz=random_quiz, answered_count=10)
     url = reverse('quizuseranswer-list')
 
     resp = user_api_client.get(url, {'user': user.id})
     assert resp.status_code == HTTP_200_OK
 
     resp_json = resp.json()
-    user_ids = [q['answer'][0]['user'] for q in resp_json[0]['questions']]
-    assert all(lambda x: x == user for u in user_ids)
+    assert [q['id'] for q in resp_json['results']] == [random_quiz.id]
+    user_ids = [q['answer'][0]['user'] for q in resp_json['results'][0]['questions']]
+    assert len(user_ids) == 10
+    assert all(u == user.id for u in user_ids)
+
+
+@pytest.mark.django_db
+def test_quiz_user_answers_only_user_answers(user_api_client, user, question_factory, answer_factory):
+    question = question_factory()
+    answer_factory(question=question, text='mine')
+    answer_factory(question=question, text='other', user=baker.make('auth.User'))
+    baker.make('QuizParticipation', user=user, quiz=question.quiz, answered_count=1)
+
+    resp = user_api_client.get(reverse('quizuseranswer-list'), {'user': user.id})
+    assert resp.status_code == HTTP_200_OK
+
+    answers = resp.json()['results'][0]['questions'][0]['answer']
+    assert [a['text'] for a in answers] == ['mine']
+
+
+@pytest.mark.django_db
+def test_quiz_user_answers_invalid_user(user_api_client):
+    # Фильтр и вьюсет разбирают id пользователя одинаково, дробный id - ошибка запроса:
+    resp = user_api_client.get(reverse('quizuseranswer-list'), {'user': '1.5'})
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert [parse_user_id(value) for value in ['1', '1.0', '1.5', 'a', None]] == [1, 1, None, None, None]
+
+
+@pytest.mark.django_db
+def test_quiz_user_answers_active_and_ordering(user_api_client, user, quiz_factory):
+    today = timezone.localdate()
+    now = timezone.now()
+    active = quiz_factory(end_date=today + datetime.timedelta(days=1))
+    finished = quiz_factory(end_date=today - datetime.timedelta(days=1))
+    recent = quiz_factory(end_date=today + datetime.timedelta(days=2))
+    baker.make('QuizParticipation', user=user, quiz=active, last_answered_at=now - datetime.timedelta(hours=2))
+    baker.make('QuizParticipation', user=user, quiz=finished, last_answered_at=now - datetime.timedelta(hours=1))
+    baker.make('QuizParticipation', user=user, quiz=recent, last_answered_at=now)
+    url = reverse('quizuseranswer-list')
+
+    resp = user_api_client.get(url, {'user': user.id, 'ordering': '-last_answered_at'})
+    assert [q['id'] for q in resp.json()['results']] == [recent.id, finished.id, active.id]
+
+    resp = user_api_client.get(url, {'user': user.id, 'active': 'true', 'ordering': 'last_answered_at'})
+    assert [q['id'] for q in resp.json()['results']] == [active.id, recent.id]
+
+    resp = user_api_client.get(url, {'user': user.id, 'active': 'false'})
+    assert [q['id'] for q in resp.json()['results']] == [finished.id]
+
+
+@pytest.mark.django_db
+def test_quiz_user_answers_ordering_pagination(user_api_client, user, quiz_factory):
+    now = timezone.now()
+    quizzes = quiz_factory(_quantity=5)
+    for i, quiz in enumerate(quizzes):
+        # Одинаковое время у пар опросов: внутри пары порядок доводится по id в том же направлении
+        baker.make('QuizParticipation', user=user, quiz=quiz, last_answered_at=now - datetime.timedelta(hours=i // 2))
+    url = reverse('quizuseranswer-list')
+
+    ids, params = [], {'user': user.id, 'ordering': '-last_answered_at', 'page_size': 2}
+    while url:
+        resp_json = user_api_client.get(url, params).json()
+        ids += [q['id'] for q in resp_json['results']]
+        url, params = resp_json['next'], None
+    assert ids == [quizzes[1].id, quizzes[0].id, quizzes[3].id, quizzes[2].id, quizzes[4].id]
+
+
+@pytest.mark.django_db
+def test_answer_create_records_participation(user_api_client, user, question_factory):
+    question = question_factory(type='TEXT')
+
+    resp = user_api_client.post(reverse('answer-list'), data={'question': question.id, 'text': 'a'}, format='json')
+    assert resp.status_code == 201
+
+    participation = user.quiz_participations.get()
+    assert participation.quiz_id == question.quiz_id
+    assert participation.answered_count == 1
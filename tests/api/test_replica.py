@@ -0,0 +1,112 @@
+from contextlib import ExitStack, contextmanager
+
+import pytest
+from django.conf import settings as django_settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+
+from api.cache import REPLICA_PIN_CACHE_ALIAS
+from api.ingestion import get_answer_queue
+from api.models import Quiz
+from api.routers import ReadReplicaRouter, enable_replica_reads, replica_reads_scope
+
+
+def test_router_reads_from_replica_only_when_enabled(settings):
+    settings.REPLICA_DATABASES = ['replica_test']
+    router = ReadReplicaRouter()
+
+    assert router.db_for_read(Quiz) == DEFAULT_DB_ALIAS
+    with replica_reads_scope():
+        assert router.db_for_read(Quiz) == DEFAULT_DB_ALIAS
+        enable_replica_reads()
+        assert router.db_for_read(Quiz) == 'replica_test'
+        assert router.db_for_write(Quiz) == DEFAULT_DB_ALIAS
+    assert router.db_for_read(Quiz) == DEFAULT_DB_ALIAS
+
+
+def test_router_without_replicas(settings):
+    settings.REPLICA_DATABASES = []
+
+    with replica_reads_scope():
+        enable_replica_reads()
+        assert ReadReplicaRouter().db_for_read(Quiz) == DEFAULT_DB_ALIAS
+
+
+@pytest.mark.django_db
+def test_router_keeps_reads_in_primary_transaction(settings):
+    settings.REPLICA_DATABASES = ['replica_test']
+
+    # Тест выполняется внутри транзакции основной базы:
+    with replica_reads_scope():
+        enable_replica_reads()
+        assert ReadReplicaRouter().db_for_read(Quiz) == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def capture_replica_queries():
+    with ExitStack() as stack:
+        yield [stack.enter_context(CaptureQueriesContext(connections[alias]))
+               for alias in django_settings.REPLICA_DATABASES]
+
+
+def count_queries(contexts):
+    return sum(len(context.captured_queries) for context in contexts)
+
+
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_quiz_list_reads_from_replica(admin_api_client, quiz_factory, replicate):
+    quiz_factory(_quantity=3)
+    replicate()
+    # Опрос, ещё не попавший на реплику:
+    quiz_factory()
+
+    with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, capture_replica_queries() as contexts:
+        resp = admin_api_client.get(reverse('quiz-list'))
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.json()['results']) == 3
+    # Токен проверяется по основной базе, выдача читается с реплики:
+    assert count_queries(contexts) >= 2
+    assert all('api_quiz' not in q['sql'] for q in primary.captured_queries)
+
+
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_reads_stick_to_primary_after_write(user_api_client, user, question_factory, replicate):
+    question = question_factory(type='TEXT')
+    replicate()
+
+    resp = user_api_client.post(reverse('answer-list'), data={'question': question.id, 'text': 'text'})
+    assert resp.status_code == HTTP_201_CREATED
+
+    with capture_replica_queries() as contexts:
+        resp = user_api_client.get(reverse('quizuseranswer-list'), {'user': user.id})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['results'][0]['questions'][0]['answer'][0]['text'] == 'text'
+    assert count_queries(contexts) == 0
+
+    # Без закрепления за основной базой чтение идёт с отстающей реплики:
+    caches[REPLICA_PIN_CACHE_ALIAS].clear()
+    resp = user_api_client.get(reverse('quizuseranswer-list'), {'user': user.id})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['results'] == []
+
+
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_reads_flushed_queued_answers_from_primary(settings, tmp_path, user_api_client, user, question_factory,
+                                                   replicate):
+    settings.ANSWER_INGESTION = 'queue'
+    settings.ANSWER_INGESTION_QUEUE = str(tmp_path / 'answer_queue.sqlite3')
+    question = question_factory(type='TEXT')
+    replicate()
+    # Ответ поставлен в очередь другим процессом: пользователь не закреплён за основной базой:
+    queue = get_answer_queue()
+    queue.release([queue.put(user.id, question.id, question.quiz_id, 'queued', [])])
+
+    with capture_replica_queries() as contexts:
+        resp = user_api_client.get(reverse('quizuseranswer-list'), {'user': user.id})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['results'][0]['questions'][0]['answer'][0]['text'] == 'queued'
+    # Ответы из очереди записаны в основную базу, чтение идёт с неё:
+    assert count_queries(contexts) == 0
@@ -0,0 +1,86 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN
+
+from api.models import ResultCounter
+
+
+@pytest.fixture
+def quiz_with_questions(quiz_factory, question_factory, question_answer_options_factory):
+    quiz = quiz_factory()
+    text_question = question_factory(quiz=quiz, type='TEXT')
+    option_question = question_factory(quiz=quiz, type='MULTIPLE_ANSWER_OPTION')
+    options = question_answer_options_factory(question=option_question, _quantity=3)
+    return quiz, text_question, option_question, options
+
+
+def get_results(client, quiz):
+    resp = client.get(reverse('quiz-results', args=[quiz.id]))
+    assert resp.status_code == HTTP_200_OK
+    return resp.json()
+
+
+@pytest.mark.django_db
+def test_quiz_results(admin_api_client, user_api_client, quiz_with_questions, django_assert_max_num_queries):
+    quiz, text_question, option_question, options = quiz_with_questions
+    url = reverse('answer-list')
+
+    resp = user_api_client.post(url, data={'question': text_question.id, 'text': 'something'}, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+    resp = user_api_client.post(url, data={
+        'question': option_question.id,
+        'user_answer_options': [{'answer_option': options[0].id}, {'answer_option': options[2].id}]
+    }, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+
+    # Токен, опрос, вопросы, варианты ответов, счётчики:
+    with django_assert_max_num_queries(5):
+        results = get_results(admin_api_client, quiz)
+
+    assert results['respondents'] == 1
+    assert [q['answers'] for q in results['questions']] == [1, 1]
+    assert [o['selections'] for o in results['questions'][1]['answer_options']] == [1, 0, 1]
+
+
+@pytest.mark.django_db
+def test_quiz_results_after_bulk_answer(admin_api_client, user_api_client, quiz_with_questions):
+    quiz, text_question, option_question, options = quiz_with_questions
+    payload = {
+        'quiz': quiz.id,
+        'answers': [
+            {'question': text_question.id, 'text': 'something'},
+            {'question': option_question.id, 'user_answer_options': [{'answer_option': options[1].id}]},
+        ]
+    }
+
+    resp = user_api_client.post(reverse('answer-bulk-create'), data=payload, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+
+    results = get_results(admin_api_client, quiz)
+    assert results['respondents'] == 1
+    assert [o['selections'] for o in results['questions'][1]['answer_options']] == [0, 1, 0]
+
+
+@pytest.mark.django_db
+def test_quiz_results_by_user(user_api_client, quiz_factory):
+    quiz = quiz_factory()
+
+    resp = user_api_client.get(reverse('quiz-results', args=[quiz.id]))
+    assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+def test_rebuild_result_counters(admin_api_client, user, quiz_with_questions, answer_factory):
+    quiz, text_question, option_question, options = quiz_with_questions
+    answer = answer_factory(question=option_question)
+    answer.user_answer_options.create(answer_option=options[1])
+    answer_factory(question=text_question)
+    ResultCounter.objects.create(quiz=quiz, kind='RESPONDENTS', object_id=quiz.id, value=100)
+
+    call_command('rebuild_result_counters', quiz=[quiz.id])
+
+    results = get_results(admin_api_client, quiz)
+    assert results['respondents'] == 1
+    assert [q['answers'] for q in results['questions']] == [1, 1]
+    assert [o['selections'] for o in results['questions'][1]['answer_options']] == [0, 1, 0]
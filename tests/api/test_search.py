@@ -0,0 +1,70 @@
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN
+
+
+def search(client, url, query, **params):
+    resp = client.get(url, {'search': query, **params})
+    assert resp.status_code == HTTP_200_OK
+    return resp.json()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('compiled', [True, False])
+def test_quiz_search(settings, compiled, admin_api_client, quiz_factory):
+    settings.COMPILED_SERIALIZERS = compiled
+    weak = quiz_factory(title='Погода', description='Опрос о погоде и Python')
+    strong = quiz_factory(title='Python Python', description='Опрос о python')
+    quiz_factory(title='Музыка', description='Опрос о музыке')
+
+    results = search(admin_api_client, reverse('quiz-list'), 'PYTHON опрос')['results']
+    # Результаты отсортированы по релевантности:
+    assert [q['id'] for q in results] == [strong.id, weak.id]
+    # Поиск по началу слова:
+    assert [q['id'] for q in search(admin_api_client, reverse('quiz-list'), 'муз')['results']] != []
+    assert search(admin_api_client, reverse('quiz-list'), '"*:(')['results'] == []
+
+
+@pytest.mark.django_db
+def test_search_pagination(admin_api_client, question_factory):
+    questions = question_factory(text='вопрос про космос', _quantity=5)
+
+    url, found = reverse('question-list'), []
+    params = {'search': 'космос', 'page_size': 2}
+    while url:
+        resp = admin_api_client.get(url, params).json()
+        found += [q['id'] for q in resp['results']]
+        url, params = resp['next'], {}
+    assert sorted(found) == sorted(q.id for q in questions)
+
+
+@pytest.mark.django_db
+def test_search_index_follows_writes(admin_api_client, quiz_factory):
+    quiz = quiz_factory(title='старое название', description='описание')
+    url = reverse('quiz-list')
+
+    quiz.title = 'новое название'
+    quiz.save()
+    assert search(admin_api_client, url, 'старое')['results'] == []
+    assert [q['id'] for q in search(admin_api_client, url, 'новое')['results']] == [quiz.id]
+
+    quiz.delete()
+    assert search(admin_api_client, url, 'новое')['results'] == []
+
+
+@pytest.mark.django_db
+def test_answer_search(admin_api_client, user_api_client, question_factory):
+    question, other_question = question_factory(type='TEXT', _quantity=2)
+    # Массовая запись ответов тоже попадает в индекс:
+    resp = user_api_client.post(reverse('answer-bulk-create'), data={
+        'quiz': question.quiz_id, 'answers': [{'question': question.id, 'text': 'Люблю зелёный чай'}]
+    }, format='json')
+    assert resp.status_code == HTTP_201_CREATED
+    resp = admin_api_client.post(reverse('answer-list'), data={'question': other_question.id, 'text': 'чай с молоком'})
+    assert resp.status_code == HTTP_201_CREATED
+
+    results = search(admin_api_client, reverse('answer-list'), 'чай', question=question.id)['results']
+    assert [a['text'] for a in results] == ['Люблю зелёный чай']
+
+    resp = user_api_client.get(reverse('answer-list'), {'search': 'чай'})
+    assert resp.status_code == HTTP_403_FORBIDDEN
@@ -0,0 +1,83 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST
+
+
+@pytest.fixture
+def quizzes(quiz_factory, question_factory, question_answer_options_factory):
+    quizzes = quiz_factory(_quantity=3)
+    for quiz in quizzes:
+        for question in question_factory(quiz=quiz, type='SINGLE_ANSWER_OPTION', _quantity=2):
+            question_answer_options_factory(question=question, _quantity=2)
+    return quizzes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('compiled', [True, False])
+def test_quiz_list_titles_only(settings, compiled, admin_api_client, quizzes, django_assert_num_queries):
+    settings.COMPILED_SERIALIZERS = compiled
+
+    # Токен, валидаторы условного запроса и сами опросы, без вопросов и вариантов ответов:
+    with django_assert_num_queries(3):
+        resp = admin_api_client.get(reverse('quiz-list'), {'fields': 'id,title'})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['results'] == [{'id': q.id, 'title': q.title} for q in sorted(quizzes, key=lambda q: q.id)]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('compiled', [True, False])
+def test_quiz_list_expand(settings, compiled, admin_api_client, quizzes):
+    settings.COMPILED_SERIALIZERS = compiled
+    url = reverse('quiz-list')
+
+    resp = admin_api_client.get(url, {'fields': 'id', 'expand': 'questions'})
+    assert resp.status_code == HTTP_200_OK
+    for quiz in resp.json()['results']:
+        assert set(quiz) == {'id', 'questions'}
+        assert all(set(question) == {'id', 'text', 'type', 'quiz'} for question in quiz['questions'])
+
+    resp = admin_api_client.get(url, {'fields': 'id,questions.text', 'expand': 'questions.answer_options'})
+    for quiz in resp.json()['results']:
+        assert all(set(question) == {'text', 'answer_options'} for question in quiz['questions'])
+        assert all(len(question['answer_options']) == 2 for question in quiz['questions'])
+
+
+@pytest.mark.django_db
+def test_quiz_retrieve_fields(admin_api_client, quizzes):
+    resp = admin_api_client.get(reverse('quiz-detail', args=[quizzes[0].id]), {'fields': 'title,end_date'})
+    assert resp.status_code == HTTP_200_OK
+    assert set(resp.json()) == {'title', 'end_date'}
+
+
+@pytest.mark.django_db
+def test_unknown_fields(admin_api_client, quizzes):
+    resp = admin_api_client.get(reverse('quiz-list'), {'fields': 'id,questions.missing'})
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert 'questions.missing' in resp.json()['ValidationError']
+
+
+@pytest.mark.django_db
+def test_quiz_user_answers_prefetches_pruned(user_api_client, user, question_factory, answer_factory):
+    question = question_factory()
+    answer_factory(question=question)
+    baker.make('QuizParticipation', user=user, quiz=question.quiz, answered_count=1)
+
+    with CaptureQueriesContext(connection) as queries:
+        resp = user_api_client.get(reverse('quizuseranswer-list'), {'user': user.id, 'fields': 'id,title'})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['results'] == [{'id': question.quiz.id, 'title': question.quiz.title}]
+    # Предзагрузка вопросов и ответов из фильтра по пользователю отброшена:
+    selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+    assert not any('FROM "api_question"' in sql for sql in selects)
+
+
+@pytest.mark.django_db
+def test_fields_ignored_for_writes(user_api_client, question_factory):
+    question = question_factory(type='TEXT')
+
+    resp = user_api_client.post(f'{reverse("answer-list")}?fields=id', data={'question': question.id, 'text': 'text'})
+    assert resp.status_code == HTTP_201_CREATED
+    assert resp.json()['text'] == 'text'
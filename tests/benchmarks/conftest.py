@@ -0,0 +1,169 @@
+import datetime
+import json
+import os
+import time
+import tracemalloc
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, now
+from model_bakery import baker
+
+from api.cache import invalidate_quiz_cache, get_token_caches
+from api.datagen import GENERATED_FIELDS, RowWriter
+from api.models import Quiz, Question, QuestionAnswerOptions, Answer, UserAnswerOptions, QuizParticipation
+from tests.api.conftest import *  # noqa: F401,F403 - общие фикстуры api переиспользуются в бенчмарках
+
+# Размеры наборов данных (в количестве ответов). 100k включается через переменную окружения:
+# BENCHMARK_SIZES=10,1000,100000 pytest tests/benchmarks
+BENCHMARK_SIZES = [int(s) for s in os.getenv('BENCHMARK_SIZES', '10,1000').split(',')]
+BENCHMARK_REPORT = os.getenv('BENCHMARK_REPORT', 'benchmark_report.json')
+
+QUESTION_TYPES = (
+    'TEXT',
+    'SINGLE_ANSWER_OPTION',
+    'SINGLE_ANSWER_OPTION',
+    'MULTIPLE_ANSWER_OPTION',
+    'MULTIPLE_ANSWER_OPTION',
+)
+OPTIONS_PER_QUESTION = 4
+RESPONDENTS_PER_QUIZ = 10
+
+
+class BenchmarkDataset:
+    """
+    Наращиваемый набор данных для бенчмарков: опросы из 5 вопросов разных типов,
+    по 4 варианта ответа у вопросов с выбором, до 10 респондентов на опрос.
+    Строки записываются пачками через RowWriter генератора данных (COPY в Postgres)
+    """
+
+    models = [Quiz, Question, QuestionAnswerOptions, Answer, UserAnswerOptions, QuizParticipation]
+
+    def __init__(self, users):
+        self.users = users
+        self.answers_count = 0
+        self.quiz_ids = []
+
+    def grow_to(self, answers_count):
+        """
+        Досоздаёт опросы с ответами, пока общее количество ответов не достигнет answers_count
+        """
+        writer = self._start()
+        while self.answers_count < answers_count:
+            left = answers_count - self.answers_count
+            respondents = self.users[:min(RESPONDENTS_PER_QUIZ, -(-left // len(QUESTION_TYPES)))]
+            quiz_id, questions = self._build_quiz(writer)
+
+            for question_id, question_type, option_ids in questions:
+                answer_ids = writer.allocate_ids(Answer, len(respondents))
+                writer.add(Answer, [
+                    (answer_id, 'answer' if question_type == 'TEXT' else None, user.id, question_id)
+                    for answer_id, user in zip(answer_ids, respondents)
+                ])
+                selections = [
+                    (answer_id, option_id)
+                    for n, answer_id in enumerate(answer_ids)
+                    for option_id in option_ids[n % OPTIONS_PER_QUESTION:][
+                        :1 if question_type == 'SINGLE_ANSWER_OPTION' else 2
+                    ]
+                ]
+                writer.add(UserAnswerOptions, [
+                    (selection_id, *selection)
+                    for selection_id, selection in zip(writer.allocate_ids(UserAnswerOptions, len(selections)),
+                                                       selections)
+                ])
+                self.answers_count += len(respondents)
+
+            writer.add(QuizParticipation, [
+                (participation_id, user.id, quiz_id, len(QUESTION_TYPES), now())
+                for participation_id, user in zip(writer.allocate_ids(QuizParticipation, len(respondents)),
+                                                  respondents)
+            ])
+        return self._finish(writer)
+
+    def add_quizzes(self, count):
+        """
+        Досоздаёт count опросов с вопросами и вариантами ответов, но без ответов
+        """
+        writer = self._start()
+        for _ in range(count):
+            self._build_quiz(writer)
+        return self._finish(writer)
+
+    def _start(self):
+        return RowWriter({model: GENERATED_FIELDS[model] for model in self.models})
+
+    def _build_quiz(self, writer):
+        end_date = localdate() + datetime.timedelta(days=30)
+        [quiz_id] = writer.allocate_ids(Quiz, 1)
+        writer.add(Quiz, [(quiz_id, f'quiz#{len(self.quiz_ids)}', localdate(), end_date, 'benchmark')])
+        self.quiz_ids.append(quiz_id)
+
+        questions = []
+        for question_id, question_type in zip(writer.allocate_ids(Question, len(QUESTION_TYPES)), QUESTION_TYPES):
+            writer.add(Question, [(question_id, 'question', question_type, quiz_id)])
+            option_ids = []
+            if question_type != 'TEXT':
+                option_ids = list(writer.allocate_ids(QuestionAnswerOptions, OPTIONS_PER_QUESTION))
+                writer.add(QuestionAnswerOptions, [
+                    (option_id, f'option#{i}', question_id) for i, option_id in enumerate(option_ids)
+                ])
+            questions.append((question_id, question_type, option_ids))
+        return quiz_id, questions
+
+    def _finish(self, writer):
+        writer.finish()
+        invalidate_quiz_cache()
+        return self
+
+
+def measure(client, method, url, data=None):
+    """
+    Выполняет запрос и возвращает ответ вместе с количеством SQL-запросов, временем и пиковой памятью
+    """
+    # Каждый замер включает одинаковую (холодную) аутентификацию по токену:
+    for cache in get_token_caches():
+        cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        started = time.perf_counter()
+        if method == 'get':
+            resp = client.get(url, data)
+        else:
+            resp = getattr(client, method)(url, data=data, format='json')
+        wall_time = time.perf_counter() - started
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return resp, {
+        'status': resp.status_code,
+        'queries': len(queries),
+        'wall_time_ms': round(wall_time * 1000, 3),
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+
+
+@pytest.fixture(scope='session')
+def benchmark_report():
+    results = []
+    yield results
+    if not results:
+        return
+    with open(BENCHMARK_REPORT, 'w') as f:
+        json.dump({
+            'generated_at': now().isoformat(),
+            'database': connection.vendor,
+            'sizes': BENCHMARK_SIZES,
+            'results': results,
+        }, f, indent=2)
+
+
+@pytest.fixture
+def benchmark_users(user):
+    return [user] + baker.make('auth.User', _quantity=RESPONDENTS_PER_QUIZ - 1)
+
+
+@pytest.fixture
+def benchmark_dataset(benchmark_users):
+    return BenchmarkDataset(benchmark_users)
@@ -0,0 +1,114 @@
+import pytest
+from django.urls import reverse
+
+from .conftest import BENCHMARK_SIZES, measure
+
+
+# Построители запросов к эндпоинтам роутера api/urls.py. Каждый возвращает (клиент, метод, url, данные):
+
+def quiz_list(ctx):
+    return ctx.admin_api_client, 'get', reverse('quiz-list'), None
+
+
+def quiz_detail(ctx):
+    return ctx.admin_api_client, 'get', reverse('quiz-detail', args=[ctx.dataset.quiz_ids[0]]), None
+
+
+def quiz_create(ctx):
+    return ctx.admin_api_client, 'post', reverse('quiz-list'), ctx.quiz_create_payload
+
+
+def quiz_results(ctx):
+    return ctx.admin_api_client, 'get', reverse('quiz-results', args=[ctx.dataset.quiz_ids[0]]), None
+
+
+def question_list(ctx):
+    return ctx.admin_api_client, 'get', reverse('question-list'), None
+
+
+def question_detail(ctx):
+    question = ctx.question_factory(type='SINGLE_ANSWER_OPTION', quiz_id=ctx.dataset.quiz_ids[0])
+    ctx.question_answer_options_factory(question=question, _quantity=4)
+    return ctx.admin_api_client, 'get', reverse('question-detail', args=[question.id]), None
+
+
+def question_create(ctx):
+    payload = {'text': 'question', 'type': 'MULTIPLE_ANSWER_OPTION', 'quiz': ctx.dataset.quiz_ids[0],
+               **ctx.question_answer_options_payload}
+    return ctx.admin_api_client, 'post', reverse('question-list'), payload
+
+
+def answer_list(ctx):
+    return ctx.user_api_client, 'get', reverse('answer-list'), None
+
+
+def answer_detail(ctx):
+    answer = ctx.answer_factory()
+    return ctx.user_api_client, 'get', reverse('answer-detail', args=[answer.id]), None
+
+
+def answer_create(ctx):
+    # Каждый раз новый опрос, чтобы ответ всегда был первым ответом пользователя в опросе:
+    question = ctx.question_factory(type='MULTIPLE_ANSWER_OPTION', quiz=ctx.quiz_factory())
+    options = ctx.question_answer_options_factory(question=question, _quantity=4)
+    payload = {'question': question.id, 'user_answer_options': [{'answer_option': o.id} for o in options[:2]]}
+    return ctx.user_api_client, 'post', reverse('answer-list'), payload
+
+
+def answer_bulk_create(ctx):
+    quiz = ctx.quiz_factory()
+    answers = [{'question': ctx.question_factory(quiz=quiz, type='TEXT').id, 'text': 'answer'}]
+    for _ in range(4):
+        question = ctx.question_factory(quiz=quiz, type='SINGLE_ANSWER_OPTION')
+        option = ctx.question_answer_options_factory(question=question)
+        answers.append({'question': question.id, 'user_answer_options': [{'answer_option': option.id}]})
+    return ctx.user_api_client, 'post', reverse('answer-bulk-create'), {'quiz': quiz.id, 'answers': answers}
+
+
+def quizuseranswer_list(ctx):
+    return ctx.user_api_client, 'get', reverse('quizuseranswer-list'), {'user': ctx.user.id}
+
+
+def quizuseranswer_detail(ctx):
+    return ctx.user_api_client, 'get', reverse('quizuseranswer-detail', args=[ctx.dataset.quiz_ids[0]]), None
+
+
+ENDPOINTS = [
+    quiz_list, quiz_detail, quiz_create, quiz_results,
+    question_list, question_detail, question_create,
+    answer_list, answer_detail, answer_create, answer_bulk_create,
+    quizuseranswer_list, quizuseranswer_detail,
+]
+
+# Эндпоинты с известной проблемой N+1: тест помечен как xfail до исправления
+KNOWN_N_PLUS_ONE = set()
+
+
+class Context:
+    def __init__(self, request, dataset):
+        self.dataset = dataset
+        self._request = request
+
+    def __getattr__(self, name):
+        return self._request.getfixturevalue(name)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('endpoint', [
+    pytest.param(e, marks=pytest.mark.xfail(strict=True, reason='N+1')) if e.__name__ in KNOWN_N_PLUS_ONE else e
+    for e in ENDPOINTS
+], ids=[e.__name__ for e in ENDPOINTS])
+def test_query_count_does_not_grow_with_rows(request, endpoint, benchmark_dataset, benchmark_report):
+    ctx = Context(request, benchmark_dataset)
+    query_counts = {}
+
+    for size in BENCHMARK_SIZES:
+        benchmark_dataset.grow_to(size)
+        client, method, url, data = endpoint(ctx)
+        resp, result = measure(client, method, url, data)
+        assert resp.status_code < 400, resp.content
+
+        benchmark_report.append({'endpoint': endpoint.__name__, 'size': size, **result})
+        query_counts[size] = result['queries']
+
+    assert len(set(query_counts.values())) == 1, f'{endpoint.__name__}: количество запросов растёт {query_counts}'
@@ -0,0 +1,38 @@
+import tracemalloc
+
+import pytest
+from django.urls import reverse
+
+from api.models import Answer, UserAnswerOptions
+
+EXPORT_SIZES = [2000, 20000]
+
+
+@pytest.mark.django_db
+def test_export_memory_is_flat(admin_api_client, quiz_factory, question_factory, question_answer_options_factory,
+                               benchmark_report):
+    quiz = quiz_factory()
+    question = question_factory(quiz=quiz, type='SINGLE_ANSWER_OPTION')
+    option = question_answer_options_factory(question=question)
+    url = reverse('quiz-export', args=[quiz.id])
+    peaks = {}
+
+    for size in EXPORT_SIZES:
+        Answer.objects.bulk_create(Answer(question=question) for _ in range(size - Answer.objects.count()))
+        UserAnswerOptions.objects.bulk_create(
+            UserAnswerOptions(answer_id=answer_id, answer_option=option)
+            for answer_id in Answer.objects.filter(user_answer_options=None).values_list('id', flat=True)
+        )
+
+        tracemalloc.start()
+        resp = admin_api_client.get(url)
+        rows = sum(chunk.count(b'\n') for chunk in resp.streaming_content) - 1
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert rows == size
+        peaks[size] = peak
+        benchmark_report.append({'endpoint': 'quiz_export', 'size': size, 'peak_memory_kb': round(peak / 1024, 1)})
+
+    assert peaks[EXPORT_SIZES[-1]] < 2 * peaks[EXPORT_SIZES[0]], \
+        f'Память выгрузки растёт с количеством ответов: {peaks}'
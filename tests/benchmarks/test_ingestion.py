@@ -0,0 +1,56 @@
+import io
+import time
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from api.models import Answer
+
+INGESTION_ANSWERS = 300
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('mode', ['direct', 'queue'])
+def test_answer_ingestion_throughput(mode, settings, tmp_path, user_api_client, quiz_factory, question_factory,
+                                     benchmark_report):
+    settings.ANSWER_INGESTION = mode
+    settings.ANSWER_INGESTION_QUEUE = str(tmp_path / 'answer_queue.sqlite3')
+    quiz = quiz_factory()
+    questions = question_factory(quiz=quiz, type='TEXT', _quantity=INGESTION_ANSWERS)
+    url = reverse('answer-list')
+
+    started = time.perf_counter()
+    for question in questions:
+        resp = user_api_client.post(url, data={'question': question.id, 'text': 'answer'}, format='json')
+        assert resp.status_code < 400, resp.content
+    accepted = time.perf_counter() - started
+    # Устойчивая пропускная способность включает перенос очереди в базу:
+    if mode == 'queue':
+        call_command('flush_answer_queue', stdout=io.StringIO())
+    total = time.perf_counter() - started
+
+    assert Answer.objects.count() == INGESTION_ANSWERS
+    benchmark_report.append({
+        'endpoint': 'answer_ingestion',
+        'mode': mode,
+        'answers': INGESTION_ANSWERS,
+        'accept_answers_per_second': round(INGESTION_ANSWERS / accepted),
+        'sustained_answers_per_second': round(INGESTION_ANSWERS / total),
+    })
+
+
+@pytest.mark.django_db
+def test_generate_data_throughput(benchmark_report):
+    out = io.StringIO()
+    started = time.perf_counter()
+    call_command('generate_data', '--users', '200', '--quizzes', '20', '--respondents', '50', stdout=out)
+    elapsed = time.perf_counter() - started
+
+    rows = sum(int(line.rsplit(': ', 1)[1]) for line in out.getvalue().splitlines()[:-1])
+    assert Answer.objects.count() > 0
+    benchmark_report.append({
+        'endpoint': 'generate_data',
+        'rows': rows,
+        'rows_per_second': round(rows / elapsed),
+    })
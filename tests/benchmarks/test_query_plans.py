@@ -0,0 +1,40 @@
+import pytest
+from django.db import connection
+from django.utils.timezone import localdate
+
+from api.models import Quiz, Answer
+
+# Запросы горячих путей, планы которых сохраняются в отчёт бенчмарков для сравнения между запусками:
+HOT_QUERIES = {
+    'active_quizzes': lambda user: Quiz.objects.filter(end_date__gt=localdate()),
+    'user_question_answer': lambda user: Answer.objects.filter(user=user, question_id=1),
+    'user_answers': lambda user: Answer.objects.filter(user_id=user.id),
+}
+# Индексы (модель и столбцы), которые должны использовать запросы:
+QUERY_INDEXES = {
+    'active_quizzes': (Quiz, ['end_date']),
+    'user_question_answer': (Answer, ['user_id', 'question_id']),
+}
+
+
+def get_index_name(model, columns):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return next(name for name, constraint in constraints.items()
+                if constraint['index'] and constraint['columns'] == columns)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_query_plan(name, user, benchmark_dataset, benchmark_report):
+    benchmark_dataset.grow_to(1000)
+
+    if connection.vendor == 'postgresql':
+        # На небольших таблицах PostgreSQL предпочитает последовательное чтение, проверяется доступность индекса:
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    plan = HOT_QUERIES[name](user).explain()
+
+    benchmark_report.append({'query': name, 'plan': plan})
+    if name in QUERY_INDEXES:
+        assert get_index_name(*QUERY_INDEXES[name]) in plan
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+from django.urls import reverse
+
+from api.cache import invalidate_quiz_cache
+
+THROUGHPUT_QUIZZES = 1000
+THROUGHPUT_ROUNDS = 3
+
+
+def list_all_quizzes(client):
+    """
+    Проходит все страницы списка опросов; кеш опросов сбрасывается, чтобы каждый раз выполнялась сериализация
+    """
+    url, params, count = reverse('quiz-list'), {'page_size': 100}, 0
+    while url:
+        invalidate_quiz_cache()
+        resp = client.get(url, params)
+        assert resp.status_code == 200
+        resp_json = resp.json()
+        count += len(resp_json['results'])
+        url, params = resp_json['next'], None
+    return count
+
+
+@pytest.mark.django_db
+def test_compiled_serializer_throughput(admin_api_client, settings, benchmark_dataset, benchmark_report):
+    benchmark_dataset.add_quizzes(THROUGHPUT_QUIZZES)
+    timings = {}
+
+    for compiled in (False, True):
+        settings.COMPILED_SERIALIZERS = compiled
+        list_all_quizzes(admin_api_client)
+        started = time.perf_counter()
+        for _ in range(THROUGHPUT_ROUNDS):
+            assert list_all_quizzes(admin_api_client) == THROUGHPUT_QUIZZES
+        timings[compiled] = (time.perf_counter() - started) / THROUGHPUT_ROUNDS
+
+        benchmark_report.append({
+            'endpoint': 'quiz_list_all_pages',
+            'quizzes': THROUGHPUT_QUIZZES,
+            'compiled': compiled,
+            'wall_time_ms': round(timings[compiled] * 1000, 2),
+            # Опросов в секунду на один процесс-воркер:
+            'quizzes_per_second': round(THROUGHPUT_QUIZZES / timings[compiled]),
+        })
+
+    assert timings[True] < timings[False], f'Быстрая сериализация не быстрее обычной: {timings}'
@@ -0,0 +1,60 @@
+import pytest
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def get_replicated_models():
+    # Прокси-модели (например, TokenProxy) используют таблицы своих базовых моделей:
+    return [model for model in apps.get_models(include_auto_created=True) if not model._meta.proxy]
+
+
+def flush_replica(alias):
+    # Очистка после тестов не трогает реплики: таблицы для flush берутся из миграций, а они есть только у основной базы
+    connection = connections[alias]
+    tables = [model._meta.db_table for model in get_replicated_models()]
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        for sql in connection.ops.sql_flush(no_style(), tables, ()):
+            cursor.execute(sql)
+
+
+@pytest.fixture(scope='session')
+def replica_schema(django_db_setup, django_db_blocker):
+    """
+    Создаёт таблицы в тестовых репликах: миграции применяются только к основной базе (api.routers),
+    а у настоящих реплик схема приходит репликацией. Тестовые реплики создаются только для сессий
+    с тестами django_db(databases='__all__'), поэтому схема создаётся по требованию фикстуры replicate
+    """
+    with django_db_blocker.unblock():
+        for alias in settings.REPLICA_DATABASES:
+            with connections[alias].schema_editor() as editor:
+                for model in get_replicated_models():
+                    if not model._meta.auto_created:
+                        editor.create_model(model)
+
+
+@pytest.fixture
+def replicate(replica_schema):
+    """
+    Репликация по требованию: заменяет строки реплик строками основной базы. Между вызовами реплики отстают
+    от основной базы - так проверяется чтение своих записей. Нужна тестам django_db(transaction=True,
+    databases='__all__'): в остальных тестах чтения идут в транзакции основной базы и реплики не используются
+    """
+    def replicate():
+        for alias in settings.REPLICA_DATABASES:
+            with transaction.atomic(using=alias):
+                flush_replica(alias)
+                for model in get_replicated_models():
+                    model._base_manager.using(alias).bulk_create(model._base_manager.using(DEFAULT_DB_ALIAS).all())
+
+    yield replicate
+    for alias in settings.REPLICA_DATABASES:
+        flush_replica(alias)
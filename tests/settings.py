@@ -0,0 +1,8 @@
+from app.settings import *  # noqa: F401,F403
+
+# Тесты выполняются с репликой для чтения: отдельной тестовой базой рядом с основной (для SQLite - отдельным файлом),
+# а не зеркалом основной. Реплики из окружения (POSTGRES_REPLICA_HOSTS) в тестах не используются.
+# Схему реплики и копирование в неё строк основной базы (репликацию) выполняют фикстуры tests/conftest.py
+DATABASES = {alias: database for alias, database in DATABASES.items() if alias not in REPLICA_DATABASES}  # noqa: F405
+DATABASES['replica_1'] = dict(DATABASES['default'], TEST={'NAME': f'test_{DATABASES["default"]["NAME"]}_replica'})
+REPLICA_DATABASES = ['replica_1']